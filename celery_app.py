@@ -10,6 +10,7 @@ Celery 应用配置模块
 """
 
 import os
+import time
 from celery import Celery
 from celery.schedules import crontab
 
@@ -29,17 +30,93 @@ else:
 
 print(f"🔗 连接 Redis: {redis_url.replace(REDIS_PASSWORD, '***') if REDIS_PASSWORD else redis_url}")
 
+# 结果后端实现类（环境变量 RESULT_BACKEND_CLASS）
+#   - 'redis'（默认）: Celery 原生 Redis 结果后端
+#   - 'extensions.chord_join:LuaChordRedisBackend': 用 Lua 脚本完成 Chord 汇合，
+#     每个 header 成员只需一次 Redis 往返，并能还原结果清理器压缩 / 归档的结果（详见 extensions/chord_join.py）
+#   - 'extensions.tiered_backend:TieredRedisBackend': 在 LuaChordRedisBackend 基础上增加冷层（详见 extensions/tiered_backend.py）
+# Celery 支持 '<后端类>+<URL>' 形式的 result_backend
+RESULT_BACKEND_CLASS = os.getenv('RESULT_BACKEND_CLASS', 'redis')
+if RESULT_BACKEND_CLASS == 'redis':
+    result_backend_url = redis_url
+else:
+    result_backend_url = f'{RESULT_BACKEND_CLASS}+{redis_url}'
+
+# 延迟队列：带 countdown / eta 的任务（包括 self.retry(countdown=...)）先写入 Redis 有序集合，
+# 到期后才进入目标队列，Worker 不必在内存中持有尚未到期的任务（详见 extensions/delay_queue.py）
+DELAY_QUEUE = os.getenv('DELAY_QUEUE', 'false').lower() == 'true'
+
+# 结果键清理器：在 Worker 中按任务名设置 TTL、压缩 / 归档大结果（详见 extensions/result_sweeper.py）
+RESULT_SWEEPER = os.getenv('RESULT_SWEEPER', 'false').lower() == 'true'
+
+# 分层结果后端的降级器：只在能写入共享的 result_tier_path 的 Worker 上开启（详见 extensions/tiered_backend.py）
+TIER_DEMOTER = os.getenv('TIER_DEMOTER', 'false').lower() == 'true'
+
+class CeleryApp(Celery):
+    """
+    在 Celery 应用上挂载扩展 API
+
+    - send_tasks_bulk(): 批量发布任务，一次往返提交成千上万个任务
+      （详见 extensions/bulk_publish.py）
+    - send_task(): 启用延迟队列时，countdown / eta 任务写入延迟队列
+      （详见 extensions/delay_queue.py）
+    """
+
+    _bulk_publisher = None
+
+    def send_tasks_bulk(self, signatures):
+        """
+        批量发布签名
+
+        参数:
+            signatures: 签名的可迭代对象
+
+        返回:
+            BulkResult，按提交顺序排列的轻量结果句柄
+        """
+        if self._bulk_publisher is None:
+            from extensions.bulk_publish import BulkPublisher
+            self._bulk_publisher = BulkPublisher(self)
+        return self._bulk_publisher.publish(signatures)
+
+    def send_task(self, name, args=None, kwargs=None, countdown=None, eta=None,
+                  *a, **options):
+        # 其余参数（task_id、producer 等）原样转发给 Celery.send_task，
+        # 与它的签名一致：位置参数依次为 task_id、producer、connection ...
+        if DELAY_QUEUE and (countdown is not None or eta is not None):
+            from extensions.delay_queue import delayed_producer, due_timestamp
+            due = due_timestamp(self, countdown, eta)
+            if due > time.time():
+                positional = len(a) > 1
+                producer = a[1] if positional else options.pop('producer', None)
+                with self.producer_or_acquire(producer) as producer:
+                    producer = delayed_producer(producer, due)
+                    if positional:
+                        a = (a[0], producer) + a[2:]
+                    else:
+                        options['producer'] = producer
+                    return super().send_task(name, args, kwargs, None, None, *a, **options)
+        return super().send_task(name, args, kwargs, countdown, eta, *a, **options)
+
+
 # 创建 Celery 应用实例
 # broker: 消息代理，用于发送和接收任务消息
 # backend: 结果后端，用于存储任务执行结果
-app = Celery(
+app = CeleryApp(
     'celery_learning',
     broker=redis_url,  # Redis 作为消息代理
-    backend=redis_url,  # Redis 作为结果后端
+    backend=result_backend_url,  # Redis 作为结果后端
+    # 默认任务类：增加 apply_async_async() / delay_async()，
+    # 供 asyncio 服务直接 await 发布与结果（详见 extensions/async_client.py）
+    task_cls='extensions.async_client:AsyncTask',
     include=[
         'tasks.basic_tasks',      # 基础任务模块
         'tasks.advanced_tasks',   # 高级任务模块
         'tasks.realworld_tasks',  # 实际工程任务模块
+        'tasks.async_tasks',      # 异步 I/O 任务模块（async def）
+        'tasks.ml_tasks',         # 机器学习任务模块
+        'extensions.fused_chain', # 链融合执行任务
+        'extensions.workflow_dag', # DAG 工作流回调任务
     ]
 )
 
@@ -105,6 +182,8 @@ app.conf.update(
         'tasks.basic_tasks.*': {'queue': 'basic'},        # 基础任务队列
         'tasks.advanced_tasks.*': {'queue': 'advanced'},  # 高级任务队列
         'tasks.realworld_tasks.*': {'queue': 'realworld'}, # 实际工程任务队列
+        'tasks.async_tasks.*': {'queue': 'io'},           # 异步 I/O 任务队列（AsyncIOPool）
+        'tasks.ml_tasks.*': {'queue': 'advanced'},        # 模型推理（CPU 密集型，prefork）
     },
     
     # ------------------------------------------------------------------------
@@ -174,6 +253,29 @@ app.conf.update(
     #   推荐值: 1000-5000（根据任务内存使用情况调整）
     worker_max_tasks_per_child=1000,
     
+    # 按内存回收子进程（详见 extensions/memory_recycler.py）:
+    #   CELERY_CUSTOM_WORKER_POOL=extensions.memory_recycler:RecyclingTaskPool --pool=custom
+    #   子进程在两个任务之间检查自己的 RSS，满足任一条件时回收（此时 worker_max_tasks_per_child 不生效）
+    # worker_recycle_rss_limit: 高水位（MB）
+    # worker_recycle_growth_limit: 相对预热后基线（完成 worker_recycle_warmup 个任务时）的增长上限（MB）
+    # worker_recycle_trend_limit: 最近 worker_recycle_window 个任务的 RSS 增长斜率上限（KB/任务）
+    # worker_recycle_max_tasks / worker_recycle_max_age: 可选的任务数 / 存活时间（秒）上限
+    worker_recycle_rss_limit=1024,
+    worker_recycle_growth_limit=512,
+    worker_recycle_trend_limit=64,
+    worker_recycle_window=200,
+    worker_recycle_warmup=20,
+    worker_recycle_max_tasks=None,
+    worker_recycle_max_age=None,
+    
+    # fork 前预加载（详见 extensions/preload.py）:
+    #   父进程在创建子进程之前导入任务模块、预热缓存，再用 gc.freeze() 冻结已有对象，
+    #   子进程的垃圾回收不再扫描它们，写时复制共享的内存页不会被复制
+    # worker_gc_freeze: 是否冻结（默认 True）
+    # worker_preload_modules: 额外预先导入的模块（任务中延迟导入的模块；不要放 numpy / torch）
+    worker_gc_freeze=True,
+    worker_preload_modules=[],
+    
     # 其他 Worker 配置（可选，使用默认值）
     # worker_concurrency: Worker 并发数（默认是 CPU 核心数）
     # worker_pool: Worker 池类型（'prefork', 'solo', 'eventlet', 'gevent'）
@@ -181,9 +283,37 @@ app.conf.update(
     #   - 'eventlet': 协程（适合 I/O 密集型，需要 pip install eventlet）
     #   - 'gevent': 协程（适合 I/O 密集型，需要 pip install gevent）
     #   - 'solo': 单线程（仅用于调试）
+    #   - 自定义 asyncio 池: async def 任务在事件循环中执行，不需要 monkey patch
+    #     CELERY_CUSTOM_WORKER_POOL=extensions.asyncio_pool:AsyncIOPool --pool=custom
+    #     （详见 extensions/asyncio_pool.py）
+    # worker_asyncio_threads: asyncio 池中执行同步任务的线程数（默认 4）
+    # worker_asyncio_trace_threads: asyncio 池中保存结果、确认消息的线程数（默认 4）
     # task_acks_late: 任务完成后才确认（默认 False）
     # task_reject_on_worker_lost: Worker 丢失时拒绝任务（默认 False）
     
+    # 多执行池: 一个 Worker 同时托管多个池，按任务 / 队列选择执行池
+    #   CELERY_CUSTOM_WORKER_POOL=extensions.multi_pool:MultiPool --pool=custom
+    #   （详见 extensions/multi_pool.py）
+    # worker_pools: 池名 → (池实现, 并发数)，第一个池是默认池
+    worker_pools={
+        'prefork': ('prefork', 4),                                  # CPU 密集型（process_image 等）
+        'threads': ('threads', 20),                                 # 阻塞 I/O（send_email 等）
+        'asyncio': ('extensions.asyncio_pool:AsyncIOPool', 1000),   # async def 任务
+    },
+    # worker_pool_routes: 队列 → 池名；任务属性 execution_pool 优先于队列映射
+    worker_pool_routes={
+        'io': 'asyncio',
+    },
+    
+    # 模型缓存（详见 extensions/model_cache.py）:
+    # model_cache_dir: 导出的模型权重目录，同一台机器上的子进程通过内存映射共享
+    # model_mmap_mode: 'c' 写时复制（数组可写）/ 'r' 只读
+    # worker_preload_models: 子进程启动时（fork 之后）加载的模型，例如 ['text-classifier']
+    #   （需要安装 numpy: uv sync --extra ml）
+    model_cache_dir='model-cache',
+    model_mmap_mode='c',
+    worker_preload_models=[],
+    
     # ------------------------------------------------------------------------
     # 7. 结果后端配置
     # ------------------------------------------------------------------------
@@ -193,12 +323,50 @@ app.conf.update(
     #   推荐: 根据实际需求设置（1小时到几天不等）
     result_expires=3600,  # 1小时后过期
     
+    # result_retention: 按任务名的结果保留时间（秒），第一个匹配的模式生效
+    #   结果清理器（extensions/result_sweeper.py）用 SCAN 遍历结果键，
+    #   把已完成结果的过期时间设置为 完成时间 + 保留时间（可以长于 result_expires），
+    #   未匹配的任务使用 result_expires
+    result_retention={
+        'tasks.basic_tasks.*': 600,                       # 简单计算结果很快就没用了
+        'tasks.realworld_tasks.send_email': 600,
+        'tasks.realworld_tasks.generate_report': 86400,   # 报告结果保留 1 天
+    },
+    # result_compress_threshold: 超过该字节数的已完成结果由清理器改写为 zlib 压缩形式
+    # result_archive_threshold: 超过该字节数的结果写入 result_archive_dir（默认关闭；
+    #   多台机器的 Worker 与客户端需要能访问同一个归档目录，例如共享存储，
+    #   读不到归档文件时 AsyncResult.get() 抛出 ArchivedResultUnavailable）
+    result_compress_threshold=64 * 1024,
+    result_archive_threshold=None,
+    
+    # 分层结果后端（RESULT_BACKEND_CLASS=extensions.tiered_backend:TieredRedisBackend）:
+    # result_hot_window: 已完成的结果在 Redis 中保留的秒数，之后降级到本地分段存储
+    # result_tier_path: 分段存储目录，所有读取结果的主机都需要能访问（共享存储）
+    # result_tier_min_size: 小于该字节数的结果不降级
+    result_hot_window=60,
+    result_tier_path='result-tier',
+    result_tier_min_size=4096,
+    
     # ------------------------------------------------------------------------
     # 8. 定时任务配置（Beat Schedule）
     # ------------------------------------------------------------------------
     # beat_schedule: 定义定时任务的调度计划
     #   需要启动 Celery Beat 进程来执行定时任务
     #   启动命令: celery -A celery_app beat --loglevel=info
+    #
+    # beat_scheduler: Beat 调度器实现
+    #   HeapScheduler 按到期时间维护最小堆，tick 为 O(log n)，
+    #   固定间隔任务以计划时间为基准计算下一次执行，没有累积漂移；
+    #   与 Celery 默认调度器一样把 last_run_at 保存在 shelve 文件（celerybeat-schedule）中
+    #   （详见 extensions/heap_scheduler.py）
+    beat_scheduler='extensions.heap_scheduler:HeapScheduler',
+    #
+    # 高可用 Beat: 以 -S extensions.beat_leader:LeaderScheduler 启动多个 Beat，
+    #   通过 Redis 租约选主，只有主节点发送任务（详见 extensions/beat_leader.py）
+    # beat_leader_lease_ttl: 租约时长（秒），主节点失联后最多这么久由备用节点接管
+    # beat_catch_up: 主备切换期间错过的触发如何补发 'skip' / 'once' / 'all'
+    beat_leader_lease_ttl=10,
+    beat_catch_up='once',
     beat_schedule={
         # 每30秒执行一次简单任务
         'periodic-simple-task': {
@@ -216,6 +384,18 @@ app.conf.update(
             'task': 'tasks.basic_tasks.weekly_task',
             'schedule': crontab(hour=9, minute=0, day_of_week=1),
         },
+        # 每5分钟按租户扇出同步任务：Beat 直接展开租户列表并批量发布，
+        # 各租户的任务在 60 秒内按固定偏移打散（详见 extensions/fan_out.py）
+        'tenant-sync': {
+            'task': 'tasks.realworld_tasks.sync_tenant',
+            'schedule': 300.0,
+            'options': {
+                'fan_out': {
+                    'tenants': 'tasks.realworld_tasks.list_tenants',
+                    'spread': 60,
+                },
+            },
+        },
         # 更多调度方式示例:
         # - crontab(minute='*/5'): 每5分钟
         # - crontab(day_of_month=1): 每月1号
@@ -223,6 +403,27 @@ app.conf.update(
     },
 )
 
+# 在每个 Worker 中运行延迟队列搬运器，把到期任务移入目标队列
+if DELAY_QUEUE:
+    from extensions.delay_queue import DelayQueueMover
+    app.steps['worker'].add(DelayQueueMover)
+
+# 启用结果清理器时，在 Worker 中增量清理结果键：按任务名设置 TTL、压缩大结果
+if RESULT_SWEEPER:
+    from extensions.result_sweeper import ResultSweeperStep
+    # result_retention 按结果中的任务名匹配，原生后端只有开启 result_extended 才写入任务名
+    app.conf.result_extended = True
+    app.steps['worker'].add(ResultSweeperStep)
+
+# 使用分层结果后端时，在设置了 TIER_DEMOTER=true 的 Worker 中把过了热窗口的结果降级到分段存储
+# （详见 extensions/tiered_backend.py；result_tier_path 需要是所有读取结果的主机共享的存储）
+if TIER_DEMOTER:
+    from extensions.tiered_backend import TierDemoter
+    app.steps['worker'].add(TierDemoter)
+
+# Worker 父进程 fork 子进程之前预加载任务模块并冻结对象（worker_init / worker_ready 信号）
+import extensions.preload
+
 # 如果直接运行此文件，可以启动 worker
 if __name__ == '__main__':
     app.start()
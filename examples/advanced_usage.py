@@ -20,10 +20,14 @@ from tasks.advanced_tasks import (
     task_with_retry,
     task_with_custom_retry,
     create_task_chain_example,
+    create_fused_chain_example,
     create_task_group_example,
     create_chord_example
 )
 from celery import chain, group, chord
+from extensions.result_stream import iter_results
+from extensions.workflow_dag import Workflow
+from extensions.task_cache import cache_stats
 import time
 
 
@@ -45,6 +49,21 @@ def example_task_chain():
     print(f"最终结果: {result.get(timeout=30)}\n")
 
 
+def example_fused_chain():
+    """融合任务链示例 - 同队列的连续步骤在一个 Worker 进程中执行"""
+    print("=" * 50)
+    print("示例1.1: 融合任务链（Fused Chain）")
+    print("=" * 50)
+    
+    for name, workflow in [('普通链', create_task_chain_example()),
+                           ('融合链', create_fused_chain_example())]:
+        start = time.time()
+        result = workflow.apply_async()
+        value = result.get(timeout=30)
+        print(f"{name}: {time.time() - start:.2f} 秒, 结果: {value}")
+    print()
+
+
 def example_task_group():
     """任务组示例 - 并行执行"""
     print("=" * 50)
@@ -63,6 +82,36 @@ def example_task_group():
     print(f"并行执行结果: {result.get(timeout=30)}\n")
 
 
+def example_cached_fan_out():
+    """任务组示例 - 重复的扇出命中结果缓存"""
+    print("=" * 50)
+    print("示例2.2: 任务组（Group）- 结果缓存")
+    print("=" * 50)
+    
+    # 12 个成员只有 3 种不同参数，重复的成员直接返回缓存结果
+    for attempt in range(2):
+        job = group(process_item.s(f'item{i % 3}') for i in range(12))
+        start = time.time()
+        job.apply_async().get(timeout=30)
+        print(f"第 {attempt + 1} 次扇出: {time.time() - start:.2f} 秒")
+    print(f"缓存统计: {cache_stats().get(process_item.name)}\n")
+
+
+def example_task_group_streaming():
+    """任务组示例 - 按完成顺序流式处理结果"""
+    print("=" * 50)
+    print("示例2.1: 任务组（Group）- 流式获取结果")
+    print("=" * 50)
+    
+    job = group(fetch_data.s(f'source{i}') for i in range(1, 6))
+    result = job.apply_async()
+    
+    # result.get() 要等最慢的成员完成；iter_results() 每完成一个就产出一个
+    for index, task_id, value in iter_results(result, timeout=30):
+        print(f"成员 {index} 完成 (ID: {task_id[:8]}...): {value}")
+    print()
+
+
 def example_chord():
     """Chord 示例 - 并行执行 + 回调"""
     print("=" * 50)
@@ -141,6 +190,26 @@ def example_complex_workflow():
     print(f"最终结果: {result.get(timeout=60)}\n")
 
 
+def example_dag_workflow():
+    """DAG 工作流示例 - 菱形依赖"""
+    print("=" * 50)
+    print("示例7: DAG 工作流（菱形依赖）")
+    print("=" * 50)
+    
+    # process 与 save 都只依赖 fetch，二者并行执行；report 等待两者完成
+    dag = Workflow()
+    dag.add_node('fetch', fetch_data.s('main_source'))
+    dag.add_node('process', process_item.s(), deps=['fetch'])
+    dag.add_node('save', save_result.s(), deps=['fetch'])
+    dag.add_node('report', aggregate_results.s(), deps=['process', 'save'])
+    
+    start = time.time()
+    result = dag.apply_async()
+    print(f"DAG 工作流已提交，ID: {result.id}")
+    print(f"最终结果: {result.get(timeout=60)}")
+    print(f"耗时: {time.time() - start:.2f} 秒\n")
+
+
 if __name__ == '__main__':
     print("\n" + "=" * 50)
     print("Celery 高级用法示例")
@@ -148,11 +217,15 @@ if __name__ == '__main__':
     
     # 运行示例
     example_task_chain()
+    example_fused_chain()
     example_task_group()
+    example_task_group_streaming()
+    example_cached_fan_out()
     example_chord()
     example_task_retry()
     example_custom_retry()
     example_complex_workflow()
+    example_dag_workflow()
     
     print("所有高级示例执行完成！")
 
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+asyncio 客户端示例
+
+在事件循环中发布任务并 await 结果，不阻塞线程（详见 extensions/async_client.py）。
+需要先启动 Worker: ./start_worker.sh
+
+运行:
+    python examples/async_client_usage.py
+    python examples/async_client_usage.py --count 50000
+"""
+
+import sys
+from pathlib import Path
+import argparse
+import asyncio
+import time
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from tasks.basic_tasks import add
+
+
+async def single():
+    """发布一个任务并等待结果"""
+    print("\n[1] 单个任务")
+    result = await add.delay_async(4, 6)
+    print(f"  任务 ID: {result.id}")
+    print(f"  结果: {await result.aget(timeout=10)}")
+
+
+async def concurrent(count):
+    """并发发布 count 个任务，并在同一个订阅连接上等待全部结果"""
+    print(f"\n[2] 并发 {count} 个任务")
+    start = time.perf_counter()
+    results = await asyncio.gather(*(add.delay_async(i, i) for i in range(count)))
+    published = time.perf_counter() - start
+    values = await asyncio.gather(*(r.aget(timeout=300) for r in results))
+    elapsed = time.perf_counter() - start
+    assert values == [i * 2 for i in range(count)]
+    print(f"  发布耗时: {published:.2f} 秒")
+    print(f"  总耗时: {elapsed:.2f} 秒（{count / elapsed:.0f} 个/秒）")
+
+
+async def main(count):
+    print("=" * 70)
+    print("asyncio 客户端示例")
+    print("=" * 70)
+    await single()
+    await concurrent(count)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='asyncio 客户端示例')
+    parser.add_argument('--count', type=int, default=1000, help='并发任务数，默认 1000')
+    args = parser.parse_args()
+    asyncio.run(main(args.count))
@@ -83,6 +83,23 @@ def example_long_running_with_progress():
     print(f"任务完成: {result.get()}\n")
 
 
+def example_bulk_submit(count=10000):
+    """批量提交示例"""
+    print("=" * 50)
+    print("示例5: 批量提交（一次往返提交大量任务）")
+    print("=" * 50)
+    
+    # 逐个 delay(): 每个任务一次 LPUSH 往返
+    # send_tasks_bulk(): 按队列合并为多值 LPUSH，一个 pipeline 写入
+    start = time.time()
+    results = app.send_tasks_bulk(add.s(i, i) for i in range(count))
+    elapsed = time.time() - start
+    print(f"提交 {len(results)} 个任务耗时: {elapsed:.3f} 秒")
+    
+    # 结果句柄按需创建 AsyncResult
+    print(f"最后一个任务结果: {results[-1].get(timeout=60)}\n")
+
+
 if __name__ == '__main__':
     print("\n" + "=" * 50)
     print("Celery 基础用法示例")
@@ -93,6 +110,7 @@ if __name__ == '__main__':
     example_task_with_wait()
     example_batch_processing()
     example_long_running_with_progress()
+    example_bulk_submit()
     
     print("所有示例执行完成！")
 
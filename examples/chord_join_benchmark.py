@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Chord 汇合开销基准测试
+
+对比 Celery 原生 RedisBackend 与 LuaChordRedisBackend 的 on_chord_part_return() 开销。
+直接在当前进程中模拟 header 成员完成，不需要启动 Worker，只需要 Redis。
+
+测量的 header 大小: 10、1000、100000
+
+运行:
+    python examples/chord_join_benchmark.py
+    python examples/chord_join_benchmark.py --sizes 10 1000
+"""
+
+import sys
+from pathlib import Path
+import argparse
+import time
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from celery.app.task import Context
+from celery.backends.redis import RedisBackend
+from kombu.utils.uuid import uuid
+
+from celery_app import app, redis_url
+from extensions.chord_join import LuaChordRedisBackend
+from tasks.advanced_tasks import aggregate_results
+
+# 回调任务发送到单独的队列，测试结束后删除，避免被 Worker 消费
+BENCHMARK_QUEUE = 'chord_benchmark'
+
+
+def run_chord(backend, size):
+    """模拟一个大小为 size 的 chord，返回总耗时（秒）"""
+    group_id = uuid()
+    callback = aggregate_results.s().set(queue=BENCHMARK_QUEUE, priority=0)
+    backend.set_chord_size(group_id, size)
+    requests = [
+        Context(id=uuid(), group=group_id, group_index=i, chord=callback)
+        for i in range(size)
+    ]
+
+    start = time.perf_counter()
+    for i, request in enumerate(requests):
+        backend.on_chord_part_return(request, 'SUCCESS', f'processed_item{i}')
+    return time.perf_counter() - start
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='Chord 汇合开销基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000],
+                        help='header 成员数量，默认 10 1000 100000')
+    args = parser.parse_args()
+
+    backends = {
+        'RedisBackend': RedisBackend(app=app, url=redis_url),
+        'LuaChordRedisBackend': LuaChordRedisBackend(app=app, url=redis_url),
+    }
+
+    print("=" * 70)
+    print("Chord 汇合开销基准测试")
+    print("=" * 70)
+    print(f"{'后端':24s} {'header 大小':>12s} {'总耗时(秒)':>12s} {'每成员(微秒)':>14s}")
+    print("-" * 70)
+
+    try:
+        for size in args.sizes:
+            for name, backend in backends.items():
+                elapsed = run_chord(backend, size)
+                per_member = elapsed / size * 1e6
+                print(f"{name:24s} {size:12d} {elapsed:12.3f} {per_member:14.1f}")
+    finally:
+        app.backend.client.delete(BENCHMARK_QUEUE)
+
+    print("-" * 70)
+    print("说明: 原生实现每个成员一次 pipeline，最后一个成员额外 2~3 次往返；")
+    print("      Lua 实现每个成员一次 EVALSHA，最后一个成员在同一次调用中取回全部结果")
+
+
+if __name__ == '__main__':
+    main()
@@ -209,23 +209,26 @@ def demonstrate_comparison():
     print("\n对比表:")
     print("-" * 80)
     print("""
-  | 特性 | Eventlet | Prefork |
-  |------|----------|---------|
-  | 类型 | 协程 | 多进程 |
-  | 并发数 | 50-1000+ | CPU 核心数 |
-  | 内存占用 | 低 | 高 |
-  | CPU 密集型 | ❌ 差 | ✅ 最佳 |
-  | I/O 密集型 | ✅ 最佳 | ⚠️ 一般 |
-  | 多进程问题 | ✅ 无 | ❌ 有 |
+  | 特性 | Eventlet | asyncio 池 | Prefork |
+  |------|----------|------------|---------|
+  | 类型 | 协程 | 协程（async def） | 多进程 |
+  | 并发数 | 50-1000+ | 50-1000+ | CPU 核心数 |
+  | 内存占用 | 低 | 低 | 高 |
+  | CPU 密集型 | ❌ 差 | ❌ 差 | ✅ 最佳 |
+  | I/O 密集型 | ✅ 最佳 | ✅ 最佳 | ⚠️ 一般 |
+  | 多进程问题 | ✅ 无 | ✅ 无 | ❌ 有 |
+  | Monkey patch | ❌ 需要 | ✅ 不需要 | ✅ 不需要 |
     """)
     
     print("\n选择建议:")
     print("-" * 80)
     print("""
-  - I/O 密集型任务 → Eventlet
+  - I/O 密集型任务 → Eventlet，或 async def 任务 + asyncio 池
   - CPU 密集型任务 → Prefork
-  - 需要避免多进程问题 → Eventlet
-  - 需要高并发 → Eventlet
+  - 需要避免多进程问题 → Eventlet / asyncio 池
+  - 需要高并发 → Eventlet / asyncio 池
+  - 依赖与 monkey patch 不兼容的库（见 pytorch_numpy_fix.py）→ asyncio 池
+    POOL=asyncio ./start_worker.sh（详见 extensions/asyncio_pool.py）
     """)
 
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+fork 前预加载演示
+
+模拟 prefork 池创建子进程：父进程导入任务模块后 fork 出若干子进程，
+每个子进程执行 process_initializer 中的主要工作（为所有任务构建 tracer）
+并完成一次完整的垃圾回收（子进程运行一段时间后总会发生），然后报告：
+
+- 启动耗时：fork 到子进程就绪
+- 私有内存（Private_Clean + Private_Dirty）：子进程独占、没有与父进程共享的内存
+- Pss：按共享进程数分摊后的内存
+
+分别在普通导入与预加载（extensions/preload.py，gc.freeze）之后测量，不需要 Redis。
+
+    python examples/preload_demo.py --children 8
+"""
+
+import sys
+from pathlib import Path
+import argparse
+import gc
+import json
+import os
+import time
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from celery.app.trace import build_tracer
+
+from celery_app import app
+from extensions.preload import preload
+
+
+def memory_kb():
+    """当前进程的 Rss / Pss / 私有内存（KB）"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[key] = int(value.split()[0])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def child_main(write_fd, release_fd, forked_at):
+    for name, task in app.tasks.items():
+        task.__trace__ = build_tracer(name, task, app.loader, 'demo@localhost', app=app)
+    gc.collect()
+    startup = time.perf_counter() - forked_at
+    # 等待所有子进程都已启动，保证 Pss 按相同的共享进程数分摊
+    os.read(release_fd, 1)
+    report = {'startup': startup, **memory_kb()}
+    os.write(write_fd, json.dumps(report).encode() + b'\n')
+
+
+def spawn_children(count):
+    read_fd, write_fd = os.pipe()
+    release_r, release_w = os.pipe()
+    pids = []
+    for _ in range(count):
+        forked_at = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.close(release_w)
+            try:
+                child_main(write_fd, release_r, forked_at)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    os.close(write_fd)
+    os.close(release_r)
+    # 关闭写端，所有子进程的 read() 同时返回
+    time.sleep(0.5)
+    os.close(release_w)
+    with os.fdopen(read_fd) as reader:
+        reports = [json.loads(line) for line in reader]
+    for pid in pids:
+        os.waitpid(pid, 0)
+    return reports
+
+
+def show(title, reports):
+    n = len(reports)
+    startup = sum(r['startup'] for r in reports) / n * 1000
+    private = sum(r['private'] for r in reports) / n / 1024
+    pss = sum(r['pss'] for r in reports) / n / 1024
+    rss = sum(r['rss'] for r in reports) / n / 1024
+    print(f"  {title:<16} 启动 {startup:7.1f} 毫秒   私有 {private:6.1f} MB"
+          f"   Pss {pss:6.1f} MB   Rss {rss:6.1f} MB")
+    return private, startup
+
+
+def main(children):
+    print("=" * 70)
+    print(f"fork 前预加载演示: {children} 个子进程（平均值）")
+    print("=" * 70)
+
+    # Celery 默认行为：Worker 父进程导入 include 中的任务模块
+    app.loader.init_worker()
+    app.finalize(auto=True)
+    gc.collect()
+    baseline = show('普通导入', spawn_children(children))
+
+    stats = preload(app)
+    print(f"\n  预加载: {stats['tasks']} 个任务，冻结 {stats['frozen']} 个对象，"
+          f"用时 {stats['elapsed'] * 1000:.1f} 毫秒\n")
+    frozen = show('预加载 + freeze', spawn_children(children))
+
+    print(f"\n  每个子进程的私有内存减少 {baseline[0] - frozen[0]:.1f} MB，"
+          f"启动耗时减少 {baseline[1] - frozen[1]:.1f} 毫秒")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='fork 前预加载演示')
+    parser.add_argument('--children', type=int, default=4, help='子进程数，默认 4')
+    args = parser.parse_args()
+    main(args.children)
@@ -39,6 +39,22 @@ def example_send_email():
     print(f"邮件发送结果: {email_result}\n")
 
 
+def example_send_email_idempotent():
+    """幂等邮件发送示例"""
+    print("=" * 50)
+    print("示例1.1: 使用幂等键发送邮件")
+    print("=" * 50)
+    
+    # 同一个幂等键的邮件只会发送一次，第二次直接返回第一次的结果
+    for attempt in range(2):
+        result = send_email.apply_async(
+            args=['user@example.com', '欢迎注册', '感谢您的注册！'],
+            headers={'idempotency_key': 'welcome-user-42'},
+        )
+        print(f"第 {attempt + 1} 次提交，发送结果: {result.get(timeout=30)}")
+    print()
+
+
 def example_process_image():
     """图片处理示例"""
     print("=" * 50)
@@ -131,6 +147,20 @@ def example_generate_report():
     print(f"报告生成完成: {result.get()}\n")
 
 
+def example_report_dedup():
+    """并发提交去重示例"""
+    print("=" * 50)
+    print("示例5.1: 相同报告的并发提交")
+    print("=" * 50)
+    
+    date_range = {'start': '2024-02-01', 'end': '2024-02-29'}
+    # 模拟 5 个客户端同时请求同一份报告，只有一个任务进入队列
+    results = [generate_report.delay('monthly', date_range) for _ in range(5)]
+    task_ids = {result.id for result in results}
+    print(f"提交 {len(results)} 次，实际任务数: {len(task_ids)}")
+    print(f"报告生成完成: {results[0].get(timeout=60)}\n")
+
+
 def example_batch_emails():
     """批量发送邮件示例"""
     print("=" * 50)
@@ -162,10 +192,12 @@ if __name__ == '__main__':
     
     # 运行示例
     example_send_email()
+    example_send_email_idempotent()
     example_process_image()
     example_import_data()
     example_export_data()
     example_generate_report()
+    example_report_dedup()
     example_batch_emails()
     
     print("所有实际工程示例执行完成！")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+子进程回收策略吞吐量对比
+
+对比两种回收策略下 prefork 池的吞吐量、子进程创建次数与子进程内存峰值：
+
+1. max-tasks-per-child: Celery 默认策略，每个子进程执行固定数量的任务后回收
+2. memory: extensions/memory_recycler.py，按 RSS 高水位 / 增长 / 趋势回收
+
+基准任务在每个子进程的第一次调用时预热（模拟加载模型、建立连接），
+之后每次执行少量 CPU 计算，并可以按 --leak-kb 模拟内存泄漏。
+直接在本进程中创建执行池，不需要 Redis。
+
+    python examples/recycle_benchmark.py                         # 没有泄漏
+    python examples/recycle_benchmark.py --leak-kb 256           # 每个任务泄漏 256 KB
+    python examples/recycle_benchmark.py --leak-kb 256 --verbose # 显示每个回收决定
+"""
+
+import sys
+from pathlib import Path
+import argparse
+import ast
+import logging
+import os
+import threading
+import time
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from celery.app.trace import trace_task_ret
+from celery.concurrency.prefork import TaskPool
+from kombu.serialization import dumps
+from kombu.utils.uuid import uuid
+
+from celery_app import app
+from extensions.memory_recycler import RecyclePolicy, RecyclingTaskPool, rss_bytes
+
+TASK_NAME = 'examples.recycle_benchmark.work'
+
+# 子进程内的状态：预热标记与泄漏的内存
+_warm = False
+_leaked = []
+
+
+@app.task(name=TASK_NAME, ignore_result=True)
+def work(warmup, leak_kb, iterations=20000):
+    """基准任务：首次调用预热，之后执行少量计算，按需泄漏内存"""
+    global _warm
+    if not _warm:
+        time.sleep(warmup)
+        _warm = True
+    total = sum(i * i for i in range(iterations))
+    if leak_kb:
+        _leaked.append(b'x' * (leak_kb * 1024))
+    return {'pid': os.getpid(), 'rss': rss_bytes(), 'total': total}
+
+
+def run(pool, count, warmup, leak_kb):
+    """提交 count 个任务并等待全部完成，返回 (耗时, 子进程数, 子进程 RSS 峰值)"""
+    pool.start()
+    done = threading.Event()
+    results = []
+    lock = threading.Lock()
+
+    def on_result(ret):
+        with lock:
+            results.append(ret)
+            if len(results) == count:
+                done.set()
+
+    content_type, content_encoding, body = dumps(((warmup, leak_kb), {}, {}), 'json')
+    started = time.perf_counter()
+    for _ in range(count):
+        task_id = uuid()
+        request = {'id': task_id, 'task': TASK_NAME, 'delivery_info': {}}
+        pool.apply_async(trace_task_ret,
+                         args=(TASK_NAME, task_id, request, body, content_type, content_encoding),
+                         callback=on_result)
+    done.wait()
+    elapsed = time.perf_counter() - started
+    pool.stop()
+
+    # trace_task_ret 返回 (状态, 返回值的 repr, 耗时)
+    values = [ast.literal_eval(ret[1]) for ret in results]
+    pids = {value['pid'] for value in values}
+    peak = max((value['rss'] for value in values), default=0)
+    return elapsed, len(pids), peak
+
+
+def main(args):
+    app.set_current()
+    app.set_default()
+    options = {'app': app, 'threads': True, 'initargs': (app, 'bench@localhost'), 'putlocks': False}
+    policies = {
+        'max-tasks-per-child': lambda: TaskPool(
+            args.concurrency, maxtasksperchild=args.max_tasks_per_child, **options),
+        'memory': lambda: RecyclingTaskPool(
+            args.concurrency,
+            recycle_policy=RecyclePolicy(rss_limit=args.rss_limit,
+                                         growth_limit=args.growth_limit,
+                                         trend_limit=args.trend_limit,
+                                         window=args.window),
+            **options),
+    }
+
+    print("=" * 70)
+    print("子进程回收策略吞吐量对比")
+    print("=" * 70)
+    print(f"  任务数: {args.count}，并发数: {args.concurrency}，"
+          f"预热: {args.warmup} 秒，泄漏: {args.leak_kb} KB/任务")
+    print(f"  max-tasks-per-child: {args.max_tasks_per_child}")
+    print(f"  memory: 高水位 {args.rss_limit} MB，增长 {args.growth_limit} MB，"
+          f"斜率 {args.trend_limit} KB/任务（窗口 {args.window}）\n")
+    print(f"  {'策略':<22}{'耗时':>8}{'吞吐量':>12}{'子进程数':>10}{'RSS 峰值':>12}")
+
+    for name, create_pool in policies.items():
+        elapsed, children, peak = run(create_pool(), args.count, args.warmup, args.leak_kb)
+        print(f"  {name:<22}{elapsed:>7.2f}s{args.count / elapsed:>9.0f}/秒"
+              f"{children:>10}{peak / 1024 / 1024:>10.1f}MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='子进程回收策略吞吐量对比')
+    parser.add_argument('--count', type=int, default=20000, help='任务数，默认 20000')
+    parser.add_argument('--concurrency', type=int, default=4, help='子进程数，默认 4')
+    parser.add_argument('--warmup', type=float, default=0.5,
+                        help='每个子进程首次执行任务时的预热耗时（秒），默认 0.5')
+    parser.add_argument('--leak-kb', type=int, default=0, help='每个任务泄漏的内存（KB），默认 0')
+    parser.add_argument('--max-tasks-per-child', type=int, default=1000,
+                        help='max-tasks-per-child 策略的任务数，默认 1000')
+    parser.add_argument('--rss-limit', type=int, default=512, help='memory 策略的高水位（MB），默认 512')
+    parser.add_argument('--growth-limit', type=int, default=256,
+                        help='memory 策略的增长上限（MB），默认 256')
+    parser.add_argument('--trend-limit', type=int, default=64,
+                        help='memory 策略的斜率上限（KB/任务），默认 64')
+    parser.add_argument('--window', type=int, default=200, help='memory 策略的斜率窗口（任务数），默认 200')
+    parser.add_argument('--verbose', action='store_true', help='输出每个回收决定')
+    args = parser.parse_args()
+    if args.verbose:
+        # 只输出回收日志，子进程 fork 时继承这个处理器
+        recycler_logger = logging.getLogger('extensions.memory_recycler')
+        recycler_logger.setLevel(logging.INFO)
+        recycler_logger.addHandler(logging.StreamHandler())
+        recycler_logger.propagate = False
+    main(args)
@@ -104,6 +104,25 @@ def demonstrate_solutions():
     ✅ 更频繁重启进程（防止内存问题）
     ✅ 添加超时限制
     """)
+    
+    print("\n方案 4: Prefork + fork 之后加载模型（保留多核）")
+    print("-" * 80)
+    print("""
+  # 模型在子进程启动后加载，权重通过内存映射在子进程之间共享
+  # 详见 extensions/model_cache.py 与 tasks/ml_tasks.py
+  @model('text-classifier', version='1', build=TextClassifier)
+  def export_text_classifier():
+      return {'embedding': ..., 'classifier': ...}
+
+  @app.task
+  def classify_text(text):
+      return get_model('text-classifier').predict(text)
+
+  改进点:
+    ✅ NumPy / PyTorch 的状态不跨越 fork（父进程不加载模型）
+    ✅ N 个子进程共享同一份权重（页缓存），而不是 N 份副本
+    ✅ 子进程回收重建时只需重新映射权重文件
+    """)
 
 
 def demonstrate_code_fixes():
@@ -7,7 +7,6 @@
 
 import sys
 from pathlib import Path
-import json
 
 # 添加项目根目录到 Python 路径
 project_root = Path(__file__).parent.parent
@@ -20,6 +19,7 @@ except ImportError:
     sys.exit(1)
 
 from celery_app import app
+from extensions.queue_inspector import iter_messages, queue_lengths, scan_queue
 
 
 def view_basic_queue():
@@ -76,60 +76,44 @@ def view_basic_queue():
     print(f"📦 队列: {queue_name}")
     print("-" * 80)
     
-    # 1. 查看队列长度
-    length = r.llen(queue_name)
+    # 1. 查看队列长度（设置了优先级时队列拆分为多个列表: basic、basic\x06\x163 ...）
+    lengths = queue_lengths(r, queue_name)
+    length = sum(lengths.values())
     print(f"队列长度: {length} 个任务")
+    for key, sub_length in lengths.items():
+        print(f"  {key!r}: {sub_length}")
     
     if length == 0:
         print("\n队列为空，没有待执行的任务")
         return
     
     # 2. 查看队列中的任务（不删除）
+    # 每个元素是 kombu 消息信封：任务 ID、任务名等在 headers 中，
+    # 参数在 base64 编码的 body 中，由 queue_inspector 解码
     print(f"\n队列内容（前 10 个任务，不删除）:")
     print("-" * 80)
     
-    items = r.lrange(queue_name, 0, 9)  # 获取前10个，不删除
-    
-    for i, item in enumerate(items, 1):
+    for i, message in enumerate(iter_messages(r, queue_name, limit=10, decode_body=True), 1):
         print(f"\n[{i}] 任务消息:")
-        try:
-            # 尝试解析 JSON
-            task_data = json.loads(item)
-            
-            print(f"   任务ID: {task_data.get('id', 'N/A')}")
-            print(f"   任务名称: {task_data.get('task', 'N/A')}")
-            
-            args = task_data.get('args', [])
-            kwargs = task_data.get('kwargs', {})
-            print(f"   参数: args={args}, kwargs={kwargs}")
-            
-            retries = task_data.get('retries', 0)
-            print(f"   重试次数: {retries}")
-            
-            eta = task_data.get('eta')
-            if eta:
-                print(f"   执行时间: {eta}")
-            
-            expires = task_data.get('expires')
-            if expires:
-                print(f"   过期时间: {expires}")
-            
-            # 显示完整消息（可选）
-            print(f"   完整消息: {item[:200]}...")
-            
-        except json.JSONDecodeError:
-            print(f"   ⚠️  无法解析 JSON: {item[:100]}...")
+        print(f"   任务ID: {message.id}")
+        print(f"   任务名称: {message.task}")
+        print(f"   参数: args={message.args}, kwargs={message.kwargs}")
+        print(f"   重试次数: {message.retries}")
+        print(f"   优先级: {message.priority}")
+        if message.eta:
+            print(f"   执行时间: {message.eta}")
+        if message.expires:
+            print(f"   过期时间: {message.expires}")
+        print(f"   消息大小: {message.size} 字节")
     
     if length > 10:
         print(f"\n... 还有 {length - 10} 个任务在队列中")
     
-    # 3. 查看队列统计
+    # 3. 查看队列统计（分页扫描整个队列，只解码消息头）
     print("\n" + "=" * 80)
     print("队列统计")
     print("=" * 80)
-    print(f"总任务数: {length}")
-    print(f"已显示: {min(10, length)}")
-    print(f"剩余: {max(0, length - 10)}")
+    print(scan_queue(r, queue_name).report())
 
 
 def view_all_celery_queues():
@@ -169,7 +153,7 @@ def view_all_celery_queues():
     print("\n队列统计:")
     print("-" * 80)
     for queue_name in queue_names:
-        length = r.llen(queue_name)
+        length = sum(queue_lengths(r, queue_name).values())
         status = "🟢" if length > 0 else "⚪"
         print(f"  {status} {queue_name:15s}: {length:4d} 个任务")
 
@@ -190,6 +174,7 @@ def view_redis_cli_commands():
     print("-" * 80)
     print("   LLEN basic")
     print("   # 返回队列中的任务数量")
+    print("   # 设置了优先级的任务在子队列中: basic\\x06\\x163、basic\\x06\\x166 ...")
     
     print("\n3. 查看队列内容（不删除）")
     print("-" * 80)
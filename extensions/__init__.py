@@ -0,0 +1,5 @@
+"""
+扩展模块包
+
+在 Celery 原生能力之上实现的性能优化组件
+"""
@@ -0,0 +1,326 @@
+"""
+asyncio 客户端（Async Client）
+
+examples/ 与 main.py 中的客户端都阻塞在 result.get() 或 time.sleep() 轮询上。
+在 asyncio 的 API 服务中，每个阻塞调用都要占用一个线程（run_in_executor），
+同时等待几万个结果就需要几万个线程或者一个个串行等待。
+
+本模块提供原生 asyncio 的发布与等待：
+
+    result = await add.apply_async_async((1, 2))
+    value = await result.aget(timeout=10)
+
+发布：
+- 与批量发布（extensions/bulk_publish.py）共用消息模板，在事件循环中构建消息，
+  通过 redis.asyncio 直接 LPUSH，不经过线程池
+- 同一轮事件循环中发出的消息合并到一个 pipeline 中（与 send_tasks_bulk 相同的多值 LPUSH）
+- 带 countdown / eta / link 等选项的任务，以及重写了 apply_async() 的任务基类
+  （例如 DeduplicatedTask）回退到线程池中的 apply_async()
+
+等待：
+- Redis 结果后端在写入结果时会 PUBLISH 到与结果键同名的频道
+- 每个事件循环只有一个订阅连接，所有等待中的协程共享：
+  新的等待先合并成一批 SUBSCRIBE，订阅之后再 MGET 一次，避免订阅之前已经完成的结果被错过
+- 结果到达后唤醒该任务的所有等待者，并批量 UNSUBSCRIBE
+- 每个等待只是一个 Future，一个进程可以同时等待数万个结果
+
+用法:
+    from extensions.async_client import async_client
+
+    client = async_client(app)
+    results = [await client.apply_async('tasks.basic_tasks.add', (i, i)) for i in range(1000)]
+    values = await asyncio.gather(*(r.aget(timeout=30) for r in results))
+"""
+
+import asyncio
+import weakref
+
+from celery import Task, states
+from celery.exceptions import TimeoutError
+from celery.result import AsyncResult
+
+from extensions.bulk_publish import BulkPublisher
+from extensions.tiered_backend import TIER_PREFIX
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def _strip_backend_class(url):
+    """'extensions.chord_join:LuaChordRedisBackend+redis://...' → 'redis://...'"""
+    scheme, sep, rest = url.partition('://')
+    if '+' in scheme:
+        scheme = scheme.split('+', 1)[1]
+    return scheme + sep + rest
+
+
+def _as_str(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _is_tier_marker(backend, value):
+    """分层结果后端中已降级到冷层的结果（Redis 中只剩标记）"""
+    if value is None or not hasattr(backend, 'merge_cold'):
+        return False
+    return (value if isinstance(value, bytes) else value.encode()).startswith(TIER_PREFIX)
+
+
+def _restore_cold(backend, items):
+    """
+    在线程池中从冷层读取已降级的结果（SQLite 查询与 pread 不在事件循环中执行）
+
+    返回:
+        [(键, 值, 异常)]，每个键单独读取，一个键读不到不影响其他键
+    """
+    restored = []
+    for key, marker in items:
+        try:
+            restored.append((key, backend.merge_cold([key], [marker])[0], None))
+        except Exception as exc:  # pylint: disable=broad-except
+            restored.append((key, None, exc))
+    return restored
+
+
+class AsyncTaskResult(AsyncResult):
+    """支持 await 的结果对象"""
+
+    async def aget(self, timeout=None, propagate=True):
+        """
+        等待任务完成并返回结果
+
+        参数:
+            timeout: 超时时间（秒），None 表示一直等待
+            propagate: 任务失败时是否抛出任务的异常
+        """
+        meta = await async_client(self.app).wait_for(self.id, timeout)
+        if meta['status'] in states.PROPAGATE_STATES and propagate:
+            raise meta['result']
+        return meta['result']
+
+    async def astate(self):
+        """读取当前状态（不等待）"""
+        meta = await async_client(self.app).get_meta(self.id)
+        return meta['status'] if meta else states.PENDING
+
+
+class ResultListener:
+    """在一个订阅连接上复用所有等待中的协程"""
+
+    def __init__(self, client, backend):
+        self.client = client
+        self.backend = backend
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+        # 结果键 → 等待该结果的 Future 列表
+        self.waiters = {}
+        self._to_subscribe = set()
+        self._to_unsubscribe = set()
+        self._flush_scheduled = False
+        self._reader = None
+
+    def wait(self, key):
+        future = asyncio.get_running_loop().create_future()
+        waiters = self.waiters.get(key)
+        if waiters is None:
+            waiters = self.waiters[key] = []
+            self._to_subscribe.add(key)
+            self._to_unsubscribe.discard(key)
+            self._schedule_flush()
+        waiters.append(future)
+        return future
+
+    def discard(self, key, future):
+        """等待被取消（超时）时移除 Future，没有等待者时退订"""
+        waiters = self.waiters.get(key)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self.waiters[key]
+                self._to_subscribe.discard(key)
+                self._to_unsubscribe.add(key)
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self):
+        """把本轮新增的订阅 / 退订合并成一条命令"""
+        await asyncio.sleep(0)
+        self._flush_scheduled = False
+        unsubscribe, self._to_unsubscribe = list(self._to_unsubscribe), set()
+        if unsubscribe and self.pubsub.connection is not None:
+            await self.pubsub.unsubscribe(*unsubscribe)
+        subscribe, self._to_subscribe = list(self._to_subscribe), set()
+        if not subscribe:
+            return
+        await self.pubsub.subscribe(*subscribe)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.get_running_loop().create_task(self._read())
+        # 订阅之前已经完成的结果不会再发布，订阅之后补读一次
+        values = await self.client.mget(subscribe)
+        cold = []
+        for key, value in zip(subscribe, values):
+            if _is_tier_marker(self.backend, value):
+                cold.append((key, value))
+            elif value is not None:
+                self._deliver(key, value)
+        if not cold:
+            return
+        restored = await asyncio.get_running_loop().run_in_executor(
+            None, _restore_cold, self.backend, cold)
+        for key, value, exc in restored:
+            if exc is not None:
+                self._fail(key, exc)
+            elif value is not None:
+                self._deliver(key, value)
+
+    async def _read(self):
+        # 没有等待者后继续读取，直到退订确认全部到达
+        while self.waiters or self._to_subscribe or self.pubsub.subscribed:
+            message = await self.pubsub.get_message(timeout=1.0)
+            if message is not None and message['type'] == 'message':
+                self._deliver(_as_str(message['channel']), message['data'])
+
+    def _deliver(self, key, payload):
+        if key not in self.waiters:
+            return
+        meta = self.backend.decode_result(payload)
+        if meta['status'] not in states.READY_STATES:
+            return
+        for future in self.waiters.pop(key):
+            if not future.done():
+                future.set_result(meta)
+        self._to_unsubscribe.add(key)
+        self._schedule_flush()
+
+    def _fail(self, key, exc):
+        """读取结果失败（例如 ColdResultUnavailable）时把异常交给该键的所有等待者"""
+        if key not in self.waiters:
+            return
+        for future in self.waiters.pop(key):
+            if not future.done():
+                future.set_exception(exc)
+        self._to_unsubscribe.add(key)
+        self._schedule_flush()
+
+
+class AsyncClient:
+    """绑定到一个事件循环的 asyncio 客户端"""
+
+    def __init__(self, app):
+        import redis.asyncio as aioredis
+
+        self.app = app
+        self.backend = app.backend
+        self.broker = aioredis.from_url(app.conf.broker_url)
+        self.results = aioredis.from_url(_strip_backend_class(app.conf.result_backend))
+        self.listener = ResultListener(self.results, self.backend)
+        self.publisher = BulkPublisher(app)
+        self._channel = None
+        # 本轮事件循环中待发布的消息: [(Redis 列表键, 消息, Future)]
+        self._outbox = []
+
+    async def _kombu_channel(self):
+        """构建消息模板用的 kombu Channel（建立连接是阻塞操作，放到线程池中执行一次）"""
+        if self._channel is None:
+            # 并发的第一批发布共享同一个 Future，只建立一个连接
+            connection = self.app.connection_for_write()
+            self._channel = asyncio.ensure_future(
+                asyncio.to_thread(lambda: connection.default_channel))
+        return await self._channel
+
+    async def apply_async(self, task, args=None, kwargs=None, **options):
+        """
+        发布任务并返回 AsyncTaskResult
+
+        参数:
+            task: 任务对象或任务名
+            args / kwargs: 任务参数
+            options: 与 apply_async() 相同的执行选项
+        """
+        name = task if isinstance(task, str) else task.name
+        signature = self.app.signature(name, args=args or (), kwargs=kwargs or {},
+                                       options=options)
+        exec_options = self.publisher.fast_path_options(signature)
+        if exec_options is None:
+            # countdown / eta / link、去重等：走标准发布路径（包括延迟队列）
+            result = await asyncio.to_thread(signature.apply_async)
+            return AsyncTaskResult(result.id, app=self.app)
+
+        channel = await self._kombu_channel()
+        key, payload, task_id = self.publisher.build_message(channel, signature, exec_options)
+        future = asyncio.get_running_loop().create_future()
+        self._outbox.append((key, payload, future))
+        if len(self._outbox) == 1:
+            asyncio.get_running_loop().create_task(self._flush_outbox())
+        await future
+        return AsyncTaskResult(task_id, app=self.app)
+
+    async def _flush_outbox(self):
+        await asyncio.sleep(0)
+        outbox, self._outbox = self._outbox, []
+        queues = {}
+        for key, payload, _ in outbox:
+            queues.setdefault(key, []).append(payload)
+        try:
+            async with self.broker.pipeline(transaction=False) as pipe:
+                for key, payloads in queues.items():
+                    pipe.lpush(key, *payloads)
+                await pipe.execute()
+        except Exception as exc:  # pylint: disable=broad-except
+            for _, _, future in outbox:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for _, _, future in outbox:
+            if not future.done():
+                future.set_result(None)
+
+    async def wait_for(self, task_id, timeout=None):
+        """等待任务完成，返回结果元数据"""
+        key = _as_str(self.backend.get_key_for_task(task_id))
+        future = self.listener.wait(key)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.listener.discard(key, future)
+            raise TimeoutError(f'任务 {task_id} 在 {timeout} 秒内未完成') from None
+        except asyncio.CancelledError:
+            self.listener.discard(key, future)
+            raise
+
+    async def get_meta(self, task_id):
+        """读取一次结果元数据，不存在时返回 None"""
+        key = self.backend.get_key_for_task(task_id)
+        value = await self.results.get(key)
+        if _is_tier_marker(self.backend, value):
+            value = (await asyncio.get_running_loop().run_in_executor(
+                None, self.backend.merge_cold, [key], [value]))[0]
+        return self.backend.decode_result(value) if value is not None else None
+
+    async def close(self):
+        await self.listener.pubsub.aclose()
+        await self.broker.aclose()
+        await self.results.aclose()
+
+
+def async_client(app):
+    """当前事件循环的 AsyncClient（redis.asyncio 的连接不能跨事件循环使用）"""
+    loop = asyncio.get_running_loop()
+    per_app = _clients.setdefault(loop, {})
+    client = per_app.get(id(app))
+    if client is None:
+        client = per_app[id(app)] = AsyncClient(app)
+    return client
+
+
+class AsyncTask(Task):
+    """带 asyncio 发布方法的任务基类（celery_app 中的默认任务类）"""
+
+    async def apply_async_async(self, args=None, kwargs=None, **options):
+        """apply_async() 的 asyncio 版本，返回 AsyncTaskResult"""
+        return await async_client(self._get_app()).apply_async(self, args, kwargs, **options)
+
+    async def delay_async(self, *args, **kwargs):
+        """delay() 的 asyncio 版本"""
+        return await self.apply_async_async(args, kwargs)
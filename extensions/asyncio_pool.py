@@ -0,0 +1,230 @@
+"""
+asyncio 执行池（AsyncIO Pool）
+
+send_email、fetch_data 这类 I/O 密集型任务通常使用 eventlet / gevent 池，
+但它们依赖 monkey patch，与部分库（C 扩展、PyTorch 等，见 examples/pytorch_numpy_fix.py）不兼容。
+
+AsyncIOPool 在 Worker 进程中运行一个事件循环，用 async def 定义的任务直接在事件循环中执行：
+
+    @app.task(name='tasks.async_tasks.fetch_url', base=AsyncIOTask, bind=True)
+    async def fetch_url(self, url):
+        ...
+
+启动:
+    CELERY_CUSTOM_WORKER_POOL=extensions.asyncio_pool:AsyncIOPool \\
+        celery -A celery_app worker --pool=custom --concurrency=1000 --queues=io
+
+执行过程：
+1. 并发上限: --concurrency 即同时执行的协程数（asyncio.Semaphore），超出的任务在池内排队
+2. 协程在事件循环中执行到完成；self.request 通过 ContextVar 按协程隔离
+3. 协程的返回值 / 异常交给 Celery 标准追踪器（trace_task），保存结果、重试、回调、信号
+   都与其他池一致；追踪器（store_result、确认消息等阻塞 I/O）与接收回调在专用线程池中执行
+   （worker_asyncio_trace_threads，默认 4 个线程），事件循环只 await 协程本身
+4. 时间限制: 软限制与硬限制都会取消协程（协程在 await 处收到 CancelledError，可以清理），
+   结果分别记为 SoftTimeLimitExceeded / TimeLimitExceeded
+5. 普通（同步）任务在线程池中执行，与 threads 池相同（worker_asyncio_threads，默认 4 个线程）
+
+限制:
+- task_prerun 信号与 STARTED 状态在协程完成后才由追踪器发出
+- 不支持 revoke(terminate=True)；一个 Worker 进程一个事件循环，多核需要启动多个 Worker
+
+AsyncIOTask 也可以在其他池中执行：不在事件循环中调用时用 asyncio.run() 执行到完成，
+在其他协程中直接调用时返回协程对象（await fetch_url('...')）。
+"""
+
+import asyncio
+import contextvars
+import inspect
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextvars import ContextVar
+
+from celery.app import trace
+from celery.app.task import Context
+from celery.concurrency.base import BasePool, apply_target
+from celery.concurrency.thread import ApplyResult
+from celery.exceptions import SoftTimeLimitExceeded, TimeLimitExceeded
+from celery.utils.nodenames import gethostname
+from kombu.serialization import loads as loads_message
+from kombu.serialization import prepare_accept_content
+
+from extensions.async_client import AsyncTask
+
+# 当前协程的任务请求
+_current_request = ContextVar('asyncio_task_request', default=None)
+# 追踪器调用 AsyncIOTask.__call__ 时交回的执行结果: (是否成功, 返回值或异常)
+_outcome = ContextVar('asyncio_task_outcome', default=None)
+
+
+async def _run_with_request(coroutine, request):
+    _current_request.set(request)
+    return await coroutine
+
+
+class AsyncIOTask(AsyncTask):
+    """async def 任务的基类"""
+
+    def _get_request(self):
+        request = _current_request.get()
+        return request if request is not None else super()._get_request()
+
+    request = property(_get_request)
+
+    def __call__(self, *args, **kwargs):
+        outcome = _outcome.get()
+        if outcome is not None:
+            # AsyncIOPool 中协程已经执行完成，追踪器只需要拿到结果
+            ok, value = outcome
+            if ok:
+                return value
+            raise value
+
+        request = self.request
+        result = self.run(*args, **kwargs)
+        if not inspect.isawaitable(result):
+            return result
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # prefork / solo / eager：在临时事件循环中执行到完成
+            return asyncio.run(_run_with_request(result, request))
+        return result
+
+
+class AsyncIOPool(BasePool):
+    """在 Worker 进程的事件循环中执行 async def 任务"""
+
+    signal_safe = False
+    body_can_be_buffer = True
+
+    def on_start(self):
+        self.loop = asyncio.new_event_loop()
+        self.slots = asyncio.Semaphore(self.limit or 100)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.app.conf.get('worker_asyncio_threads', 4))
+        # 追踪器保存结果、确认消息都是阻塞 I/O，不能在事件循环线程中执行
+        self.trace_executor = ThreadPoolExecutor(
+            max_workers=self.app.conf.get('worker_asyncio_trace_threads', 4),
+            thread_name_prefix='AsyncIOPool-trace')
+        self.accept = prepare_accept_content(self.app.conf.accept_content)
+        self._pending = set()
+        self._running = 0
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name='AsyncIOPool', daemon=True)
+        self._thread.start()
+
+    def on_stop(self):
+        # 热关闭：等待已接收的任务执行完成
+        wait(list(self._pending))
+        self._shutdown()
+
+    def on_terminate(self):
+        self._shutdown()
+
+    def _shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.executor.shutdown(wait=False)
+        self.trace_executor.shutdown(wait=False)
+
+    def on_apply(self, target, args=None, kwargs=None, callback=None,
+                 accept_callback=None, timeout=None, soft_timeout=None, **_):
+        task = self.app.tasks.get(args[0])
+        if isinstance(task, AsyncIOTask) and inspect.iscoroutinefunction(task.run):
+            future = asyncio.run_coroutine_threadsafe(
+                self._execute(task, target, args, kwargs, callback, accept_callback,
+                              timeout, soft_timeout),
+                self.loop)
+        else:
+            future = self.executor.submit(apply_target, target, args, kwargs,
+                                          callback, accept_callback)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return ApplyResult(future)
+
+    async def _execute(self, task, target, args, kwargs, callback, accept_callback,
+                       timeout, soft_timeout):
+        name, task_id, request, body, content_type, content_encoding = args
+        async with self.slots:
+            if accept_callback:
+                # 接收回调可能确认消息（acks_late=False）、发送 task-started 事件
+                await self._in_trace_thread(accept_callback, os.getpid(), time.monotonic())
+            # 与 fast_trace_task() 相同的消息解码
+            if content_type:
+                task_args, task_kwargs, embed = loads_message(
+                    body, content_type, content_encoding, accept=self.accept)
+            else:
+                task_args, task_kwargs, embed = body
+            context = Context(dict(request), args=task_args, kwargs=task_kwargs,
+                              hostname=self._hostname(), is_eager=False,
+                              called_directly=False, **embed or {})
+            _current_request.set(context)
+
+            self._running += 1
+            try:
+                outcome = await self._run(task, task_args, task_kwargs,
+                                          timeout, soft_timeout)
+            finally:
+                self._running -= 1
+
+            # 追踪器得到已解码的参数（content_type 为空），
+            # 由它保存结果、发送回调与信号，返回值交给 Worker
+            await self._in_trace_thread(
+                self._trace, outcome, target,
+                (name, task_id, request, (task_args, task_kwargs, embed), None, None),
+                kwargs, callback)
+
+    def _in_trace_thread(self, fn, *args):
+        """在追踪线程中执行 fn，沿用当前协程的上下文（_current_request）"""
+        context = contextvars.copy_context()
+        return self.loop.run_in_executor(self.trace_executor, context.run, fn, *args)
+
+    @staticmethod
+    def _trace(outcome, target, args, kwargs, callback):
+        _outcome.set(outcome)
+        apply_target(target, args, kwargs, callback)
+
+    async def _run(self, task, args, kwargs, timeout, soft_timeout):
+        """执行协程，返回 (是否成功, 返回值或异常)"""
+        inner = asyncio.ensure_future(task.run(*args, **kwargs))
+        expired = []
+
+        def expire(exc):
+            if not inner.done():
+                expired.append(exc)
+                inner.cancel()
+
+        timers = []
+        if soft_timeout:
+            timers.append(self.loop.call_later(
+                soft_timeout, expire, SoftTimeLimitExceeded(soft_timeout)))
+        if timeout:
+            timers.append(self.loop.call_later(
+                timeout, expire, TimeLimitExceeded(timeout)))
+        try:
+            return True, await inner
+        except asyncio.CancelledError:
+            if not expired:
+                raise
+            return False, expired[0]
+        except Exception as exc:  # pylint: disable=broad-except
+            return False, exc
+        finally:
+            for timer in timers:
+                timer.cancel()
+
+    def _hostname(self):
+        # setup_worker_optimizations() 保存了 Worker 的节点名
+        return trace._localized[2] if trace._localized else gethostname()
+
+    def _get_info(self):
+        info = super()._get_info()
+        info.update({
+            'running': self._running,
+            'pending': len(self._pending),
+            'threads': len(self.executor._threads),
+            'trace-threads': len(self.trace_executor._threads),
+        })
+        return info
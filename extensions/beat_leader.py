@@ -0,0 +1,241 @@
+"""
+高可用 Beat（Leader Election）
+
+start_beat.sh 只运行一个 Beat 进程：它挂掉时定时任务全部停止；
+同时运行两个又会让 periodic_task、daily_task、weekly_task 被重复发送。
+
+LeaderScheduler 允许同时运行多个 Beat，只有持有 Redis 租约的一个真正发送任务：
+
+    beat-leader（租约）: "<fencing token>:<节点标识>"，lease_ttl 秒后过期
+    beat-leader-fence : 单调递增的 fencing token
+
+1. 选主：租约不存在时 INCR 得到新的 fencing token 并写入租约（Lua 脚本原子完成）；
+   主节点每 lease_ttl / 3 秒续约一次，备用节点以同样的间隔尝试获取租约，
+   主节点失联后最多 lease_ttl 秒内由备用节点接管
+2. fencing：每次发送前在同一个 Lua 脚本中检查租约仍然是自己的 token，
+   因 GC / 网络停顿而失去租约的旧主节点不会再发送任何任务
+3. 每次触发的去重键：beat-fire:<条目名>:<计划时间>，SET NX 成功才发送；
+   切换期间新旧主节点对同一次触发最多发送一次
+4. 补发：主节点记录每个条目最后一次触发的计划时间（beat-last-run 哈希），
+   新主节点接管时按 beat_catch_up 策略处理切换期间错过的触发：
+   - 'skip'：不补发，从下一个周期继续
+   - 'once'：错过多次也只补发一次（默认）
+   - 'all'：逐次补发，最多 beat_max_catch_up 次
+
+启用方式（可以在多台机器上各启动一个）:
+    celery -A celery_app beat -S extensions.beat_leader:LeaderScheduler
+    celery -A celery_app beat -S extensions.beat_leader:LeaderDatabaseScheduler
+
+配置项:
+    beat_leader_lease_ttl = 10      # 租约时长（秒）
+    beat_catch_up = 'once'          # 'skip' / 'once' / 'all'
+    beat_max_catch_up = 100         # 'all' 策略下最多补发的次数
+"""
+
+import logging
+import os
+import socket
+import time
+
+from extensions.heap_scheduler import HeapScheduler
+from extensions.schedule_store import DatabaseScheduler
+
+logger = logging.getLogger(__name__)
+
+LEASE_KEY = 'beat-leader'
+FENCE_KEY = 'beat-leader-fence'
+FIRE_KEY_PREFIX = 'beat-fire:'
+LAST_RUN_KEY = 'beat-last-run'
+
+CATCH_UP_POLICIES = ('skip', 'once', 'all')
+
+# KEYS[1] 租约  KEYS[2] fencing token 计数器
+# ARGV[1] 节点标识  ARGV[2] 租约时长（毫秒）
+# 返回租约值 "<token>:<节点标识>"，被其他节点持有时返回 false
+ACQUIRE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    local value = redis.call('INCR', KEYS[2]) .. ':' .. ARGV[1]
+    redis.call('SET', KEYS[1], value, 'PX', ARGV[2])
+    return value
+end
+local sep = string.find(current, ':', 1, true)
+if sep and string.sub(current, sep + 1) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return current
+end
+return false
+"""
+
+# KEYS[1] 租约  KEYS[2] 本次触发的去重键  KEYS[3] 最后触发时间哈希
+# ARGV[1] 租约值  ARGV[2] 去重键过期时间（秒）  ARGV[3] 条目名  ARGV[4] 计划时间
+# 返回 1 可以发送，0 已经发送过，-1 已失去租约
+FIRE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return -1
+end
+if not redis.call('SET', KEYS[2], ARGV[1], 'NX', 'EX', tonumber(ARGV[2])) then
+    return 0
+end
+redis.call('HSET', KEYS[3], ARGV[3], ARGV[4])
+return 1
+"""
+
+# KEYS[1] 租约  ARGV[1] 租约值
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _as_str(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class LeaderElection:
+    """
+    为 HeapScheduler 及其子类增加选主、fencing 与补发
+
+    与调度器类组合使用，例如 class LeaderScheduler(LeaderElection, HeapScheduler)
+    """
+
+    #: 每次触发的去重键保留时间（秒），需要大于一次主备切换所需的时间
+    fire_key_ttl = 3600
+
+    def __init__(self, app, *args, **kwargs):
+        self.lease_ttl = float(app.conf.get('beat_leader_lease_ttl') or 10)
+        self.catch_up = app.conf.get('beat_catch_up') or 'once'
+        if self.catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f'beat_catch_up 必须是 {CATCH_UP_POLICIES} 之一: {self.catch_up!r}')
+        self.max_catch_up = int(app.conf.get('beat_max_catch_up') or 100)
+        self.node_id = f'{socket.gethostname()}-{os.getpid()}'
+        #: 持有的租约值 "<fencing token>:<节点标识>"，不是主节点时为 None
+        self.lease = None
+        self._next_renew = 0
+        self._scripts = {}
+        super().__init__(app, *args, **kwargs)
+
+    @property
+    def is_leader(self):
+        return self.lease is not None
+
+    @property
+    def fencing_token(self):
+        return int(self.lease.split(':', 1)[0]) if self.lease else None
+
+    def _script(self, source):
+        client = self.app.backend.client
+        script = self._scripts.get((id(client), source))
+        if script is None:
+            script = self._scripts[(id(client), source)] = client.register_script(source)
+        return script
+
+    # ------------------------------------------------------------------
+    # 租约
+    # ------------------------------------------------------------------
+
+    def _renew(self):
+        """获取或续约租约，处理主备状态切换"""
+        try:
+            lease = _as_str(self._script(ACQUIRE_SCRIPT)(
+                keys=[LEASE_KEY, FENCE_KEY],
+                args=[self.node_id, int(self.lease_ttl * 1000)]))
+        except Exception as exc:  # pylint: disable=broad-except
+            # 连不上 Redis 时无法确认租约，按失去租约处理
+            logger.warning('Beat 选主: 续约失败: %r', exc)
+            lease = None
+
+        if lease and lease != self.lease:
+            self.lease = lease
+            logger.info('Beat 选主: 成为主节点 (fencing token %d)', self.fencing_token)
+            self._on_elected()
+        elif not lease and self.lease:
+            logger.warning('Beat 选主: 失去租约，转为备用节点')
+            self.lease = None
+
+    def _release(self):
+        if self.lease:
+            try:
+                self._script(RELEASE_SCRIPT)(keys=[LEASE_KEY], args=[self.lease])
+            except Exception:  # pylint: disable=broad-except
+                pass
+            self.lease = None
+
+    # ------------------------------------------------------------------
+    # 接管与补发
+    # ------------------------------------------------------------------
+
+    def _on_elected(self):
+        """成为主节点：以共享的最后触发时间为准，按策略补发错过的触发"""
+        last_runs = {_as_str(name): float(due) for name, due
+                     in self.app.backend.client.hgetall(LAST_RUN_KEY).items()}
+        now = time.time()
+        for name, entry in list(self.schedule.items()):
+            last = last_runs.get(name)
+            if last is None:
+                # 从未被任何主节点触发过，保持本地的计划
+                continue
+            entry.last_run_at = self._datetime(last)
+            missed = []
+            due = self._after(entry, last)
+            while due <= now and len(missed) < self.max_catch_up:
+                missed.append(due)
+                due = self._after(entry, due)
+
+            if self.catch_up == 'once':
+                missed = missed[-1:]
+            elif self.catch_up == 'skip':
+                missed = []
+            for due in missed:
+                if not self.is_leader:
+                    return
+                self.fire_entry(entry, due)
+                entry.last_run_at = self._datetime(due)
+            if missed:
+                logger.info('Beat 选主: %s 补发 %d 次', name, len(missed))
+            self._push(entry, self._next_due(entry, missed[-1] if missed else last, now))
+
+    def fire_entry(self, entry, due):
+        """先在 Redis 中确认租约并占用本次触发的去重键，成功后才发送"""
+        if not self.is_leader:
+            return
+        fire_key = f'{FIRE_KEY_PREFIX}{entry.name}:{due:.3f}'
+        claimed = self._script(FIRE_SCRIPT)(
+            keys=[LEASE_KEY, fire_key, LAST_RUN_KEY],
+            args=[self.lease, self.fire_key_ttl, entry.name, due])
+        if claimed == -1:
+            logger.warning('Beat 选主: 租约已被其他节点取得，放弃发送 %s', entry.name)
+            self.lease = None
+        elif claimed == 0:
+            logger.info('Beat 选主: %s 的本次触发已由其他节点发送', entry.name)
+        else:
+            super().fire_entry(entry, due)
+
+    # ------------------------------------------------------------------
+    # 调度循环
+    # ------------------------------------------------------------------
+
+    def tick(self, *args, **kwargs):
+        now = time.time()
+        if now >= self._next_renew:
+            self._next_renew = now + self.lease_ttl / 3
+            self._renew()
+        until_renew = max(self._next_renew - time.time(), 0)
+        if not self.is_leader:
+            # 备用节点只等待下一次尝试获取租约
+            return until_renew
+        return min(super().tick(*args, **kwargs), until_renew)
+
+    def close(self):
+        self._release()
+        super().close()
+
+
+class LeaderScheduler(LeaderElection, HeapScheduler):
+    """选主的堆调度器"""
+
+
+class LeaderDatabaseScheduler(LeaderElection, DatabaseScheduler):
+    """选主的数据库调度器（调度条目热加载）"""
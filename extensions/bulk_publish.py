@@ -0,0 +1,314 @@
+"""
+批量发布（Bulk Publish）
+
+逐个调用 apply_async() 时，每个任务都是一次独立的 Broker 往返（一次 LPUSH）。
+提交成千上万个任务时，网络往返而不是 Redis 本身成为瓶颈。
+
+本模块在客户端把一批签名序列化为与 apply_async() 完全相同的 Kombu 消息，
+按目标 Redis 列表分组，再用一个 pipeline 中的多值 LPUSH 一次性写入：
+
+    签名列表 → 路由 → 套用消息模板 → 按列表分组 → pipeline(LPUSH q m1 m2 ...) → 一次往返
+
+性能要点：
+1. 消息模板：同一任务名的消息头只通过 create_task_message() 构建一次，
+   之后每个签名只替换 id / root_id / argsrepr 等少数字段
+2. 路由缓存：task_routes 是按任务名匹配的，同名任务只查一次路由
+3. 多值 LPUSH：每个队列一条命令，所有队列共用一个 pipeline
+
+带有 countdown / eta / link 等选项的签名、重写了 apply_async() 的任务类不适合套用模板，
+会回退到逐个 apply_async()，结果句柄的顺序保持不变（判断见 BulkPublisher.fast_path_options()）。
+
+说明：快速路径不发送 before_task_publish / after_task_publish 信号，
+也不发送 task-sent 事件。
+
+用法:
+    from celery_app import app
+    from tasks.basic_tasks import add
+
+    results = app.send_tasks_bulk(add.s(i, i) for i in range(100000))
+    print(results[0].get(timeout=10))
+"""
+
+import re
+from collections.abc import Sequence
+from itertools import islice
+from json.encoder import encode_basestring_ascii
+
+from celery import Task
+from celery.result import AsyncResult, ResultSet
+from kombu.serialization import dumps
+from kombu.utils.json import JSONEncoder, dumps as json_dumps
+from kombu.utils.uuid import uuid
+
+from .result_stream import iter_results
+
+# 可以套用消息模板的签名选项，其他选项（countdown、eta、link 等）回退到 apply_async()
+FAST_PATH_OPTIONS = frozenset({
+    'queue', 'routing_key', 'exchange', 'priority', 'task_id',
+    'serializer', 'delivery_mode', 'time_limit', 'soft_time_limit',
+    'immediate', 'mandatory',
+})
+
+
+class BulkResult(Sequence):
+    """
+    批量发布返回的轻量结果句柄
+
+    只保存任务 ID，按需创建 AsyncResult，
+    提交 10 万个任务时不会一次性创建 10 万个 AsyncResult 对象。
+    """
+
+    def __init__(self, ids, app):
+        self.ids = ids
+        self.app = app
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return BulkResult(self.ids[index], self.app)
+        return AsyncResult(self.ids[index], app=self.app)
+
+    def __repr__(self):
+        return f'<BulkResult: {len(self.ids)} tasks>'
+
+    def as_result_set(self):
+        """转换为 ResultSet，可以使用 join() / completed_count() 等方法"""
+        return ResultSet(list(self), app=self.app)
+
+    def iter_results(self, **kwargs):
+        """按完成顺序流式迭代结果，参数见 result_stream.iter_results()"""
+        return iter_results(self, app=self.app, **kwargs)
+
+
+class BulkPublisher:
+    """
+    批量发布器
+
+    参数:
+        app: Celery 应用
+        batch_size: 每个 pipeline 携带的最大消息数，限制客户端内存占用
+    """
+
+    def __init__(self, app, batch_size=10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.argsrepr_maxsize = app.amqp.argsrepr_maxsize
+        self.kwargsrepr_maxsize = app.amqp.kwargsrepr_maxsize
+        self._templates = {}
+        self._routes = {}
+
+    def publish(self, signatures):
+        """
+        批量发布签名
+
+        参数:
+            signatures: 签名的可迭代对象（可以是生成器）
+
+        返回:
+            BulkResult，顺序与输入签名一致
+        """
+        ids = []
+        signatures = iter(signatures)
+        with self.app.producer_or_acquire() as producer:
+            channel = producer.channel
+            while True:
+                batch = list(islice(signatures, self.batch_size))
+                if not batch:
+                    break
+                ids.extend(self._publish_batch(channel, batch))
+        return BulkResult(ids, self.app)
+
+    def _publish_batch(self, channel, batch):
+        """序列化一批签名，并用一个 pipeline 写入所有队列"""
+        ids = []
+        queues = {}
+        context = self.context()
+        for signature in batch:
+            options = self.fast_path_options(signature)
+            if options is None:
+                # 复杂选项：回退到标准发布路径
+                ids.append(signature.apply_async().id)
+                continue
+            key, payload, task_id = self.build_message(
+                channel, signature, options, context)
+            queues.setdefault(key, []).append(payload)
+            ids.append(task_id)
+
+        if queues:
+            with channel.conn_or_acquire() as client:
+                pipe = client.pipeline(transaction=False)
+                for key, payloads in queues.items():
+                    # LPUSH 多个值时按参数顺序依次插入表头，
+                    # Worker 从表尾 BRPOP，因此仍然保持提交顺序（FIFO）
+                    pipe.lpush(key, *payloads)
+                pipe.execute()
+        return ids
+
+    def context(self):
+        """同一批消息共享的上下文：(根任务 ID, 父任务 ID, reply_to)，传给 build_message()"""
+        parent = self.app.current_worker_task
+        if parent is not None:
+            return (parent.request.root_id or parent.request.id,
+                    parent.request.id, self.app.thread_oid)
+        return None, None, self.app.thread_oid
+
+    def fast_path_options(self, signature):
+        """
+        签名可以套用消息模板时返回合并后的执行选项，否则返回 None
+
+        以下情况需要回退到 apply_async()：
+        - 执行选项超出 FAST_PATH_OPTIONS（countdown、eta、expires、link 等）
+        - 任务类重写了 apply_async()（提交去重、幂等键等在发布时生效的逻辑）
+        - task_always_eager
+        """
+        if self.app.conf.task_always_eager:
+            return None
+        task = self.app.tasks.get(signature.task)
+        if task is not None and type(task).apply_async is not Task.apply_async:
+            return None
+        options = self._exec_options(signature)
+        if not options.keys() <= FAST_PATH_OPTIONS:
+            return None
+        return options
+
+    def _exec_options(self, signature):
+        """合并任务默认执行选项与签名选项（与 Task.apply_async() 一致）"""
+        task = self.app.tasks.get(signature.task)
+        options = dict(task._get_exec_options()) if task is not None else {}
+        options.update(signature.options)
+        return {k: v for k, v in options.items() if v is not None}
+
+    def _route(self, name, options):
+        """查找任务路由，按任务名和显式队列选项缓存"""
+        cache_key = (name, options.get('queue'),
+                     options.get('exchange'), options.get('routing_key'))
+        route = self._routes.get(cache_key)
+        if route is None:
+            route = self.app.amqp.router.route(
+                {k: options[k] for k in ('queue', 'exchange', 'routing_key')
+                 if k in options},
+                name,
+            )
+            queue = route['queue']
+            exchange = route.get('exchange', queue.exchange)
+            exchange = getattr(exchange, 'name', exchange) or ''
+            routing_key = route.get('routing_key') or queue.routing_key
+            route = self._routes[cache_key] = (queue.name, exchange, routing_key)
+        return route
+
+    def _template(self, channel, name, options, reply_to):
+        """
+        获取消息模板
+
+        模板是把可变字段替换为占位符后序列化得到的 JSON 片段列表，
+        构建消息时只需把各字段的 JSON 编码拼接回去，不必每次序列化整个消息。
+
+        返回:
+            (Redis 列表键, JSON 片段列表, embed)
+        """
+        queue, exchange, routing_key = self._route(name, options)
+        cache_key = (
+            name, queue, exchange, routing_key, reply_to,
+            options.get('priority'), options.get('delivery_mode'),
+            options.get('time_limit'), options.get('soft_time_limit'),
+        )
+        template = self._templates.get(cache_key)
+        if template is not None:
+            return template
+
+        task = self.app.tasks.get(name)
+        message = self.app.amqp.create_task_message(
+            _token('task_id'), name, (), {},
+            root_id=_token('root_id'),
+            parent_id=_token('parent_id'),
+            argsrepr=_token('argsrepr'),
+            kwargsrepr=_token('kwargsrepr'),
+            reply_to=reply_to,
+            time_limit=options.get('time_limit'),
+            soft_time_limit=options.get('soft_time_limit'),
+            ignore_result=task.ignore_result if task is not None else False,
+        )
+        properties = dict(message.properties)
+        properties['delivery_mode'] = options.get('delivery_mode') or 2
+        envelope = channel.prepare_message(
+            _token('body'), options.get('priority'),
+            _token('content_type'), _token('content_encoding'),
+            message.headers, properties,
+        )
+        # 与 Channel.basic_publish() 中的 _inplace_augment_message() 相同，
+        # 只是消息体与 delivery_tag 留作占位符
+        envelope['properties'].update(
+            body_encoding=channel.body_encoding,
+            delivery_tag=_token('delivery_tag'),
+        )
+        envelope['properties']['delivery_info'].update(
+            exchange=exchange, routing_key=routing_key,
+        )
+        key = channel._q_for_pri(queue, channel._get_message_priority(envelope))
+        fragments = _TOKEN_RE.split(json_dumps(envelope))
+        template = self._templates[cache_key] = (key, fragments, message.body[2])
+        return template
+
+    def build_message(self, channel, signature, options=None, context=None):
+        """
+        把签名构建为 Redis 传输层的消息
+
+        返回:
+            (Redis 列表键, JSON 字符串形式的消息, 任务 ID)
+        """
+        if options is None:
+            options = self._exec_options(signature)
+        if context is None:
+            context = self.context()
+        root_id, parent_id, reply_to = context
+        args = tuple(signature.args)
+        kwargs = dict(signature.kwargs)
+        key, fragments, embed = self._template(
+            channel, signature.task, options, reply_to)
+
+        task_id = options.get('task_id') or uuid()
+        serializer = options.get('serializer') or self.app.conf.task_serializer
+        if serializer == 'json':
+            # 复用同一个编码器实例，省去 kombu dumps() 每次构造编码器的开销
+            content_type, content_encoding = 'application/json', 'utf-8'
+            body = _json_encoder.encode((args, kwargs, embed))
+        else:
+            content_type, content_encoding, body = dumps(
+                (args, kwargs, embed), serializer=serializer)
+        body, _ = channel.encode_body(body, channel.body_encoding)
+        fields = {
+            'task_id': task_id,
+            'root_id': root_id or task_id,
+            'parent_id': parent_id,
+            # saferepr() 是模板之外最大的开销，这里用截断后的 repr() 代替
+            'argsrepr': repr(args)[:self.argsrepr_maxsize],
+            'kwargsrepr': repr(kwargs)[:self.kwargsrepr_maxsize],
+            'body': body,
+            'content_type': content_type,
+            'content_encoding': content_encoding,
+            'delivery_tag': uuid(),
+        }
+        # 偶数位是模板中的固定片段，奇数位是占位符对应的字段名
+        parts = fragments[:]
+        for i in range(1, len(parts), 2):
+            parts[i] = _encode_field(fields[parts[i]])
+        return key, ''.join(parts), task_id
+
+
+def _token(field):
+    """模板占位符"""
+    return f'@@bulk:{field}@@'
+
+
+_json_encoder = JSONEncoder()
+
+_TOKEN_RE = re.compile(r'"@@bulk:(\w+)@@"')
+
+
+def _encode_field(value):
+    """把单个字段（字符串或 None）编码为 JSON，直接调用 C 实现的字符串编码器"""
+    if value is None:
+        return 'null'
+    return encode_basestring_ascii(value)
@@ -0,0 +1,134 @@
+"""
+基于 Lua 脚本的 Chord 汇合（Chord Join）
+
+Celery 原生 Redis 后端在每个 header 成员完成时执行 on_chord_part_return()：
+1. 一个 pipeline：写入结果 + 统计完成数 + 读取 chord 大小
+2. 最后一个成员：再读取 GroupResult、读取全部结果、删除中间键（又是 2~3 次往返）
+
+成员越多，这些往返与中间读取的总开销越大。
+
+LuaChordRedisBackend 把汇合逻辑放进一个 Lua 脚本，每个成员只需一次 EVALSHA：
+
+    SADD 成员集合 → RPUSH 结果列表 → 计数 == chord 大小？
+        否 → 返回 0
+        是 → LRANGE 读取全部结果 + DEL 中间键 → 返回结果列表
+
+- 计数：成员集合的基数（SCARD），同一任务重复投递（acks_late、Worker 丢失）不会重复计数
+- 恰好一次：只有让计数到达 chord 大小的那次脚本调用能拿到结果，
+  并且它在同一个原子脚本中删除了中间键，回调只会被触发一次
+- 一次读取：所有结果通过一次 LRANGE 返回，按 group_index 排序后传给回调
+
+header 中包含嵌套 group 时（Celery 会保存 GroupResult），回退到原生实现。
+
+说明：脚本同时操作多个键，适用于单实例 / Sentinel 模式的 Redis，不适用于 Redis Cluster。
+
+启用方式:
+    RESULT_BACKEND_CLASS=extensions.chord_join:LuaChordRedisBackend
+    或: result_backend = 'extensions.chord_join:LuaChordRedisBackend+redis://localhost:6379/0'
+"""
+
+import logging
+
+from celery.backends.redis import RedisBackend
+from celery.canvas import maybe_signature
+from celery.exceptions import ChordError
+from kombu.utils.objects import cached_property
+
+from .result_sweeper import CompactResultMixin
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] 结果列表  KEYS[2] 已汇合成员集合  KEYS[3] chord 大小（.s）
+# KEYS[4] chord 大小修正（.t）  KEYS[5] Celery 保存的 GroupResult
+# ARGV[1] 任务 ID  ARGV[2] 编码后的结果  ARGV[3] 过期时间（秒，0 表示不过期）
+CHORD_JOIN_SCRIPT = """
+if redis.call('EXISTS', KEYS[5]) == 1 then
+    return -1
+end
+if redis.call('SADD', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('RPUSH', KEYS[1], ARGV[2])
+local expires = tonumber(ARGV[3])
+if expires > 0 then
+    redis.call('EXPIRE', KEYS[1], expires)
+    redis.call('EXPIRE', KEYS[2], expires)
+end
+local size = tonumber(redis.call('GET', KEYS[3]) or '0')
+if size == 0 then
+    return 0
+end
+size = size + tonumber(redis.call('GET', KEYS[4]) or '0')
+if redis.call('SCARD', KEYS[2]) < size then
+    return 0
+end
+local results = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3], KEYS[4])
+return results
+"""
+
+# 脚本返回 -1 表示 header 较复杂，需要回退到原生实现
+FALLBACK = -1
+
+
+class LuaChordRedisBackend(CompactResultMixin, RedisBackend):
+    """
+    使用 Lua 脚本完成 Chord 汇合的 Redis 结果后端
+
+    同时透明读取被结果清理器压缩 / 归档的结果（详见 extensions/result_sweeper.py）
+    """
+
+    @cached_property
+    def _chord_join(self):
+        # register_script() 优先使用 EVALSHA，脚本未缓存时自动回退到 EVAL
+        return self.client.register_script(CHORD_JOIN_SCRIPT)
+
+    def on_chord_part_return(self, request, state, result,
+                             propagate=None, **kwargs):
+        tid, gid, group_index = request.id, request.group, request.group_index
+        if not gid or not tid:
+            return
+
+        keys = [
+            self.get_key_for_group(gid, '.l'),
+            self.get_key_for_group(gid, '.m'),
+            self.get_key_for_group(gid, '.s'),
+            self.get_key_for_group(gid, '.t'),
+            self.get_key_for_group(gid),
+        ]
+        encoded = self.encode(
+            [group_index, tid, state, self.encode_result(result, state)])
+        reply = self._chord_join(keys=keys, args=[tid, encoded, self.expires or 0])
+
+        if reply == FALLBACK:
+            return super().on_chord_part_return(
+                request, state, result, propagate=propagate, **kwargs)
+        if not isinstance(reply, list):
+            return
+
+        callback = maybe_signature(request.chord, app=self.app)
+        try:
+            entries = sorted(
+                (self.decode(raw) for raw in reply),
+                key=lambda entry: (entry[0] is None, entry[0] or 0),
+            )
+            resl = [self._unpack_chord_result(entry, _identity) for entry in entries]
+        except ChordError as exc:
+            logger.exception('Chord %r raised: %r', gid, exc)
+            return self.chord_error_from_stack(callback, exc)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.exception('Chord %r raised: %r', gid, exc)
+            return self.chord_error_from_stack(
+                callback, ChordError(f'Join error: {exc!r}'))
+
+        try:
+            callback.delay(resl)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.exception('Chord callback for %r raised: %r', gid, exc)
+            return self.chord_error_from_stack(
+                callback, ChordError(f'Callback error: {exc!r}'))
+
+
+def _identity(value):
+    """结果已经解码，_unpack_chord_result() 无需再次解码"""
+    return value
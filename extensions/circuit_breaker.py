@@ -0,0 +1,223 @@
+"""
+熔断器（Circuit Breaker）
+
+下游依赖已经故障了几分钟，task_with_custom_retry 仍然一次次请求、失败、重试，
+白白占用 Worker 进程与 Broker 流量。
+
+CircuitBreaker 按依赖统计调用结果，状态保存在 Redis 中，所有 Worker 共享：
+
+    closed（闭合）── 时间窗口内失败率 >= 阈值 ──→ open（打开）
+       ↑                                          │
+       │                                   open_timeout 秒后
+       │                                          ↓
+       └──────── 探测调用成功 ──────── half_open（半开）
+                                          │ 探测调用失败
+                                          └──────→ open
+
+- closed：正常调用，统计 window 秒内的调用数与失败数（至少 min_calls 次才判断失败率）
+- open：直接抛出 CircuitOpenError，不再调用依赖；异常携带 retry_after（距离半开的秒数），
+  任务可以据此把重试统一推迟到半开之后，而不是继续按原节奏重试
+- half_open：只放行 half_open_max_calls 个探测调用，其余调用仍快速失败；
+  探测成功则闭合，失败则重新打开
+
+状态转换由 Lua 脚本原子完成。每个进程在本地缓存状态 local_cache_ttl 秒：
+闭合状态下放行、打开状态下拒绝都不需要访问 Redis，只有调用结果需要上报。
+
+用法:
+    api_breaker = CircuitBreaker('example-api', failure_threshold=0.5, open_timeout=30)
+
+    try:
+        with api_breaker:
+            response = call_api(url)
+    except CircuitOpenError as exc:
+        raise self.retry(countdown=exc.retry_after, exc=exc)
+"""
+
+import time
+
+from celery_app import app
+
+KEY_PREFIX = 'circuit-breaker-'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# KEYS[1] 熔断器状态哈希
+# ARGV[1] 当前时间  ARGV[2] 打开持续时间  ARGV[3] 半开状态下允许的探测调用数
+# 返回 {状态, 打开时间, 是否放行}
+ALLOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local open_timeout = tonumber(ARGV[2])
+local fields = redis.call('HMGET', KEYS[1], 'state', 'opened_at', 'probes')
+local state = fields[1] or 'closed'
+local opened_at = tonumber(fields[2]) or 0
+local probes = tonumber(fields[3]) or 0
+-- 打开超时后进入半开；半开状态下的探测长时间没有结果（Worker 丢失）时重新放行探测
+if (state == 'open' or state == 'half_open') and now - opened_at >= open_timeout then
+    state = 'half_open'
+    opened_at = now
+    probes = 0
+    redis.call('HSET', KEYS[1], 'state', state, 'opened_at', tostring(now), 'probes', 0)
+end
+local allowed = 1
+if state == 'open' then
+    allowed = 0
+elseif state == 'half_open' then
+    if probes < tonumber(ARGV[3]) then
+        redis.call('HINCRBY', KEYS[1], 'probes', 1)
+    else
+        allowed = 0
+    end
+end
+return {state, tostring(opened_at), allowed}
+"""
+
+# KEYS[1] 熔断器状态哈希
+# ARGV[1] 当前时间  ARGV[2] 本次调用是否成功（1/0）  ARGV[3] 统计窗口（秒）
+# ARGV[4] 最少调用数  ARGV[5] 失败率阈值
+# 返回 {状态, 打开时间}
+RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local success = tonumber(ARGV[2]) == 1
+local fields = redis.call('HMGET', KEYS[1], 'state', 'opened_at', 'window_start', 'calls', 'failures')
+local state = fields[1] or 'closed'
+local opened_at = tonumber(fields[2]) or 0
+if state == 'half_open' then
+    if success then
+        redis.call('DEL', KEYS[1])
+        return {'closed', '0'}
+    end
+    redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', tostring(now))
+    return {'open', tostring(now)}
+end
+if state == 'open' then
+    -- 打开之前发出的调用晚到的结果，不影响状态
+    return {state, tostring(opened_at)}
+end
+local window_start = tonumber(fields[3]) or now
+local calls = tonumber(fields[4]) or 0
+local failures = tonumber(fields[5]) or 0
+if now - window_start >= tonumber(ARGV[3]) then
+    window_start = now
+    calls = 0
+    failures = 0
+end
+calls = calls + 1
+if not success then
+    failures = failures + 1
+end
+if calls >= tonumber(ARGV[4]) and failures / calls >= tonumber(ARGV[5]) then
+    state = 'open'
+    opened_at = now
+end
+redis.call('HSET', KEYS[1], 'state', state, 'opened_at', tostring(opened_at),
+           'window_start', tostring(window_start), 'calls', calls, 'failures', failures)
+return {state, tostring(opened_at)}
+"""
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被拒绝"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f'熔断器 {name} 已打开，{retry_after:.1f} 秒后进入半开状态')
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """所有 Worker 共享状态的熔断器"""
+
+    def __init__(self, name, failure_threshold=0.5, min_calls=10, window=60,
+                 open_timeout=30, half_open_max_calls=1, local_cache_ttl=1.0,
+                 expected_exceptions=(Exception,)):
+        """
+        参数:
+            name: 熔断器名，通常对应一个下游依赖
+            failure_threshold: 失败率阈值（0~1）
+            min_calls: 窗口内至少多少次调用才判断失败率
+            window: 统计窗口（秒）
+            open_timeout: 打开状态持续多少秒后进入半开
+            half_open_max_calls: 半开状态下同时放行的探测调用数
+            local_cache_ttl: 进程内缓存状态的时间（秒）
+            expected_exceptions: 计为失败的异常类型，其他异常不影响熔断器
+        """
+        self.name = name
+        self.key = KEY_PREFIX + name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.open_timeout = open_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.local_cache_ttl = local_cache_ttl
+        self.expected_exceptions = expected_exceptions
+        # (状态, 打开时间, 缓存时间)
+        self._cached = None
+        self._scripts = {}
+
+    def _script(self, source):
+        client = app.backend.client
+        script = self._scripts.get((id(client), source))
+        if script is None:
+            script = self._scripts[(id(client), source)] = client.register_script(source)
+        return script
+
+    def _remember(self, reply, now):
+        state, opened_at = reply[0], reply[1]
+        state = state.decode() if isinstance(state, bytes) else state
+        self._cached = (state, float(opened_at), now)
+        return state, float(opened_at)
+
+    def _reject(self, opened_at, now):
+        retry_after = max(opened_at + self.open_timeout - now, 0)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def before_call(self):
+        """调用依赖之前检查熔断器，打开时抛出 CircuitOpenError"""
+        now = time.time()
+        if self._cached is not None and now - self._cached[2] < self.local_cache_ttl:
+            state, opened_at, _ = self._cached
+            if state == CLOSED:
+                return
+            if state == OPEN and now - opened_at < self.open_timeout:
+                self._reject(opened_at, now)
+
+        reply = self._script(ALLOW_SCRIPT)(
+            keys=[self.key], args=[now, self.open_timeout, self.half_open_max_calls])
+        state, opened_at = self._remember(reply, now)
+        if not reply[2]:
+            if state == HALF_OPEN:
+                # 探测名额已满，等探测结果出来后再试
+                raise CircuitOpenError(self.name, self.local_cache_ttl)
+            self._reject(opened_at, now)
+
+    def record(self, success):
+        """上报一次调用的结果"""
+        now = time.time()
+        reply = self._script(RECORD_SCRIPT)(
+            keys=[self.key],
+            args=[now, int(success), self.window, self.min_calls, self.failure_threshold],
+        )
+        self._remember(reply, now)
+
+    def state(self):
+        """读取当前状态（不使用本地缓存）"""
+        state = app.backend.client.hget(self.key, 'state')
+        return state.decode() if state else CLOSED
+
+    def reset(self):
+        """手动闭合熔断器"""
+        app.backend.client.delete(self.key)
+        self._cached = None
+
+    def __enter__(self):
+        self.before_call()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.record(True)
+        elif issubclass(exc_type, self.expected_exceptions):
+            self.record(False)
+        return False
@@ -0,0 +1,230 @@
+"""
+延迟队列（Delay Queue）
+
+self.retry(countdown=...)、apply_async(countdown=...) 与 eta 任务在 Celery 中会被立即投递，
+Worker 取到消息后发现还没到执行时间，就把它放在内存里等待（inspect().scheduled()）：
+- 大量带 countdown 的重试把每个 Worker 的预取集合撑大，占用内存
+- 这些消息已经被 Worker 取走但没有确认，Worker 重启时会被成批重新投递或丢失
+
+本模块把延迟任务留在 Broker 端，直到到期才进入目标队列：
+
+    apply_async(countdown=60)
+        ↓ 发布时（CeleryApp.send_task）
+    ZADD delay-queue:<目标列表> <到期时间戳> <消息>
+        ↓ 搬运器每 interval 秒执行一次 Lua 脚本
+    ZRANGEBYSCORE 取出已到期的消息 → LPUSH 到目标列表 → ZREM
+        ↓
+    Worker 只会取到已经可以执行的任务
+
+- 消息与正常发布的完全相同（同样的消息头、路由、优先级子队列），只是不带 eta
+- 搬运在一个 Lua 脚本中完成，多个 Worker 同时搬运也不会重复投递
+- 搬运器以 bootstep 的形式运行在每个 Worker 中（也可以单独运行：
+  python -m extensions.delay_queue），执行时间的精度约为 interval 秒
+
+启用方式（默认关闭）:
+    DELAY_QUEUE=true            # 发布时把 countdown / eta 任务写入延迟队列，
+                                # 同时在 Worker 中添加 DelayQueueMover（见 celery_app.py）
+
+交换机上没有绑定与 routing_key 匹配的队列时抛出 UndeliverableDelayedTask，而不是静默丢弃消息。
+"""
+
+import logging
+import time
+from datetime import datetime
+
+from celery import bootsteps
+from celery.utils.time import maybe_make_aware
+from kombu import Producer
+from kombu.utils.json import dumps
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'delay-queue:'
+TARGETS_KEY = 'delay-queue-targets'
+
+# KEYS[1] 延迟有序集合  KEYS[2] 目标列表  KEYS[3] 目标索引集合
+# ARGV[1] 当前时间  ARGV[2] 每次最多搬运的消息数
+MOVE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+if #due > 0 then
+    -- 按到期时间从早到晚 LPUSH，Worker 从表尾 BRPOP，先到期的先执行
+    redis.call('LPUSH', KEYS[2], unpack(due))
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+if redis.call('ZCARD', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[3], KEYS[2])
+end
+return #due
+"""
+
+
+class UndeliverableDelayedTask(Exception):
+    """延迟任务找不到目标队列（交换机上没有匹配 routing_key 的绑定）"""
+
+
+def due_timestamp(app, countdown=None, eta=None):
+    """把 countdown / eta 转换为到期的 Unix 时间戳"""
+    if countdown is not None:
+        return time.time() + countdown
+    if isinstance(eta, str):
+        eta = datetime.fromisoformat(eta)
+    return maybe_make_aware(eta, app.timezone).timestamp()
+
+
+class _DelayChannel:
+    """
+    Channel 代理：消息照常构建，只在最后一步写入延迟有序集合而不是目标列表
+
+    对应 kombu 虚拟传输层 Channel.basic_publish() → _put() 的流程
+    """
+
+    def __init__(self, channel, due):
+        self._channel = channel
+        self._due = due
+
+    def __getattr__(self, name):
+        return getattr(self._channel, name)
+
+    def basic_publish(self, message, exchange, routing_key, **kwargs):
+        channel = self._channel
+        channel._inplace_augment_message(message, exchange, routing_key)
+        # 与 kombu 相同的查找：匿名交换机的 routing_key 就是目标队列，
+        # 没有匹配的绑定时使用 deadletter_queue（如果设置了）
+        queues = channel._lookup(exchange, routing_key)
+        if not queues:
+            raise UndeliverableDelayedTask(
+                f'交换机 {exchange!r} 上没有与 routing_key {routing_key!r} 匹配的队列，'
+                f'延迟任务无法投递（目标队列是否已声明？）')
+        priority = channel._get_message_priority(message, reverse=False)
+        payload = dumps(message)
+        with channel.conn_or_acquire() as client:
+            with client.pipeline() as pipe:
+                for queue in queues:
+                    target = channel._q_for_pri(queue, priority)
+                    pipe.zadd(KEY_PREFIX + target, {payload: self._due})
+                    pipe.sadd(TARGETS_KEY, target)
+                pipe.execute()
+
+
+def delayed_producer(producer, due):
+    """返回一个把消息写入延迟队列的 Producer，发布参数与 producer 相同"""
+    return Producer(_DelayChannel(producer.channel, due), exchange=producer.exchange,
+                    serializer=producer.serializer, compression=producer.compression,
+                    auto_declare=False)
+
+
+_scripts = {}
+
+
+def _move_script(client):
+    """按客户端缓存注册后的 Lua 脚本（EVALSHA）"""
+    script = _scripts.get(id(client))
+    if script is None:
+        script = _scripts[id(client)] = client.register_script(MOVE_SCRIPT)
+    return script
+
+
+def _as_str(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def move_due_tasks(client, now=None, limit=1000):
+    """
+    把所有已到期的延迟任务搬到目标队列
+
+    参数:
+        client: Broker 的 Redis 客户端
+        now: 当前时间戳，默认 time.time()
+        limit: 每个目标队列每次最多搬运的消息数
+
+    返回:
+        本次搬运的消息数
+    """
+    now = time.time() if now is None else now
+    targets = [_as_str(target) for target in client.smembers(TARGETS_KEY)]
+    if not targets:
+        return 0
+    script = _move_script(client)
+    with client.pipeline(transaction=False) as pipe:
+        for target in targets:
+            script(keys=[KEY_PREFIX + target, target, TARGETS_KEY],
+                   args=[now, limit], client=pipe)
+        return sum(pipe.execute())
+
+
+def delayed_counts(client, now=None):
+    """
+    统计各目标队列的延迟任务数
+
+    返回:
+        {目标列表: (延迟任务总数, 已到期但尚未搬运的任务数)}
+    """
+    now = time.time() if now is None else now
+    targets = sorted(_as_str(target) for target in client.smembers(TARGETS_KEY))
+    with client.pipeline(transaction=False) as pipe:
+        for target in targets:
+            pipe.zcard(KEY_PREFIX + target)
+            pipe.zcount(KEY_PREFIX + target, '-inf', now)
+        replies = pipe.execute()
+    return {target: (replies[2 * i], replies[2 * i + 1])
+            for i, target in enumerate(targets)}
+
+
+class DelayQueueMover(bootsteps.StartStopStep):
+    """在 Worker 中定期搬运到期的延迟任务"""
+
+    requires = {'celery.worker.components:Timer'}
+
+    #: 搬运间隔（秒）
+    interval = 1.0
+
+    def __init__(self, worker, **kwargs):
+        super().__init__(worker, **kwargs)
+        self.tref = None
+
+    def start(self, worker):
+        self.tref = worker.timer.call_repeatedly(
+            self.interval, self.tick, (worker.app,), priority=10)
+
+    def stop(self, worker):
+        if self.tref is not None:
+            self.tref.cancel()
+            self.tref = None
+
+    def tick(self, app):
+        try:
+            with app.producer_or_acquire() as producer:
+                with producer.channel.conn_or_acquire() as client:
+                    moved = move_due_tasks(client)
+            if moved:
+                logger.debug('延迟队列: 搬运 %d 个到期任务', moved)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning('延迟队列搬运失败: %r', exc)
+
+
+def main():
+    """单独运行搬运器（不启动 Worker 时使用）"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='延迟队列搬运器')
+    parser.add_argument('--interval', '-i', type=float, default=1.0,
+                        help='搬运间隔（秒），默认 1.0')
+    args = parser.parse_args()
+
+    from celery_app import app
+
+    print(f"延迟队列搬运器已启动，间隔 {args.interval} 秒（按 Ctrl+C 退出）")
+    try:
+        while True:
+            with app.producer_or_acquire() as producer:
+                with producer.channel.conn_or_acquire() as client:
+                    moved = move_due_tasks(client)
+            if moved:
+                print(f"{time.strftime('%H:%M:%S')} 搬运 {moved} 个到期任务")
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n搬运器已停止")
+
+
+if __name__ == '__main__':
+    main()
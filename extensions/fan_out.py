@@ -0,0 +1,143 @@
+"""
+批量扇出调度（Fan-out Schedule）
+
+常见写法是用一个定时任务遍历所有租户，逐个 delay()：
+
+    @app.task
+    def periodic_sync():
+        for tenant in list_tenants():
+            sync_tenant.delay(tenant)      # N 个租户 = N 次 Broker 往返
+
+每个周期多了一次任务执行，还有 N 次往返；所有租户的任务又在同一时刻进入队列，
+Worker 与下游服务在每个周期开头被同时打满（惊群）。
+
+扇出调度条目由 Beat 直接展开：
+
+    'tenant-sync': {
+        'task': 'tasks.realworld_tasks.sync_tenant',
+        'schedule': 300.0,
+        'options': {
+            'fan_out': {
+                'tenants': 'tasks.realworld_tasks.list_tenants',  # 可调用对象路径或列表
+                'spread': 60,                                     # 在 60 秒内打散
+            },
+        },
+    }
+
+每次触发时：
+1. 取得租户列表，为每个租户生成签名 task(tenant, *args, **kwargs)
+   （设置 'arg': 'tenant_id' 时改为以关键字参数传入）
+2. 用 BulkPublisher 的消息模板构建消息，与 apply_async() 发出的消息完全相同；
+   条目带有模板不支持的选项（expires、link 等）或任务类重写了 apply_async() 时，
+   与 send_tasks_bulk() 一样回退到逐个 apply_async()（打散偏移以 countdown 传入）
+3. 打散：每个租户按名称哈希得到 [0, spread) 内固定的偏移，
+   偏移为 0 的消息 LPUSH 到目标队列，其余 ZADD 到延迟队列（extensions/delay_queue.py），
+   由搬运器在各自的到期时间移入目标队列；每个租户每个周期的执行时刻相同
+4. 所有命令放在 pipeline 中，每 batch_size 条消息一次往返
+
+spread 需要启用延迟队列（DELAY_QUEUE=true）；未启用时所有消息立即进入队列。
+"""
+
+import logging
+import time
+import zlib
+from itertools import islice
+
+from celery.utils.imports import symbol_by_name
+
+logger = logging.getLogger(__name__)
+
+#: 每个 pipeline 携带的最大消息数
+BATCH_SIZE = 10000
+
+
+def resolve_tenants(tenants):
+    """租户列表：列表原样返回，字符串按 'module.attr' 导入后调用"""
+    if isinstance(tenants, str):
+        tenants = symbol_by_name(tenants)
+    if callable(tenants):
+        tenants = tenants()
+    return list(tenants)
+
+
+def tenant_offset(tenant, spread):
+    """租户在 [0, spread) 内的固定偏移（秒），不受进程哈希随机化影响"""
+    if not spread:
+        return 0.0
+    return zlib.crc32(str(tenant).encode()) % int(spread * 1000) / 1000
+
+
+def fan_out_signatures(app, entry, tenants, config):
+    """为每个租户生成一个签名"""
+    arg = config.get('arg')
+    options = {k: v for k, v in entry.options.items() if k != 'fan_out'}
+    for tenant in tenants:
+        if arg:
+            args, kwargs = entry.args, {**entry.kwargs, arg: tenant}
+        else:
+            args, kwargs = (tenant, *entry.args), entry.kwargs
+        yield tenant, app.signature(entry.task, args=args, kwargs=kwargs, options=options)
+
+
+def fan_out_entry(app, entry, due, batch_size=BATCH_SIZE):
+    """
+    展开并批量发布一个扇出调度条目
+
+    参数:
+        app: Celery 应用
+        entry: 调度条目，entry.options['fan_out'] 为扇出配置
+        due: 本次触发的计划时间戳，打散偏移以它为基准
+
+    返回:
+        发布的任务数
+    """
+    from celery_app import DELAY_QUEUE
+    from extensions.bulk_publish import BulkPublisher
+    from extensions.delay_queue import KEY_PREFIX, TARGETS_KEY
+
+    config = entry.options['fan_out']
+    tenants = resolve_tenants(config['tenants'])
+    spread = config.get('spread') or 0
+    if spread and not DELAY_QUEUE:
+        logger.warning('扇出调度 %s: 未启用延迟队列，忽略 spread', entry.name)
+        spread = 0
+
+    publisher = BulkPublisher(app)
+    signatures = fan_out_signatures(app, entry, tenants, config)
+    published = 0
+    with app.producer_or_acquire() as producer:
+        channel = producer.channel
+        context = publisher.context()
+        while True:
+            batch = list(islice(signatures, batch_size))
+            if not batch:
+                break
+            immediate = {}
+            delayed = {}
+            for tenant, signature in batch:
+                offset = tenant_offset(tenant, spread)
+                options = publisher.fast_path_options(signature)
+                if options is None:
+                    # 模板不支持的选项：回退到标准发布路径
+                    extra = {'countdown': max(due + offset - time.time(), 0)} if offset else {}
+                    signature.apply_async(producer=producer, **extra)
+                    continue
+                key, payload, _ = publisher.build_message(
+                    channel, signature, options, context=context)
+                if offset:
+                    delayed.setdefault(key, {})[payload] = due + offset
+                else:
+                    immediate.setdefault(key, []).append(payload)
+            with channel.conn_or_acquire() as client:
+                pipe = client.pipeline(transaction=False)
+                for key, payloads in immediate.items():
+                    pipe.lpush(key, *payloads)
+                for key, members in delayed.items():
+                    pipe.zadd(KEY_PREFIX + key, members)
+                if delayed:
+                    pipe.sadd(TARGETS_KEY, *delayed)
+                pipe.execute()
+            published += len(batch)
+
+    logger.info('扇出调度 %s: 发布 %d 个任务（打散 %s 秒）', entry.name, published, spread)
+    return published
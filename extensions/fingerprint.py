@@ -0,0 +1,36 @@
+"""
+任务指纹（Task Fingerprint）
+
+由任务名与参数计算出的稳定摘要，相同的调用总能得到相同的指纹：
+- 参数按 JSON 规范化：字典键排序、去掉多余空白，关键字参数与顺序无关
+- 元组与列表序列化结果相同（与 JSON 序列化器传输后的参数一致）
+- 摘要使用 SHA-256
+
+用于结果缓存、提交去重、幂等执行等需要"识别同一次调用"的场景。
+"""
+
+import hashlib
+
+from kombu.utils.json import dumps
+
+
+def canonical_arguments(args=(), kwargs=None):
+    """把位置参数与关键字参数规范化为稳定的 JSON 字符串"""
+    return dumps([list(args or ()), kwargs or {}],
+                 sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def task_fingerprint(name, args=(), kwargs=None):
+    """
+    计算任务调用的指纹
+
+    参数:
+        name: 任务名
+        args: 位置参数
+        kwargs: 关键字参数
+
+    返回:
+        64 位十六进制 SHA-256 摘要
+    """
+    payload = f'{name}\n{canonical_arguments(args, kwargs)}'
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
@@ -0,0 +1,121 @@
+"""
+链融合（Chain Fusion）
+
+普通任务链的每一跳都要经历：
+    写结果 → 发布下一个任务消息 → Broker → Worker 取消息 → 执行
+
+对于 fetch_data → process_item → save_result 这种路由到同一队列的短任务，
+Broker 往返与结果写入的开销往往超过任务本身。
+
+fuse() 把链中连续的、可融合且路由到同一队列的签名合并为一个 run_fused_chain 任务：
+
+    chain(A, B, C, D)   其中 A、B、C 可融合且同在 advanced 队列
+        ↓ fuse()
+    chain(run_fused_chain[A, B, C], D)
+
+run_fused_chain 在同一个 Worker 进程中依次直接调用各步骤，
+上一步的返回值在内存中传给下一步，只有最后的结果（或失败）会写入结果后端。
+
+标记可融合的两种方式：
+1. 任务级别：@app.task(name=..., fusible=True)
+2. 签名级别：fusible(task.s(...))
+
+限制（融合后各步骤以直接调用方式执行）：
+- 步骤内的 self.retry() 不会重新投递，异常直接使整个融合段失败
+- 步骤内的 update_state() 没有独立的任务 ID，不应在可融合任务中使用
+- 带有 link / link_error / countdown / eta 等选项的签名不会被融合
+
+用法:
+    from extensions.fused_chain import fuse
+
+    workflow = fuse(chain(fetch_data.s('database'), process_item.s(), save_result.s()))
+    result = workflow.apply_async()
+"""
+
+from celery import chain
+from celery.canvas import Signature, _chain, chord, group, maybe_signature
+
+from celery_app import app
+
+# 出现这些选项的签名不参与融合
+NON_FUSIBLE_OPTIONS = frozenset({
+    'link', 'link_error', 'countdown', 'eta', 'expires', 'chord', 'group_id',
+})
+
+
+def fusible(signature):
+    """把签名标记为可融合"""
+    return signature.set(fusible=True)
+
+
+def _fusible_queue(signature):
+    """签名可融合时返回其目标队列名，否则返回 None"""
+    if isinstance(signature, (group, _chain, chord)) or not isinstance(signature, Signature):
+        return None
+    task = app.tasks.get(signature.task)
+    marked = signature.options.get('fusible', getattr(task, 'fusible', False))
+    if not marked or NON_FUSIBLE_OPTIONS & signature.options.keys():
+        return None
+    route = app.amqp.router.route(
+        dict(signature.options), signature.task, signature.args, signature.kwargs)
+    return route['queue'].name
+
+
+def fuse(workflow):
+    """
+    融合任务链中连续的可融合步骤
+
+    参数:
+        workflow: chain 或签名列表
+
+    返回:
+        新的 chain，不可融合的步骤保持原样
+    """
+    if isinstance(workflow, _chain):
+        steps, options = workflow.tasks, dict(workflow.options)
+    else:
+        steps, options = workflow, {}
+
+    # 按 (队列, 连续签名) 分段，不可融合的签名单独成段
+    segments = []
+    for step in steps:
+        step = maybe_signature(step, app=app)
+        queue = _fusible_queue(step)
+        if queue is not None and segments and segments[-1][0] == queue:
+            segments[-1][1].append(step)
+        else:
+            segments.append((queue, [step]))
+
+    fused_steps = []
+    for queue, signatures in segments:
+        if queue is None or len(signatures) == 1:
+            fused_steps.extend(signatures)
+            continue
+        fused = run_fused_chain.s(steps=[dict(sig) for sig in signatures])
+        fused.set(queue=queue, immutable=signatures[0].immutable)
+        fused_steps.append(fused)
+
+    fused_chain = chain(*fused_steps, app=app)
+    fused_chain.options.update(options)
+    return fused_chain
+
+
+@app.task(name='extensions.fused_chain.run_fused_chain')
+def run_fused_chain(*previous, steps):
+    """
+    在当前进程中依次执行融合后的步骤
+
+    参数:
+        previous: 链中上一步的结果（融合段位于链首时为空）
+        steps: 签名字典列表
+    """
+    value = previous
+    for step in steps:
+        signature = Signature.from_dict(step, app=app)
+        task = app.tasks[signature.task]
+        # 与 chain 的传参方式一致：上一步结果作为第一个位置参数，不可变签名除外
+        args = tuple(signature.args)
+        if value and not signature.immutable:
+            args = value + args
+        value = (task(*args, **signature.kwargs),)
+    return value[0]
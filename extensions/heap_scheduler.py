@@ -0,0 +1,208 @@
+"""
+堆调度器（Heap Scheduler）
+
+Celery Beat 默认调度器每次 tick 都会把整个调度表与上一次的副本逐项比较
+（schedules_equal），发现变化就重建整个堆；条目数到几万时每次 tick 都是 O(n)。
+另外，固定间隔任务的下一次执行时间以"实际执行时刻"为基准计算，
+每次执行的延迟会累积成漂移；beat 最长睡眠 beat_max_loop_interval（默认 300 秒）。
+
+HeapScheduler：
+1. 按下一次到期时间维护一个最小堆，tick 只看堆顶：O(log n)
+2. 增删改条目（add_entry / remove_entry）只推入新的堆元素，
+   旧元素通过版本号惰性失效，弹出时丢弃，不需要重建堆；
+   失效元素超过有效元素时整理一次堆，频繁替换条目时堆不会无限增长
+3. 下一次执行时间只在条目触发时增量计算：
+   - 固定间隔：上一次的"计划时间" + 间隔（不是实际执行时间），没有累积漂移；
+     错过多个周期时跳到当前时间之后的第一个周期，保持原有相位
+   - crontab：从上一次计划时间向后求下一个触发时刻
+   - 其他调度（solar 等）：使用调度对象自己的 is_due() 估计
+4. tick 返回距离堆顶到期的精确秒数（浮点数），beat 正好睡到下一个条目到期
+5. options 中带 fan_out 的条目按租户展开后批量发布（详见 extensions/fan_out.py）
+6. 继承 PersistentScheduler：调度表（包括每个条目的 last_run_at）保存在
+   shelve 文件（-s / beat_schedule_filename）中，按 beat_sync_every 与
+   sync_every 同步；beat 重启后从上一次的计划时间继续，固定间隔任务的相位不变
+
+启用方式（celery_app.py 中已配置）:
+    beat_scheduler = 'extensions.heap_scheduler:HeapScheduler'
+    或: celery -A celery_app beat -S extensions.heap_scheduler:HeapScheduler
+"""
+
+import heapq
+import logging
+import math
+import time
+from datetime import datetime
+from itertools import count
+
+from celery.beat import PersistentScheduler
+from celery.schedules import crontab, schedule as interval_schedule
+
+logger = logging.getLogger(__name__)
+
+
+class HeapScheduler(PersistentScheduler):
+    """以到期时间最小堆驱动的 Beat 调度器"""
+
+    #: 一次 tick 最多触发的条目数，避免大量条目同时到期时长时间不检查关闭信号
+    max_fires_per_tick = 1000
+    #: 失效的堆元素超过有效元素且多于该数量时整理堆
+    compact_threshold = 64
+
+    def __init__(self, *args, **kwargs):
+        # 堆元素: (到期时间戳, 版本号, 条目名)
+        self._due_heap = []
+        # 条目名 → 当前有效的版本号，堆中版本号不一致的元素已失效
+        self._versions = {}
+        self._counter = count()
+        super().__init__(*args, **kwargs)
+
+    # ------------------------------------------------------------------
+    # 堆维护
+    # ------------------------------------------------------------------
+
+    def _push(self, entry, due):
+        version = next(self._counter)
+        self._versions[entry.name] = version
+        heapq.heappush(self._due_heap, (due, version, entry.name))
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        """丢弃失效的堆元素：O(n)，只在失效元素占一半以上时执行，均摊 O(1)"""
+        versions = self._versions
+        stale = len(self._due_heap) - len(versions)
+        if stale <= max(len(versions), self.compact_threshold):
+            return
+        self._due_heap = [item for item in self._due_heap if versions.get(item[2]) == item[1]]
+        heapq.heapify(self._due_heap)
+
+    def _rebuild(self):
+        """按当前调度表重建堆（只在整体加载调度表时使用）"""
+        self._versions.clear()
+        self._due_heap = []
+        for entry in self.schedule.values():
+            self._push(entry, self._first_due(entry))
+
+    def _datetime(self, timestamp):
+        return datetime.fromtimestamp(timestamp, tz=self.app.timezone)
+
+    def _after(self, entry, timestamp):
+        """条目在 timestamp 之后的下一次计划时间"""
+        sched = entry.schedule
+        if isinstance(sched, crontab):
+            start, delta, _ = sched.remaining_delta(self._datetime(timestamp))
+            return (start + delta).timestamp()
+        if isinstance(sched, interval_schedule):
+            return timestamp + sched.run_every.total_seconds()
+        # 其他调度类型：以当前时间为基准估计
+        is_due, next_seconds = sched.is_due(self._datetime(timestamp))
+        return time.time() if is_due else time.time() + next_seconds
+
+    def _first_due(self, entry):
+        """条目加入调度表后的第一次到期时间"""
+        return self._after(entry, entry.last_run_at.timestamp())
+
+    def _next_due(self, entry, previous_due, now):
+        """条目触发后的下一次到期时间，保证晚于当前时间"""
+        sched = entry.schedule
+        if isinstance(sched, interval_schedule) and not isinstance(sched, crontab):
+            period = sched.run_every.total_seconds()
+            due = previous_due + period
+            if due <= now and period > 0:
+                # 错过了若干周期：跳到当前时间之后的第一个周期，相位不变
+                due += (math.floor((now - due) / period) + 1) * period
+            return due
+        return self._after(entry, max(previous_due, now))
+
+    # ------------------------------------------------------------------
+    # 调度表加载与动态增删
+    # ------------------------------------------------------------------
+
+    def merge_inplace(self, b):
+        super().merge_inplace(b)
+        self._rebuild()
+
+    def update_from_dict(self, dict_):
+        super().update_from_dict(dict_)
+        self._rebuild()
+
+    def add_entry(self, name, task, schedule, args=(), kwargs=None, options=None,
+                  last_run_at=None):
+        """
+        添加或替换一个调度条目：O(log n)
+
+        参数:
+            name: 条目名
+            task: 任务名
+            schedule: 秒数、timedelta、crontab 等调度对象
+            last_run_at: 上一次执行时间，默认为当前时间
+        """
+        entry = self.Entry(name=name, task=task, schedule=schedule, args=args,
+                           kwargs=kwargs or {}, options=options or {},
+                           last_run_at=last_run_at, app=self.app)
+        self.schedule[name] = entry
+        self._push(entry, self._first_due(entry))
+        return entry
+
+    def remove_entry(self, name):
+        """删除调度条目：O(1)，堆中的旧元素在弹出时或整理堆时丢弃"""
+        self._versions.pop(name, None)
+        entry = self.schedule.pop(name, None)
+        self._maybe_compact()
+        return entry
+
+    # ------------------------------------------------------------------
+    # 调度循环
+    # ------------------------------------------------------------------
+
+    def fire_entry(self, entry, due):
+        """发送一次到期的条目，due 为这一次的计划时间戳"""
+        if entry.options.get('fan_out'):
+            # 扇出调度条目：按租户展开后批量发布（extensions/fan_out.py）
+            from extensions.fan_out import fan_out_entry
+            try:
+                fan_out_entry(self.app, entry, due)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error('扇出调度 %s 发布失败: %r', entry.name, exc, exc_info=True)
+            return
+        self.apply_entry(entry, producer=self.producer)
+
+    def tick(self, *args, **kwargs):
+        """
+        触发所有已到期的条目
+
+        返回:
+            距离下一个条目到期的秒数（不超过 max_interval）
+        """
+        heap = self._due_heap
+        schedule = self.schedule
+        fired = 0
+        now = time.time()
+        while heap:
+            due, version, name = heap[0]
+            if self._versions.get(name) != version:
+                heapq.heappop(heap)
+                continue
+            if due > now:
+                break
+            if fired >= self.max_fires_per_tick:
+                break
+            heapq.heappop(heap)
+            entry = schedule[name]
+            # last_run_at 记为计划时间而不是实际执行时间，下一次执行时间不会漂移
+            next_entry = schedule[name] = entry._next_instance(
+                last_run_at=self._datetime(due))
+            self.fire_entry(entry, due)
+            fired += 1
+            now = time.time()
+            self._push(next_entry, self._next_due(next_entry, due, now))
+            # _push 可能整理了堆
+            heap = self._due_heap
+
+        if fired and self.should_sync():
+            # 扇出条目不经过 apply_async，这里统一把新的 last_run_at 写入 shelve
+            self._do_sync()
+        if fired >= self.max_fires_per_tick:
+            return 0
+        if not heap:
+            return self.max_interval
+        return max(min(heap[0][0] - now, self.max_interval), 0)
@@ -0,0 +1,147 @@
+"""
+幂等键（Idempotency Key）
+
+send_email 失败时 self.retry(countdown=5) 重试；配合 acks_late 或 Worker 丢失，
+同一条消息可能被投递多次。对邮件这类有副作用的任务，重复执行意味着重复发送，
+还会在 SMTP 限流下浪费发送配额。
+
+IdempotentTask 在执行任务体之前以幂等键检查 Redis 中的标记：
+
+    task-idempotency-<幂等键>
+        不存在              → 写入 running:<task_id>（带短期 TTL），执行任务体
+        running:<本任务 ID>  → 同一任务的重试或 Worker 丢失后的重新投递，继续执行
+        running:<其他 ID>    → 另一个任务正在处理同一个键，稍后重新投递自己
+                               （不计入重试次数，不消耗 max_retries）
+        done:<结果>         → 已经执行过，直接返回记录的结果，不再执行任务体
+
+    任务成功 → 写入 done:<结果>，保留 idempotency_ttl 秒
+    任务最终失败 → 删除属于自己的 running 标记，允许之后重新提交
+
+检查与占用由一个 Lua 脚本原子完成，并发的重复投递只有一个能进入任务体。
+
+幂等键的来源：
+1. 调用者通过消息头指定：apply_async(..., headers={'idempotency_key': 'welcome-42'})
+2. 未指定时使用任务 ID：只跳过同一条消息的重复投递与重试，
+   相同参数的另一次提交（例如同一封提醒邮件每天发送一次）照常执行
+3. 任务类设置 idempotency_key_from_args = True 时，由任务名与规范化参数的指纹派生，
+   idempotency_ttl 内相同参数的提交都只执行一次
+
+说明：任务体执行过程中 Worker 崩溃时，重新投递的消息任务 ID 相同，会再次执行，
+即副作用仍可能发生两次（至少一次）；执行完成后的所有重复投递都会被跳过。
+"""
+
+import logging
+
+from celery.exceptions import Retry
+from kombu.utils.encoding import ensure_bytes
+from kombu.utils.objects import cached_property
+
+from extensions.async_client import AsyncTask
+from extensions.fingerprint import task_fingerprint
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'task-idempotency-'
+RUNNING = 'running:'
+DONE = b'done:'
+
+# KEYS[1] 幂等标记  ARGV[1] running:<task_id>  ARGV[2] 占用有效期（秒）
+# 返回 false 表示占用成功，否则返回现有标记
+CLAIM_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if not value or value == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return false
+end
+return value
+"""
+
+# KEYS[1] 幂等标记  ARGV[1] running:<task_id>
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class IdempotentTask(AsyncTask):
+    """按幂等键跳过重复投递的任务基类"""
+
+    #: 完成标记的保留时间（秒），在此期间的重复投递都会被跳过
+    idempotency_ttl = 86400
+    #: 执行中标记的有效期（秒），应不短于任务最长执行时间加上重试间隔
+    idempotency_lock_ttl = 600
+    #: 同一个键正由其他任务处理时，多少秒后重新投递
+    idempotency_retry_delay = 5
+    #: 消息头中没有幂等键时是否由参数派生（默认以任务 ID 为键）
+    idempotency_key_from_args = False
+
+    @cached_property
+    def _claim(self):
+        return self.backend.client.register_script(CLAIM_SCRIPT)
+
+    @cached_property
+    def _release(self):
+        return self.backend.client.register_script(RELEASE_SCRIPT)
+
+    def idempotency_key(self, args, kwargs):
+        """优先使用消息头中的 idempotency_key，否则使用任务 ID（或由参数派生）"""
+        key = getattr(self.request, 'idempotency_key', None)
+        if key is None:
+            if self.idempotency_key_from_args:
+                key = task_fingerprint(self.name, args, kwargs)
+            else:
+                key = f'id:{self.request.id}'
+        return f'{KEY_PREFIX}{self.name}:{key}'
+
+    def _with_key_header(self, options):
+        # 重试消息的消息头由 retry() 重新构建，需要显式带上调用者指定的幂等键
+        key = getattr(self.request, 'idempotency_key', None)
+        if key is not None:
+            options['headers'] = {**(options.get('headers') or {}), 'idempotency_key': key}
+        return options
+
+    def retry(self, *args, **options):
+        return super().retry(*args, **self._with_key_header(options))
+
+    def _wait_for_claim(self):
+        """
+        另一个任务正持有同一个键：稍后重新投递自己
+
+        与 retry() 相同地沿用任务 ID 与参数，但重试次数不变，不消耗 max_retries；
+        占用标记带 TTL，最多等待 idempotency_lock_ttl 秒
+        """
+        countdown = self.idempotency_retry_delay
+        signature = self.signature_from_request(
+            self.request, **self._with_key_header(
+                {'countdown': countdown, 'retries': self.request.retries}))
+        signature.apply_async()
+        logger.info('%s[%s] 同一个幂等键正由其他任务处理，%s 秒后重新投递',
+                    self.name, self.request.id, countdown)
+        raise Retry(when=countdown, sig=signature)
+
+    def __call__(self, *args, **kwargs):
+        if self.request.called_directly:
+            return super().__call__(*args, **kwargs)
+
+        key = self.idempotency_key(args, kwargs)
+        marker = RUNNING + self.request.id
+        existing = self._claim(keys=[key], args=[marker, self.idempotency_lock_ttl])
+        if existing is not None:
+            if existing.startswith(DONE):
+                logger.info('%s[%s] 已执行过，跳过重复投递', self.name, self.request.id)
+                return self.backend.decode(existing[len(DONE):])
+            self._wait_for_claim()
+
+        try:
+            result = super().__call__(*args, **kwargs)
+        except Retry:
+            # 重试沿用同一个任务 ID，保留 running 标记
+            raise
+        except Exception:
+            self._release(keys=[key], args=[marker])
+            raise
+        self.backend.client.set(
+            key, DONE + ensure_bytes(self.backend.encode(result)), ex=self.idempotency_ttl)
+        return result
@@ -0,0 +1,297 @@
+"""
+队列内存分析（Memory Profiler）
+
+Redis 内存涨了，却不知道是哪个队列、哪个任务、什么样的参数占用的。
+
+本模块用 MEMORY USAGE 测量队列与结果键实际占用的字节数，并归因到任务名与参数形状：
+
+1. 队列（包括优先级子队列）：
+   - MEMORY USAGE <列表> SAMPLES 0 得到整个列表的实际内存
+   - 分页读取消息（queue_inspector），按 (任务名, 参数形状) 累加消息长度，
+     再按 "实际内存 / 消息总长度" 的比例分摊列表本身的开销
+   - sample_size: 每个队列最多读取的消息数；队列更长时在整个列表上等间隔抽取窗口，
+     按 队列长度 / 抽样数 放大
+2. 结果键（celery-task-meta-*）：
+   - SCAN 分批取键，每批在一个 pipeline 中 MEMORY USAGE + GET
+   - 结果中没有任务名（未开启 result_extended）时按 (状态, 结果形状) 归类
+
+参数形状把具体的值换成类型，容器带上数量级，例如:
+    tasks.basic_tasks.add(int, int)
+    tasks.advanced_tasks.process_data(list[~1k])
+    tasks.realworld_tasks.generate_report(str, dict{end,start})
+
+不支持 MEMORY 命令的 Redis（部分托管服务会禁用）退化为按消息 / 值的长度估算。
+
+用法:
+    python -m extensions.memory_profiler --top 20
+    python -m extensions.memory_profiler --queue basic --sample-size 100000 --no-results
+"""
+
+import json
+import time
+from collections import defaultdict
+
+from extensions.queue_inspector import (
+    PRIORITY_STEPS, WINDOW, decode_window, iter_windows, queue_keys,
+)
+
+RESULT_PATTERN = 'celery-task-meta-*'
+
+
+def _magnitude(n):
+    """数量级：1、~10、~100、~1k ..."""
+    if n < 10:
+        return str(n)
+    for limit, label in ((100, '~10'), (1000, '~100'), (10000, '~1k'),
+                         (100000, '~10k'), (1000000, '~100k')):
+        if n < limit:
+            return label
+    return '~1M+'
+
+
+def value_shape(value, depth=0):
+    """值的形状：类型名，容器带上数量级（字典带上键名）"""
+    if isinstance(value, dict):
+        if depth == 0 and len(value) <= 8:
+            return 'dict{' + ','.join(sorted(map(str, value))) + '}'
+        return f'dict[{_magnitude(len(value))}]'
+    if isinstance(value, (list, tuple)):
+        return f'{type(value).__name__}[{_magnitude(len(value))}]'
+    if isinstance(value, str) and len(value) >= 1000:
+        return f'str[{_magnitude(len(value))}]'
+    return type(value).__name__
+
+
+def args_shape(args, kwargs):
+    """参数形状，例如 (int, list[~1k], mode=str)"""
+    parts = [value_shape(arg) for arg in args or ()]
+    parts += [f'{key}={value_shape(value)}' for key, value in sorted((kwargs or {}).items())]
+    return '(' + ', '.join(parts) + ')'
+
+
+class MemoryProfile:
+    """按 (来源, 任务名, 形状) 汇总的内存占用"""
+
+    def __init__(self):
+        # (来源, 任务名, 形状) → [数量, 字节数]
+        self.groups = defaultdict(lambda: [0, 0])
+        # 来源 → (实际字节数, 是否抽样放大)
+        self.sources = {}
+        self.elapsed = 0.0
+        self.memory_command = True
+
+    def add(self, source, task, shape, count, size):
+        group = self.groups[(source, task, shape)]
+        group[0] += count
+        group[1] += size
+
+    def top(self, n=20):
+        """按字节数从大到小的前 n 组"""
+        return sorted(self.groups.items(), key=lambda item: item[1][1], reverse=True)[:n]
+
+    def report(self, n=20):
+        total = sum(size for _, size in self.groups.values()) or 1
+        lines = [f"内存分析（扫描耗时 {self.elapsed:.2f} 秒"
+                 + ("" if self.memory_command else "，Redis 不支持 MEMORY 命令，按长度估算")
+                 + "）"]
+        lines.append("  按来源:")
+        for source, (size, scaled) in sorted(self.sources.items(), key=lambda item: -item[1][0]):
+            lines.append(f"    {source:40s} {_format_bytes(size):>10s}"
+                         + ("  （抽样估算）" if scaled else ""))
+        lines.append(f"  占用最多的 {n} 组（任务名 + 参数形状）:")
+        lines.append(f"    {'来源':16s} {'任务':60s} {'数量':>10s} {'字节':>10s} {'平均':>10s} {'占比':>6s}")
+        for (source, task, shape), (count, size) in self.top(n):
+            label = f'{task}{shape}'
+            if len(label) > 60:
+                label = label[:57] + '...'
+            lines.append(
+                f"    {source:16s} {label:60s} {count:10d} {_format_bytes(size):>10s} "
+                f"{_format_bytes(size / count if count else 0):>10s} {size / total * 100:5.1f}%")
+        return '\n'.join(lines)
+
+
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:.0f}{unit}' if unit == 'B' else f'{size:.1f}{unit}'
+        size /= 1024
+    return f'{size:.1f}GB'
+
+
+def _memory_usage(client, keys, profile):
+    """在一个 pipeline 中读取多个键的 MEMORY USAGE；不支持时返回 None"""
+    if not profile.memory_command:
+        return None
+    try:
+        with client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.memory_usage(key, samples=0)
+            return pipe.execute()
+    except Exception:  # pylint: disable=broad-except
+        profile.memory_command = False
+        return None
+
+
+def _sample_windows(client, key, length, sample_size, window):
+    """整个列表不超过 sample_size 时全部读取，否则等间隔抽取窗口"""
+    if sample_size is None or length <= sample_size:
+        yield from iter_windows(client, key, window)
+        return
+    windows = max(sample_size // window, 1)
+    stride = length // windows
+    for i in range(windows):
+        start = i * stride
+        items = client.lrange(key, start, start + min(window, sample_size) - 1)
+        if items:
+            yield items
+
+
+def profile_queue(client, queue, profile, sample_size=None, window=WINDOW,
+                  steps=PRIORITY_STEPS):
+    """分析一个队列（包括优先级子队列）的内存占用"""
+    keys = queue_keys(queue, steps)
+    with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.llen(key)
+        lengths = pipe.execute()
+    keys = [key for key, length in zip(keys, lengths) if length]
+    lengths = [length for length in lengths if length]
+    if not keys:
+        return
+    usages = _memory_usage(client, keys, profile) or [None] * len(keys)
+
+    total_memory = 0
+    scaled_any = False
+    for key, length, usage in zip(keys, lengths, usages):
+        groups = defaultdict(lambda: [0, 0])
+        sampled = raw_bytes = 0
+        for items in _sample_windows(client, key, length, sample_size, window):
+            for raw, message in zip(items, decode_window(items, decode_body=True)):
+                task = message.task if message is not None else '<非任务消息>'
+                shape = args_shape(message.args, message.kwargs) if message is not None else ''
+                group = groups[(task, shape)]
+                group[0] += 1
+                group[1] += len(raw)
+                raw_bytes += len(raw)
+                sampled += 1
+        if not sampled:
+            continue
+        # 抽样放大，并把列表本身的开销按消息长度比例分摊
+        count_scale = length / sampled
+        actual = usage if usage is not None else raw_bytes * count_scale
+        byte_scale = actual / raw_bytes
+        scaled_any = scaled_any or count_scale > 1
+        total_memory += actual
+        for (task, shape), (count, size) in groups.items():
+            profile.add(f'队列 {queue}', task, shape,
+                        round(count * count_scale), size * byte_scale)
+    profile.sources[f'队列 {queue}'] = (total_memory, scaled_any)
+
+
+def profile_results(client, profile, sample_size=None, batch_size=1000,
+                    pattern=RESULT_PATTERN):
+    """分析结果键的内存占用（SCAN，不阻塞 Redis）"""
+    scanned = 0
+    total_memory = 0
+    batch = []
+
+    def flush():
+        nonlocal total_memory
+        usages = _memory_usage(client, batch, profile)
+        values = client.mget(batch)
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            size = usages[i] if usages and usages[i] is not None else len(value)
+            total_memory += size
+            try:
+                meta = json.loads(value)
+            except ValueError:
+                profile.add('结果', '<无法解析>', '', 1, size)
+                continue
+            task = meta.get('name') or f"<{meta.get('status', 'UNKNOWN')}>"
+            profile.add('结果', task, f"→{value_shape(meta.get('result'))}", 1, size)
+        batch.clear()
+
+    for key in client.scan_iter(match=pattern, count=batch_size):
+        batch.append(key)
+        scanned += 1
+        if len(batch) >= batch_size:
+            flush()
+        if sample_size is not None and scanned >= sample_size:
+            break
+    if batch:
+        flush()
+    profile.sources['结果'] = (total_memory, sample_size is not None and scanned >= sample_size)
+
+
+def profile_memory(client, queues, sample_size=None, results=True):
+    """
+    分析多个队列与结果键的内存占用
+
+    参数:
+        client: Broker / 结果后端的 Redis 客户端
+        queues: 队列名列表
+        sample_size: 每个队列 / 结果键最多读取的条数，None 表示全量扫描
+        results: 是否分析结果键
+
+    返回:
+        MemoryProfile
+    """
+    profile = MemoryProfile()
+    started = time.perf_counter()
+    for queue in queues:
+        profile_queue(client, queue, profile, sample_size=sample_size)
+    if results:
+        profile_results(client, profile, sample_size=sample_size)
+    profile.elapsed = time.perf_counter() - started
+    return profile
+
+
+def configured_queues(app):
+    """配置中出现的所有队列：默认队列、task_queues 与 task_routes 中的目标队列"""
+    conf = app.conf
+    queues = [conf.task_default_queue]
+    queues += [queue.name for queue in conf.task_queues or ()]
+    routes = conf.task_routes or {}
+    # 路由器函数 / 列表形式的 task_routes 无法静态展开，只取字典形式中的目标队列
+    for route in (routes.values() if isinstance(routes, dict) else ()):
+        queue = route.get('queue') if isinstance(route, dict) else None
+        queue = getattr(queue, 'name', queue)
+        if queue:
+            queues.append(queue)
+    return list(dict.fromkeys(queues))
+
+
+def main():
+    """命令行入口"""
+    import argparse
+
+    import redis
+
+    parser = argparse.ArgumentParser(description='Redis 队列与结果内存分析')
+    parser.add_argument('--host', default='localhost', help='Redis 主机地址')
+    parser.add_argument('--port', type=int, default=6379, help='Redis 端口')
+    parser.add_argument('--db', type=int, default=0, help='Redis 数据库编号')
+    parser.add_argument('--password', default=None, help='Redis 密码')
+    parser.add_argument('--queue', action='append',
+                        help='要分析的队列（可重复），默认为 celery_app 配置中的所有队列')
+    parser.add_argument('--sample-size', type=int, default=None,
+                        help='每个队列 / 结果键最多读取的条数，默认全量扫描')
+    parser.add_argument('--no-results', action='store_true', help='不分析结果键')
+    parser.add_argument('--top', type=int, default=20, help='显示前 N 组，默认 20')
+    args = parser.parse_args()
+
+    client = redis.Redis(host=args.host, port=args.port, db=args.db, password=args.password)
+    if args.queue:
+        queues = args.queue
+    else:
+        from celery_app import app
+        queues = configured_queues(app)
+    profile = profile_memory(client, queues, sample_size=args.sample_size,
+                             results=not args.no_results)
+    print(profile.report(args.top))
+
+
+if __name__ == '__main__':
+    main()
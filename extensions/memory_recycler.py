@@ -0,0 +1,259 @@
+"""
+按内存回收子进程（Memory Recycler）
+
+worker_max_tasks_per_child=1000 按任务数回收子进程，不管它是否泄漏：
+没有泄漏的子进程被定期杀掉，预热好的缓存（模型、连接、编译好的正则等）随之丢失；
+泄漏严重的子进程却可能在第 1000 个任务之前就把内存撑爆。
+
+RecyclingTaskPool 是 prefork 池的子类，子进程在每个任务完成后测量自己的常驻内存（RSS），
+在领取下一个任务之前按以下规则决定是否退出（退出码 EX_RECYCLE，父进程随即补充新的子进程）:
+
+1. 高水位: RSS 超过 worker_recycle_rss_limit（MB）
+2. 增长: RSS 比预热后的基线（完成 worker_recycle_warmup 个任务时的 RSS）
+   增长超过 worker_recycle_growth_limit（MB）
+3. 趋势: 最近 worker_recycle_window 个任务的 RSS 线性回归斜率超过
+   worker_recycle_trend_limit（KB / 任务），即持续泄漏；
+   偶尔的阶跃（内存池扩容、缓存填满）不会触发
+4. 可选的任务数上限 worker_recycle_max_tasks 与存活时间上限 worker_recycle_max_age（秒）
+
+每个回收决定都会记录日志（原因、任务数、存活时间、RSS、增长与斜率）。
+决定在两个任务之间做出，子进程不会在执行任务的中途退出。
+
+启动:
+    CELERY_CUSTOM_WORKER_POOL=extensions.memory_recycler:RecyclingTaskPool \\
+        celery -A celery_app worker --pool=custom --queues=basic,advanced,realworld
+
+多执行池中把 prefork 池替换为 'extensions.memory_recycler:RecyclingTaskPool' 即可。
+
+说明:
+- 回收规则由 worker_recycle_* 决定，worker_max_tasks_per_child 在这个池中不再生效
+- 吞吐量对比见 examples/recycle_benchmark.py
+"""
+
+import logging
+import os
+import sys
+import time
+from collections import deque
+
+from billiard import pool as _pool
+from billiard.pool import EX_RECYCLE, NACK
+from celery.concurrency import asynpool
+from celery.concurrency.prefork import TaskPool
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def rss_bytes():
+    """当前进程的常驻内存（字节），读取失败时返回 0"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def slope(samples):
+    """最小二乘斜率，samples 为 (任务序号, RSS 字节数)，返回 字节 / 任务"""
+    n = len(samples)
+    if n < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in samples) / n
+    mean_y = sum(y for _, y in samples) / n
+    var = sum((x - mean_x) ** 2 for x, _ in samples)
+    if not var:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in samples) / var
+
+
+class RecyclePolicy:
+    """
+    回收规则（不可变，在父进程中创建，fork 后由每个子进程使用）
+
+    参数:
+        rss_limit: 高水位（MB），None 表示不限制
+        growth_limit: 相对预热后基线的增长上限（MB）
+        trend_limit: RSS 增长斜率上限（KB / 任务）
+        window: 计算斜率的任务数
+        warmup: 完成多少个任务后记录基线
+        max_tasks: 任务数上限
+        max_age: 存活时间上限（秒）
+    """
+
+    def __init__(self, rss_limit=None, growth_limit=None, trend_limit=None,
+                 window=200, warmup=20, max_tasks=None, max_age=None):
+        self.rss_limit = rss_limit
+        self.growth_limit = growth_limit
+        self.trend_limit = trend_limit
+        self.window = window
+        self.warmup = warmup
+        self.max_tasks = max_tasks
+        self.max_age = max_age
+
+    @classmethod
+    def from_conf(cls, conf):
+        return cls(
+            rss_limit=conf.get('worker_recycle_rss_limit'),
+            growth_limit=conf.get('worker_recycle_growth_limit'),
+            trend_limit=conf.get('worker_recycle_trend_limit'),
+            window=conf.get('worker_recycle_window') or 200,
+            warmup=conf.get('worker_recycle_warmup') or 20,
+            max_tasks=conf.get('worker_recycle_max_tasks'),
+            max_age=conf.get('worker_recycle_max_age'),
+        )
+
+    def __repr__(self):
+        limits = [f'{key}={value}' for key, value in (
+            ('rss_limit', self.rss_limit), ('growth_limit', self.growth_limit),
+            ('trend_limit', self.trend_limit), ('max_tasks', self.max_tasks),
+            ('max_age', self.max_age),
+        ) if value is not None]
+        return f'<RecyclePolicy {" ".join(limits) or "unlimited"} window={self.window}>'
+
+
+class MemoryMonitor:
+    """子进程内的内存记录与回收判断"""
+
+    def __init__(self, policy, clock=time.monotonic, measure=rss_bytes):
+        self.policy = policy
+        self.clock = clock
+        self.measure = measure
+        self.started = clock()
+        self.completed = 0
+        self.rss = measure()
+        self.baseline = None
+        self.samples = deque(maxlen=policy.window)
+        # 斜率每隔若干个任务计算一次，避免每个任务都遍历整个窗口
+        self.trend_every = max(1, policy.window // 20)
+        self.trend = 0.0
+
+    def task_done(self):
+        """任务完成后记录 RSS"""
+        self.completed += 1
+        self.rss = self.measure()
+        if self.completed == self.policy.warmup:
+            self.baseline = self.rss
+        if self.baseline is not None:
+            self.samples.append((self.completed, self.rss))
+            if len(self.samples) == self.policy.window and not self.completed % self.trend_every:
+                self.trend = slope(self.samples)
+
+    @property
+    def growth(self):
+        return self.rss - self.baseline if self.baseline is not None else 0
+
+    def reason(self):
+        """需要回收时返回原因，否则返回 None"""
+        policy = self.policy
+        if policy.rss_limit is not None and self.rss > policy.rss_limit * MB:
+            return f'RSS 超过高水位 {policy.rss_limit} MB'
+        if policy.growth_limit is not None and self.growth > policy.growth_limit * MB:
+            return f'RSS 比基线增长超过 {policy.growth_limit} MB'
+        if policy.trend_limit is not None and self.trend > policy.trend_limit * 1024:
+            return f'RSS 持续增长超过 {policy.trend_limit} KB/任务'
+        if policy.max_tasks is not None and self.completed >= policy.max_tasks:
+            return f'执行了 {policy.max_tasks} 个任务'
+        if policy.max_age is not None and self.clock() - self.started > policy.max_age:
+            return f'存活超过 {policy.max_age} 秒'
+        return None
+
+    def describe(self):
+        return (f'任务 {self.completed}，存活 {self.clock() - self.started:.0f} 秒，'
+                f'RSS {self.rss / MB:.1f} MB，增长 {self.growth / MB:.1f} MB，'
+                f'斜率 {self.trend / 1024:.1f} KB/任务')
+
+
+class RecyclingWorkerMixin:
+    """子进程在两个任务之间检查回收规则，需要回收时以 EX_RECYCLE 退出"""
+
+    recycle_policy = None
+
+    def _make_child_methods(self, *args, **kwargs):
+        super()._make_child_methods(*args, **kwargs)
+        if self.recycle_policy is None:
+            return
+        monitor = self.memory_monitor = MemoryMonitor(self.recycle_policy)
+        receive = self.wait_for_job
+        busy = False
+
+        def wait_for_job():
+            nonlocal busy
+            # 上一次领取到任务，再次领取时说明它已经执行完
+            if busy:
+                busy = False
+                monitor.task_done()
+            reason = monitor.reason()
+            if reason is not None:
+                logger.info('回收子进程 %s: %s（%s）', os.getpid(), reason, monitor.describe())
+                # 经过 Worker.__call__ 替换的 sys.exit 记录退出码，直接 raise SystemExit 会以 EX_OK 退出
+                sys.exit(EX_RECYCLE)
+            req = receive()
+            busy = req is not None
+            return req
+
+        self.wait_for_job = wait_for_job
+
+        receive_syn = self.wait_for_syn
+        if receive_syn is None:
+            return
+
+        def wait_for_syn():
+            nonlocal busy
+            req = receive_syn()
+            # 被父进程 NACK 的任务不会执行，不计入执行过的任务
+            if req and req[0] == NACK:
+                busy = False
+            return req
+
+        self.wait_for_syn = wait_for_syn
+
+
+class Worker(RecyclingWorkerMixin, asynpool.Worker):
+    """AsynPool 子进程"""
+
+
+class BlockingWorker(RecyclingWorkerMixin, _pool.Worker):
+    """billiard Pool 子进程（threads=True）"""
+
+
+class _RecyclingPoolMixin:
+
+    def __init__(self, *args, recycle_policy=None, **kwargs):
+        # 父类的 __init__ 中就会创建子进程，先保存回收规则
+        self.recycle_policy = recycle_policy
+        super().__init__(*args, **kwargs)
+
+    def WorkerProcess(self, worker):
+        worker.recycle_policy = self.recycle_policy
+        return super().WorkerProcess(worker)
+
+
+class AsynPool(_RecyclingPoolMixin, asynpool.AsynPool):
+    Worker = Worker
+
+
+class BlockingPool(_RecyclingPoolMixin, _pool.Pool):
+    Worker = BlockingWorker
+
+
+class RecyclingTaskPool(TaskPool):
+    """按内存回收子进程的 prefork 池"""
+
+    Pool = AsynPool
+    BlockingPool = BlockingPool
+
+    def __init__(self, limit=None, recycle_policy=None, **options):
+        # 任务数上限由回收规则负责，记录在回收日志中
+        options.pop('maxtasksperchild', None)
+        super().__init__(limit, **options)
+        if recycle_policy is None:
+            recycle_policy = RecyclePolicy.from_conf(self.app.conf)
+        self.options['recycle_policy'] = self.recycle_policy = recycle_policy
+        logger.info('子进程回收规则: %r', recycle_policy)
+
+    def _get_info(self):
+        info = super()._get_info()
+        info['recycle-policy'] = repr(self.recycle_policy)
+        return info
@@ -0,0 +1,201 @@
+"""
+模型缓存（Model Cache）
+
+examples/pytorch_numpy_fix.py 与 examples/sigsegv_solutions.py 中的 SIGSEGV 与警告，
+根源是 NumPy / PyTorch 的状态（线程池、CUDA 上下文、OpenMP 运行时）跨越了 fork；
+换成 eventlet 池可以绕开，但失去了多核 CPU。
+
+本模块让模型在 prefork 子进程中安全地加载与共享：
+
+1. 导出：第一次使用模型时执行导出函数（例如从 checkpoint 转换），
+   把权重写成 .npy 文件（model_cache_dir/<名称>-<版本>/），每台机器只导出一次（文件锁）
+2. 加载：子进程用 numpy.load(mmap_mode=...) 映射权重文件，再交给 build 函数构建模型；
+   N 个子进程共享操作系统页缓存中的同一份权重，而不是各自持有一份副本
+3. 缓存：每个子进程缓存自己构建的模型；缓存按进程号失效，fork 继承的缓存不会被使用
+4. 预加载：worker_process_init 时（fork 之后）加载 worker_preload_models 中已经导出的模型；
+   子进程因 worker_max_tasks_per_child 回收重建时只需重新映射文件，不需要重新导出
+
+映射模式默认为 'c'（写时复制）：数组可写（torch.from_numpy 不会产生只读警告），
+未修改的页仍然与其他子进程共享；设为 'r' 时数组只读。
+
+用法:
+    from extensions.model_cache import get_model, model
+
+    @model('text-classifier', version='1', build=LinearClassifier)
+    def export_text_classifier():
+        return {'embedding': ..., 'classifier': ...}   # 权重名 → numpy 数组
+
+    @app.task(...)
+    def classify_text(text):
+        return get_model('text-classifier').predict(text)
+
+注意：Worker 父进程中不要调用 get_model()，否则 NumPy / PyTorch 的状态又会跨越 fork。
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from celery.signals import worker_process_init
+
+from celery_app import app
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+# 名称 → ModelSpec
+_specs = {}
+# 名称 → 已构建的模型（只在 _owner 进程中有效）
+_models = {}
+_owner = None
+_lock = threading.RLock()
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('模型缓存需要 numpy: uv sync --extra ml 或 pip install numpy') from None
+    return numpy
+
+
+class ModelSpec:
+    """
+    模型定义
+
+    参数:
+        name: 模型名称
+        export: 导出函数，返回 {权重名: numpy 数组}
+        build: 构建函数，参数是映射后的权重字典，返回模型对象；默认直接返回权重字典
+        version: 版本号，导出函数的输出发生变化时递增
+    """
+
+    def __init__(self, name, export, build=None, version='1'):
+        self.name = name
+        self.export = export
+        self.build = build
+        self.version = str(version)
+
+    @property
+    def directory(self):
+        root = Path(app.conf.get('model_cache_dir') or 'model-cache')
+        return root / f'{self.name}-{self.version}'
+
+
+def register_model(name, export, build=None, version='1'):
+    """注册模型"""
+    spec = _specs[name] = ModelSpec(name, export, build, version)
+    return spec
+
+
+def model(name, version='1', build=None):
+    """注册模型的装饰器，被装饰的函数是导出函数"""
+    def decorator(export):
+        register_model(name, export, build, version)
+        return export
+    return decorator
+
+
+def _read_manifest(directory):
+    try:
+        with open(directory / MANIFEST) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def ensure_exported(spec):
+    """导出权重文件（已导出时直接返回清单），多个进程同时调用时只有一个执行导出"""
+    directory = spec.directory
+    manifest = _read_manifest(directory)
+    if manifest is not None:
+        return manifest
+
+    np = _numpy()
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    with open(directory.with_name(directory.name + '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        manifest = _read_manifest(directory)
+        if manifest is not None:
+            return manifest
+
+        started = time.monotonic()
+        weights = spec.export()
+        # 写入临时目录后整体改名，其他进程看不到写了一半的权重
+        tmp = directory.with_name(f'{directory.name}.tmp-{os.getpid()}')
+        tmp.mkdir()
+        for key, array in weights.items():
+            np.save(tmp / f'{key}.npy', np.ascontiguousarray(array))
+        manifest = {
+            'name': spec.name,
+            'version': spec.version,
+            'keys': sorted(weights),
+            'bytes': sum(int(array.nbytes) for array in weights.values()),
+        }
+        with open(tmp / MANIFEST, 'w') as f:
+            json.dump(manifest, f)
+        os.rename(tmp, directory)
+        logger.info('导出模型 %s（版本 %s，%.1f MB）用时 %.2f 秒', spec.name, spec.version,
+                    manifest['bytes'] / 1024 / 1024, time.monotonic() - started)
+    return manifest
+
+
+def map_weights(spec, manifest):
+    """映射权重文件，返回 {权重名: numpy 数组（memmap）}"""
+    np = _numpy()
+    mode = app.conf.get('model_mmap_mode') or 'c'
+    return {key: np.load(spec.directory / f'{key}.npy', mmap_mode=mode)
+            for key in manifest['keys']}
+
+
+def get_model(name):
+    """获取当前进程的模型，第一次调用时映射权重并构建"""
+    global _owner
+    with _lock:
+        pid = os.getpid()
+        if _owner != pid:
+            # fork 继承的模型属于父进程，丢弃
+            _models.clear()
+            _owner = pid
+        instance = _models.get(name)
+        if instance is None:
+            spec = _specs[name]
+            started = time.monotonic()
+            manifest = ensure_exported(spec)
+            weights = map_weights(spec, manifest)
+            instance = spec.build(weights) if spec.build is not None else weights
+            _models[name] = instance
+            logger.info('进程 %s 加载模型 %s 用时 %.1f 毫秒', pid, name,
+                        (time.monotonic() - started) * 1000)
+        return instance
+
+
+def loaded_models():
+    """当前进程已加载的模型名称"""
+    return list(_models) if _owner == os.getpid() else []
+
+
+@worker_process_init.connect
+def preload_models(**kwargs):
+    """
+    子进程启动时预加载模型
+
+    worker_process_init 必须在 worker_proc_alive_timeout（默认 4 秒）内完成，
+    这里只映射已经导出的模型；尚未导出的模型在第一个任务中导出
+    """
+    for name in app.conf.get('worker_preload_models') or ():
+        spec = _specs.get(name)
+        if spec is None:
+            logger.warning('预加载的模型 %s 未注册', name)
+            continue
+        if _read_manifest(spec.directory) is None:
+            continue
+        try:
+            get_model(name)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('预加载模型 %s 失败', name)
@@ -0,0 +1,142 @@
+"""
+多执行池（Multi Pool）
+
+start_worker.sh 用一个 prefork Worker 消费所有队列，I/O 密集型的 send_email
+与 CPU 密集型的 process_image 只能使用同一种执行池；
+为每种负载单独启动 Worker 又要多付出一份 Worker 进程（连接、心跳、已加载的任务模块）的内存。
+
+MultiPool 在一个 Worker 中同时托管多个执行池，每个任务按以下顺序选择执行池：
+1. 任务属性 execution_pool（例如 @app.task(..., execution_pool='threads')）
+2. worker_pool_routes: 消息所在队列（routing_key）→ 池名
+3. worker_pools 中的第一个池
+
+配置（celery_app.py）:
+    worker_pools={
+        'prefork': ('prefork', 4),                                  # CPU 密集型
+        'threads': ('threads', 20),                                 # 阻塞 I/O
+        'asyncio': ('extensions.asyncio_pool:AsyncIOPool', 1000),   # async def 任务
+    },
+    worker_pool_routes={'io': 'asyncio'},
+
+启动:
+    CELERY_CUSTOM_WORKER_POOL=extensions.multi_pool:MultiPool \\
+        celery -A celery_app worker --pool=custom --queues=basic,advanced,realworld,io
+
+说明:
+- --concurrency 不再生效，各个池的并发数来自 worker_pools，预取数按总并发数计算
+- 时间限制、worker_max_tasks_per_child 等进程选项作用于 prefork 池
+- prefork 池最先启动，在其他池创建线程之前 fork 出子进程
+- eventlet / gevent 需要 monkey patch 整个进程，不能与其他池混用
+"""
+
+import os
+
+from celery.concurrency import get_implementation
+from celery.concurrency.base import BasePool
+
+GREEN_POOLS = frozenset({'eventlet', 'gevent'})
+
+DEFAULT_POOLS = {
+    'prefork': ('prefork', 4),
+    'threads': ('threads', 20),
+}
+
+
+class MultiPool(BasePool):
+    """在一个 Worker 中托管多个执行池"""
+
+    signal_safe = False
+
+    def __init__(self, limit=None, **options):
+        super().__init__(limit, **options)
+        conf = self.app.conf
+        self.routes = dict(conf.get('worker_pool_routes') or {})
+        # prefork 子进程的并发由 billiard 自己的信号量控制，不使用 Worker 的全局信号量
+        options.pop('semaphore', None)
+        self.pools = {}
+        for name, (implementation, concurrency) in (conf.get('worker_pools') or DEFAULT_POOLS).items():
+            if implementation in GREEN_POOLS:
+                raise ValueError(f'执行池 {name}: {implementation} 需要 monkey patch，不能与其他池混用')
+            cls = get_implementation(implementation)
+            self.pools[name] = cls(concurrency, **options)
+        self.default = next(iter(self.pools))
+        for queue, name in self.routes.items():
+            if name not in self.pools:
+                raise ValueError(f'队列 {queue} 映射到未定义的执行池 {name}')
+        self.limit = sum(pool.limit for pool in self.pools.values())
+        self.prefork = next((pool for pool in self.pools.values()
+                             if getattr(pool, 'uses_semaphore', False)), None)
+
+    def _ordered(self):
+        # prefork 池最先启动
+        return sorted(self.pools.values(), key=lambda pool: pool is not self.prefork)
+
+    def on_start(self):
+        for pool in self._ordered():
+            pool.start()
+        if self.prefork is not None:
+            self.flush = self.prefork.flush
+
+    def did_start_ok(self):
+        return all(pool.did_start_ok() for pool in self.pools.values())
+
+    def register_with_event_loop(self, loop):
+        for pool in self.pools.values():
+            pool.register_with_event_loop(loop)
+
+    def on_stop(self):
+        for pool in self.pools.values():
+            pool.stop()
+
+    def on_terminate(self):
+        for pool in self.pools.values():
+            pool.terminate()
+
+    def on_close(self):
+        for pool in self.pools.values():
+            pool.close()
+
+    def select(self, task_name, request):
+        """选择执行池名"""
+        task = self.app.tasks.get(task_name)
+        name = getattr(task, 'execution_pool', None)
+        if name in self.pools:
+            return name
+        delivery_info = request.get('delivery_info') or {}
+        return self.routes.get(delivery_info.get('routing_key'), self.default)
+
+    def on_apply(self, target, args=None, kwargs=None, **options):
+        pool = self.pools[self.select(args[0], args[2])]
+        return pool.on_apply(target, args, kwargs, **options)
+
+    def terminate_job(self, pid, signal=None):
+        # 线程池与 asyncio 池中的任务运行在 Worker 进程自身，不能终止
+        if self.prefork is None or pid == os.getpid():
+            raise NotImplementedError('只能终止 prefork 池中的任务')
+        return self.prefork.terminate_job(pid, signal)
+
+    def maintain_pool(self, *args, **kwargs):
+        if self.prefork is not None:
+            self.prefork.maintain_pool(*args, **kwargs)
+
+    def restart(self):
+        if self.prefork is not None:
+            self.prefork.restart()
+
+    def grow(self, n=1):
+        # 自动伸缩只作用于 prefork 池
+        if self.prefork is not None:
+            self.prefork.grow(n)
+            self.limit += n
+
+    def shrink(self, n=1):
+        if self.prefork is not None:
+            self.prefork.shrink(n)
+            self.limit -= n
+
+    def _get_info(self):
+        info = super()._get_info()
+        info['pools'] = {name: pool.info for name, pool in self.pools.items()}
+        info['routes'] = self.routes
+        return info
+
@@ -0,0 +1,118 @@
+"""
+fork 前预加载（Preload）
+
+prefork 子进程由 Worker 父进程 fork 而来，父进程中的模块、任务对象、配置与路由表
+按写时复制（copy-on-write）与子进程共享。但共享很快会被打破：
+
+1. 循环垃圾回收遍历对象时会写入每个对象的 GC 头部，子进程第一次完整回收
+   就把父进程遗留对象所在的内存页全部复制一份
+2. 任务第一次执行时才导入的模块、才计算的缓存（执行选项、路由表），
+   每个子进程各自导入 / 计算一次，占用私有内存，也拖慢了子进程的第一个任务
+3. worker_max_tasks_per_child 回收子进程后，新的子进程又要重复一遍
+
+本模块在父进程 fork 出子进程之前（worker_init 信号）：
+
+1. 导入任务模块（include / imports）与 worker_preload_modules 中的模块，
+   导入期间暂停垃圾回收，避免在内存页上留下空洞
+2. 预热不可变的缓存：finalize 应用、计算每个任务的执行选项、构建路由表与队列
+3. gc.collect() 回收导入过程中产生的垃圾，然后 gc.freeze() 把剩余的对象移入永久代，
+   子进程的垃圾回收不再扫描它们，对应的内存页一直共享
+
+Worker 就绪后（worker_ready 信号，连接、消费者等长期对象已经创建）再冻结一次，
+之后因回收而重建的子进程同样共享这些对象。
+
+配置（celery_app.py）:
+    worker_preload_modules=['celery.backends.redis', ...],   # 额外预先导入的模块
+    worker_gc_freeze=True,                                    # 是否冻结
+
+注意：不要把 numpy / torch 放入 worker_preload_modules，它们的线程池等状态
+不能跨越 fork（见 extensions/model_cache.py）。
+"""
+
+import gc
+import importlib
+import logging
+import os
+import sys
+import time
+
+from celery.signals import worker_init, worker_ready
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_bytes():
+    """当前进程的常驻内存（字节），读取失败时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def import_modules(app):
+    """导入任务模块与 worker_preload_modules，返回已加载的模块总数"""
+    app.loader.import_default_modules()
+    for name in app.conf.get('worker_preload_modules') or ():
+        try:
+            importlib.import_module(name)
+        except ImportError as exc:
+            logger.warning('预加载模块 %s 失败: %s', name, exc)
+    return len(sys.modules)
+
+
+def warm_caches(app):
+    """预热不可变的缓存，返回任务数"""
+    app.finalize(auto=True)
+    tasks = app.tasks
+    for task in tasks.values():
+        # apply_async / retry 使用的执行选项，首次调用时才从任务属性计算
+        task._get_exec_options()
+    # 任务路由表与队列定义
+    app.amqp.router
+    app.amqp.queues
+    return len(tasks)
+
+
+def freeze():
+    """回收垃圾并冻结剩余对象，返回永久代中的对象数"""
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+def preload(app):
+    """在父进程中预加载并冻结，返回统计信息"""
+    started = time.monotonic()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        modules = import_modules(app)
+        tasks = warm_caches(app)
+    finally:
+        if enabled:
+            gc.enable()
+    frozen = freeze() if app.conf.get('worker_gc_freeze', True) else 0
+    return {
+        'modules': modules,
+        'tasks': tasks,
+        'frozen': frozen,
+        'rss': _rss_bytes(),
+        'elapsed': time.monotonic() - started,
+    }
+
+
+@worker_init.connect
+def preload_worker(sender=None, **kwargs):
+    """Worker 父进程创建执行池（fork 子进程）之前预加载"""
+    stats = preload(sender.app)
+    logger.info('预加载完成：%d 个模块、%d 个任务，冻结 %d 个对象，父进程内存 %.1f MB，用时 %.1f 毫秒',
+                stats['modules'], stats['tasks'], stats['frozen'],
+                (stats['rss'] or 0) / 1024 / 1024, stats['elapsed'] * 1000)
+
+
+@worker_ready.connect
+def freeze_ready_worker(sender=None, **kwargs):
+    """Worker 就绪后再冻结一次，回收重建的子进程同样共享连接、消费者等长期对象"""
+    if sender.app.conf.get('worker_gc_freeze', True):
+        logger.info('Worker 就绪，冻结 %d 个对象', freeze())
@@ -0,0 +1,336 @@
+"""
+队列内容检查器（Queue Inspector）
+
+Redis 列表中的每个元素是 kombu 的消息信封，任务信息并不在顶层：
+
+    {
+        "body": "W1sxLCAyXSwge30sIHsuLi59XQ==",      # base64 编码的 [args, kwargs, embed]
+        "content-type": "application/json",
+        "headers": {"id": "...", "task": "tasks.basic_tasks.add", "retries": 0, "eta": null, ...},
+        "properties": {"body_encoding": "base64", "priority": 0, "delivery_info": {...}, ...}
+    }
+
+直接读顶层的 id / task 只能得到 None。另外，设置了优先级的队列会拆成多个 Redis 列表
+（queue、queue\\x06\\x163、queue\\x06\\x166、queue\\x06\\x169），只看 queue 会漏掉大部分消息。
+
+本模块：
+1. 分页读取：LRANGE 每次最多读 window 条，内存占用与队列长度无关，可以扫描百万级队列
+2. 批量解码：一个窗口的消息拼接成一个 JSON 数组，一次解析完成（有 orjson 时用 orjson，
+   否则用标准库 json），省去逐条调用解析器的开销；
+   统计只需要消息头，消息体默认不解码（base64 解码 + 反序列化是最大的开销）
+3. 直方图：任务名、重试次数、ETA 分布、消息大小分布
+
+说明：队列被 Worker 同时消费时，分页读取看到的是近似快照，个别消息可能被跳过或重复计数。
+Worker 从列表尾部取消息，下标 0 是最新入队的消息。
+
+用法:
+    import redis
+    from extensions.queue_inspector import scan_queue, iter_messages
+
+    client = redis.Redis()
+    stats = scan_queue(client, 'basic')
+    print(stats.report())
+
+    for message in iter_messages(client, 'basic', limit=10, decode_body=True):
+        print(message.task, message.id, message.args, message.kwargs)
+"""
+
+import base64
+import json
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover
+    orjson = None
+    _loads = json.loads
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+#: kombu Redis 传输层的优先级子队列分隔符与默认优先级档位
+PRIORITY_SEP = '\x06\x16'
+PRIORITY_STEPS = (0, 3, 6, 9)
+
+#: 每次 LRANGE 读取的消息数
+WINDOW = 1000
+
+TaskMessage = namedtuple('TaskMessage', [
+    'id', 'task', 'retries', 'eta', 'expires', 'priority', 'size', 'args', 'kwargs',
+])
+TaskMessage.__doc__ = """解码后的任务消息；未解码消息体时 args / kwargs 为 None"""
+
+# ETA 直方图的分段：(上限秒数, 标签)
+ETA_BUCKETS = (
+    (0, '已到期'),
+    (60, '1 分钟内'),
+    (3600, '1 小时内'),
+    (86400, '1 天内'),
+    (float('inf'), '1 天以后'),
+)
+
+
+def queue_keys(queue, steps=PRIORITY_STEPS):
+    """队列对应的所有 Redis 列表键（包括优先级子队列），优先级从高到低"""
+    keys = []
+    for step in sorted(steps, reverse=True):
+        keys.append(f'{queue}{PRIORITY_SEP}{step}' if step else queue)
+    return keys
+
+
+def queue_lengths(client, queue, steps=PRIORITY_STEPS):
+    """
+    各优先级子队列的长度（一次 pipeline 往返）
+
+    返回:
+        {Redis 列表键: 长度}，只包括非空的子队列
+    """
+    keys = queue_keys(queue, steps)
+    with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.llen(key)
+        lengths = pipe.execute()
+    return {key: length for key, length in zip(keys, lengths) if length}
+
+
+def decode_args(envelope):
+    """解码消息体，返回 (args, kwargs)；无法解码时返回 (None, None)"""
+    body = envelope.get('body')
+    if body is None:
+        return None, None
+    if envelope.get('properties', {}).get('body_encoding') == 'base64':
+        body = base64.b64decode(body)
+    content_type = envelope.get('content-type')
+    try:
+        if content_type == 'application/json':
+            payload = _loads(body)
+        elif content_type == 'application/x-msgpack' and msgpack is not None:
+            payload = msgpack.unpackb(body, raw=False)
+        else:
+            return None, None
+    except ValueError:
+        return None, None
+    # 协议 2：[args, kwargs, embed]；协议 1：任务信息都在消息体中
+    if isinstance(payload, (list, tuple)) and len(payload) == 3:
+        return payload[0], payload[1]
+    if isinstance(payload, dict):
+        return payload.get('args'), payload.get('kwargs')
+    return None, None
+
+
+def decode_message(raw, decode_body=False):
+    """
+    解码一条原始消息
+
+    参数:
+        raw: Redis 列表中的元素（bytes 或 str）
+        decode_body: 是否同时解码消息体中的参数
+
+    返回:
+        TaskMessage；不是 kombu 消息时返回 None
+    """
+    try:
+        envelope = _loads(raw)
+    except ValueError:
+        return None
+    return _from_envelope(envelope, len(raw), decode_body)
+
+
+def _from_envelope(envelope, size, decode_body):
+    if not isinstance(envelope, dict):
+        return None
+    headers = envelope.get('headers') or {}
+    properties = envelope.get('properties') or {}
+    task_id = headers.get('id')
+    task = headers.get('task')
+    if task is None:
+        # 协议 1：任务信息在消息体中
+        body = _protocol1_body(envelope)
+        args, kwargs = body.get('args'), body.get('kwargs')
+        task_id, task = body.get('id'), body.get('task')
+        headers = body
+    elif decode_body:
+        args, kwargs = decode_args(envelope)
+    else:
+        args = kwargs = None
+    return TaskMessage(
+        id=task_id,
+        task=task,
+        retries=headers.get('retries') or 0,
+        eta=headers.get('eta'),
+        expires=headers.get('expires'),
+        priority=properties.get('priority'),
+        size=size,
+        args=args,
+        kwargs=kwargs,
+    )
+
+
+def _protocol1_body(envelope):
+    body = envelope.get('body')
+    try:
+        if envelope.get('properties', {}).get('body_encoding') == 'base64':
+            body = base64.b64decode(body)
+        payload = _loads(body)
+    except (TypeError, ValueError):
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def iter_windows(client, key, window=WINDOW, limit=None):
+    """分页读取一个 Redis 列表，每次产出最多 window 条原始元素"""
+    start = 0
+    while limit is None or start < limit:
+        stop = start + window - 1
+        if limit is not None:
+            stop = min(stop, limit - 1)
+        items = client.lrange(key, start, stop)
+        if not items:
+            return
+        yield items
+        if len(items) < stop - start + 1:
+            return
+        start = stop + 1
+
+
+def iter_messages(client, queue, window=WINDOW, limit=None, decode_body=False,
+                  steps=PRIORITY_STEPS):
+    """
+    按优先级从高到低遍历队列（包括优先级子队列）中的消息
+
+    参数:
+        client: Broker 的 Redis 客户端
+        queue: 队列名
+        window: 每次 LRANGE 读取的消息数
+        limit: 最多返回的消息数，None 表示全部
+        decode_body: 是否解码消息体中的参数
+    """
+    remaining = limit
+    for key in queue_keys(queue, steps):
+        for items in iter_windows(client, key, window, remaining):
+            for message in decode_window(items, decode_body):
+                if message is None:
+                    continue
+                yield message
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining == 0:
+                        return
+
+
+def decode_window(items, decode_body=False):
+    """
+    批量解码一个窗口的原始消息
+
+    把所有消息拼接成一个 JSON 数组一次解析；其中有无法解析的消息时逐条解码。
+
+    返回:
+        TaskMessage 列表，无法解码的位置为 None
+    """
+    if not items:
+        return []
+    sep, open_, close = (b',', b'[', b']') if isinstance(items[0], bytes) else (',', '[', ']')
+    try:
+        envelopes = _loads(open_ + sep.join(items) + close)
+    except ValueError:
+        envelopes = None
+    if not isinstance(envelopes, list) or len(envelopes) != len(items):
+        return [decode_message(raw, decode_body) for raw in items]
+    return [_from_envelope(envelope, len(raw), decode_body)
+            for envelope, raw in zip(envelopes, items)]
+
+
+def _eta_bucket(eta, now):
+    if not eta:
+        return '无 ETA'
+    try:
+        seconds = datetime.fromisoformat(eta).timestamp() - now
+    except (TypeError, ValueError):
+        return '无法解析'
+    for upper, label in ETA_BUCKETS:
+        if seconds <= upper:
+            return label
+    return ETA_BUCKETS[-1][1]
+
+
+def _size_bucket(size):
+    """按 2 的幂分段：<=256B、<=512B、<=1KB ..."""
+    upper = 256
+    while size > upper:
+        upper *= 2
+    if upper < 1024:
+        return f'<= {upper}B'
+    if upper < 1024 * 1024:
+        return f'<= {upper // 1024}KB'
+    return f'<= {upper // (1024 * 1024)}MB'
+
+
+class QueueStats:
+    """队列内容统计"""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.total = 0
+        self.total_bytes = 0
+        self.tasks = Counter()
+        self.retries = Counter()
+        self.etas = Counter()
+        self.sizes = Counter()
+        self.priorities = Counter()
+        self.elapsed = 0.0
+        self._now = time.time()
+
+    def add(self, message):
+        self.total += 1
+        self.total_bytes += message.size
+        self.tasks[message.task] += 1
+        self.retries[message.retries] += 1
+        self.etas[_eta_bucket(message.eta, self._now)] += 1
+        self.sizes[_size_bucket(message.size)] += 1
+        self.priorities[message.priority] += 1
+
+    def report(self, top=10):
+        """格式化为文本报告"""
+        lines = [
+            f"队列 {self.queue}: {self.total} 条消息，{self.total_bytes / 1024 / 1024:.1f} MB，"
+            f"扫描耗时 {self.elapsed:.2f} 秒",
+        ]
+        sections = (
+            ('任务名', self.tasks.most_common(top)),
+            ('重试次数', sorted(self.retries.items())),
+            ('ETA', self.etas.most_common()),
+            ('消息大小', sorted(self.sizes.items(), key=lambda item: _size_order(item[0]))),
+            ('优先级', sorted(self.priorities.items(), key=lambda item: item[0] or 0)),
+        )
+        for title, items in sections:
+            lines.append(f"  {title}:")
+            for value, count in items:
+                percent = count / self.total * 100 if self.total else 0
+                lines.append(f"    {str(value):40s} {count:10d}  {percent:5.1f}%")
+        return '\n'.join(lines)
+
+
+def _size_order(label):
+    number = int(label[3:].rstrip('KMB'))
+    unit = label[-2:] if label[-2:] in ('KB', 'MB') else 'B'
+    return number * {'B': 1, 'KB': 1024, 'MB': 1024 * 1024}[unit]
+
+
+def scan_queue(client, queue, window=WINDOW, limit=None, steps=PRIORITY_STEPS):
+    """
+    扫描整个队列并生成统计（只解码消息头）
+
+    返回:
+        QueueStats
+    """
+    stats = QueueStats(queue)
+    started = time.perf_counter()
+    for message in iter_messages(client, queue, window, limit, steps=steps):
+        stats.add(message)
+    stats.elapsed = time.perf_counter() - started
+    return stats
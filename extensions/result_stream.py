@@ -0,0 +1,118 @@
+"""
+流式结果迭代（Streaming Results）
+
+GroupResult.get() 会阻塞到所有成员完成，再一次性构建完整的结果列表：
+- 最慢的成员决定了消费者何时能开始处理
+- 成员很多时，整个结果列表同时驻留在内存中
+
+本模块按完成顺序逐个产出结果：
+
+    for index, task_id, value in iter_results(result):
+        handle(value)   # 第一个成员完成后立刻开始处理
+
+实现方式是对尚未完成的成员做 pipeline 批量轮询：
+每轮把待完成的结果键按 batch_size 分块，放进同一个 pipeline 的多个 MGET 中，
+一次往返查完所有成员，而不是每个成员单独 GET。
+没有新结果时轮询间隔逐步退避，有新结果时立即恢复。
+
+内存中只保留尚未完成成员的下标，已产出的结果不会被缓存。
+
+支持的输入：GroupResult、ResultSet、BulkResult、AsyncResult 列表或任务 ID 列表。
+"""
+
+import time
+
+from celery import states
+from celery.exceptions import TimeoutError
+from celery.result import AsyncResult, ResultSet
+
+
+def _task_ids(results):
+    """把各种结果对象统一转换为任务 ID 列表"""
+    if isinstance(results, ResultSet):
+        results = results.results
+    elif hasattr(results, 'ids'):
+        # BulkResult 只保存 ID，不需要创建 AsyncResult
+        return list(results.ids)
+    ids = []
+    for result in results:
+        if isinstance(result, ResultSet):
+            raise TypeError('不支持嵌套的 GroupResult，请先展开后再迭代')
+        ids.append(result.id if isinstance(result, AsyncResult) else result)
+    return ids
+
+
+def _resolve_backend(results, app):
+    """获取结果后端：优先使用传入的 app，其次使用结果对象自带的 app"""
+    if app is None:
+        app = getattr(results, 'app', None)
+    if app is None:
+        from celery_app import app
+    return app.backend
+
+
+def iter_results(results, timeout=None, interval=0.05, max_interval=1.0,
+                 batch_size=1000, propagate=True, app=None):
+    """
+    按完成顺序迭代一组任务的结果
+
+    参数:
+        results: GroupResult / ResultSet / BulkResult / AsyncResult 列表 / 任务 ID 列表
+        timeout: 整体超时时间（秒），None 表示不限
+        interval: 初始轮询间隔（秒）
+        max_interval: 退避后的最大轮询间隔（秒）
+        batch_size: 每个 MGET 命令携带的键数量
+        propagate: 成员失败时是否抛出其异常；为 False 时把异常对象作为值产出
+        app: Celery 应用，默认使用结果对象关联的应用
+
+    产出:
+        (index, task_id, value)，index 是成员在原始结果中的下标
+    """
+    ids = _task_ids(results)
+    backend = _resolve_backend(results, app)
+    client = backend.client
+    get_key = backend.get_key_for_task
+    merge_cold = getattr(backend, 'merge_cold', None)
+    pending = list(range(len(ids)))
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = interval
+
+    while pending:
+        with client.pipeline(transaction=False) as pipe:
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                pipe.mget([get_key(ids[i]) for i in chunk])
+            replies = pipe.execute()
+
+        still_pending = []
+        completed = 0
+        for start, values in zip(range(0, len(pending), batch_size), replies):
+            chunk = pending[start:start + batch_size]
+            if merge_cold is not None:
+                # 分层结果后端：Redis 中已降级的结果从冷层读取
+                values = merge_cold([get_key(ids[i]) for i in chunk], values)
+            for index, payload in zip(chunk, values):
+                if payload is None:
+                    still_pending.append(index)
+                    continue
+                meta = backend.decode_result(payload)
+                if meta['status'] not in states.READY_STATES:
+                    # PENDING / STARTED / PROGRESS 等中间状态
+                    still_pending.append(index)
+                    continue
+                completed += 1
+                if propagate and meta['status'] in states.PROPAGATE_STATES:
+                    raise meta['result']
+                yield index, ids[index], meta['result']
+        pending = still_pending
+
+        if not pending:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(
+                f'{len(pending)} 个任务在 {timeout} 秒内未完成')
+        # 本轮有结果时保持快速轮询，否则逐步退避
+        delay = interval if completed else min(delay * 2, max_interval)
+        if deadline is not None:
+            delay = min(delay, max(deadline - time.monotonic(), 0))
+        time.sleep(delay)
@@ -0,0 +1,471 @@
+"""
+结果键清理（Result Sweeper）
+
+result_expires=3600 是唯一的保留策略：所有任务的结果一律保留 1 小时，
+export_data 的大结果与 add 的一个整数占用同样长的时间；result_expires 调大后，
+持续负载下结果后端的内存随吞吐量线性上涨。另外 redis_queue_viewer 等工具用 KEYS * 查找结果键，
+在大库上会阻塞 Redis。
+
+ResultSweeper 用 SCAN 分批遍历 celery-task-meta-* 键，每批在一个 pipeline 中完成：
+
+1. 按任务名保留策略设置 TTL：
+       result_retention = {'tasks.basic_tasks.*': 600, 'tasks.realworld_tasks.export_data': 86400}
+   已完成的结果按 完成时间（date_done）+ 保留时间 设置 EXPIREAT，可以缩短也可以延长，
+   重复扫描不会一直往后推；尚未完成的结果只缩短。没有 TTL 的键
+   （result_expires=None 时写入的、或被 PERSIST 的）也会补上 TTL。
+   保留时间长于 result_expires 的结果要在 result_expires 到期之前被扫描到才能延长，
+   结果键很多时相应地调大 ResultSweeperStep.keys_per_tick 或缩短 interval
+2. 压缩：已完成且超过 compress_threshold 字节的结果改写为 zlib 压缩形式
+3. 归档：超过 archive_threshold 字节的结果写入 Redis 之外的归档目录（gzip 文件），
+   Redis 中只保留一个指向归档文件的短标记（归档主机 + 路径）。
+   归档目录必须是所有读取结果的主机都能访问的共享存储（NFS 等）；
+   读不到归档文件时抛出 ArchivedResultUnavailable，指明结果归档在哪台主机的哪个路径
+4. 报告：扫描的键数、设置 TTL 的键数、压缩 / 归档释放的字节数（MEMORY USAGE 前后差值）
+
+压缩与归档后的结果由 CompactResultMixin 在 decode_result() 中透明还原，
+AsyncResult.get()、iter_results() 等读取方式不需要任何改动（LuaChordRedisBackend / TieredRedisBackend 已包含）；
+使用 Celery 原生后端时清理器只调整过期时间，不压缩也不归档。
+保留策略按结果元数据中的任务名匹配：CompactResultMixin 总是写入任务名，
+原生后端只有开启 result_extended 时才写入（RESULT_SWEEPER=true 时 celery_app.py 自动开启）；
+没有任务名的结果一律使用 result_expires，遇到时清理器会输出警告。
+改写使用 Lua 脚本比较值的 SHA1，期间结果被修改时放弃改写。
+
+清理器以 bootstep 的形式运行在 Worker 中：每 interval 秒只有一个 Worker 取得锁，
+从共享的 SCAN 游标处继续扫描 keys_per_tick 个键，不会长时间占用 Worker 的定时器线程。
+
+启用方式（celery_app.py 中设置环境变量 RESULT_SWEEPER=true）:
+    app.steps['worker'].add(ResultSweeperStep)
+
+手动执行一次完整清理:
+    python -m extensions.result_sweeper --dry-run
+    python -m extensions.result_sweeper --archive-dir /data/result-archive
+"""
+
+import fnmatch
+import gzip
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+import zlib
+from datetime import datetime, timezone
+
+from celery import bootsteps, states
+
+logger = logging.getLogger(__name__)
+
+RESULT_PATTERN = 'celery-task-meta-*'
+CURSOR_KEY = 'result-sweeper-cursor'
+LOCK_KEY = 'result-sweeper-lock'
+
+#: 压缩与归档后的值以这些前缀开头；JSON 编码的结果总是以 '{' 开头，不会冲突
+COMPRESSED_PREFIX = b'\x00zlib\x00'
+ARCHIVED_PREFIX = b'\x00archive\x00'
+
+# KEYS[1] 结果键  ARGV[1] 原值的 SHA1  ARGV[2] 新值
+# 值没有变化时改写并保留 TTL，返回 1；否则返回 0
+REPLACE_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if not value or redis.sha1hex(value) ~= ARGV[1] then
+    return 0
+end
+local ttl = redis.call('PTTL', KEYS[1])
+redis.call('SET', KEYS[1], ARGV[2])
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+
+class ArchivedResultUnavailable(Exception):
+    """结果已归档，但归档文件在当前主机上不可访问"""
+
+
+def _as_bytes(value):
+    return value.encode() if isinstance(value, str) else value
+
+
+def restore_payload(payload):
+    """把压缩 / 归档形式的结果还原为原始编码"""
+    if payload is None:
+        return payload
+    raw = _as_bytes(payload)
+    if raw.startswith(COMPRESSED_PREFIX):
+        return zlib.decompress(raw[len(COMPRESSED_PREFIX):])
+    if raw.startswith(ARCHIVED_PREFIX):
+        host, _, path = raw[len(ARCHIVED_PREFIX):].decode().rpartition('\x00')
+        try:
+            with gzip.open(path, 'rb') as archive:
+                return archive.read()
+        except FileNotFoundError:
+            raise ArchivedResultUnavailable(
+                f'结果已由 {host or "其他主机"} 归档到 {path}，当前主机 {socket.gethostname()} 无法访问；'
+                f'result_archive_dir 需要是所有读取结果的主机共享的存储') from None
+    return payload
+
+
+class CompactResultMixin:
+    """
+    结果后端混入类
+
+    - decode_result(): 透明还原压缩 / 归档的结果
+    - 结果元数据中始终记录任务名（name），清理器据此应用保留策略；
+      开启 result_extended 时 Celery 本身就会写入
+    """
+
+    supports_compacted_results = True
+
+    def decode_result(self, payload):
+        return super().decode_result(restore_payload(payload))
+
+    def _get_result_meta(self, result, state, traceback, request, *args, **kwargs):
+        meta = super()._get_result_meta(result, state, traceback, request, *args, **kwargs)
+        if 'name' not in meta and request is not None and getattr(request, 'task', None):
+            meta['name'] = request.task
+        return meta
+
+
+class SweepReport:
+    """一次清理的统计"""
+
+    def __init__(self):
+        self.scanned = 0
+        self.expire_set = 0
+        self.compressed = 0
+        self.archived = 0
+        self.reclaimed = 0
+        self.unnamed = 0
+        self.elapsed = 0.0
+
+    def merge(self, other):
+        for field in ('scanned', 'expire_set', 'compressed', 'archived', 'reclaimed', 'unnamed', 'elapsed'):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def __str__(self):
+        return (f'扫描 {self.scanned} 个结果键，设置 TTL {self.expire_set} 个，'
+                f'压缩 {self.compressed} 个，归档 {self.archived} 个，'
+                f'释放 {self.reclaimed / 1024 / 1024:.2f} MB，耗时 {self.elapsed:.2f} 秒')
+
+
+class ResultSweeper:
+    """按任务名保留策略清理结果键"""
+
+    def __init__(self, app, policies=None, default_ttl=None, compress_threshold=None,
+                 archive_threshold=None, archive_dir=None, batch_size=500, dry_run=False):
+        """
+        参数:
+            app: Celery 应用
+            policies: {任务名模式: TTL 秒数}，默认 app.conf.result_retention
+            default_ttl: 没有匹配策略的结果的 TTL，默认 result_expires
+            compress_threshold: 超过多少字节的结果压缩，None 表示不压缩
+            archive_threshold: 超过多少字节的结果归档，None 表示不归档
+            archive_dir: 归档目录
+            batch_size: 每个 SCAN / pipeline 批次的键数
+            dry_run: 只统计，不修改
+        """
+        conf = app.conf
+        self.app = app
+        self.policies = list((policies if policies is not None
+                              else conf.get('result_retention') or {}).items())
+        expires = conf.result_expires
+        if default_ttl is None and expires is not None:
+            default_ttl = expires.total_seconds() if hasattr(expires, 'total_seconds') else expires
+        self.default_ttl = default_ttl
+        self.compress_threshold = (compress_threshold if compress_threshold is not None
+                                   else conf.get('result_compress_threshold'))
+        self.archive_threshold = (archive_threshold if archive_threshold is not None
+                                  else conf.get('result_archive_threshold'))
+        self.archive_dir = archive_dir or conf.get('result_archive_dir') or 'result-archive'
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self._memory_command = True
+        self._replace = None
+
+    @property
+    def client(self):
+        return self.app.backend.client
+
+    @property
+    def can_compact(self):
+        """只有能还原压缩结果的后端才允许压缩 / 归档"""
+        return getattr(self.app.backend, 'supports_compacted_results', False)
+
+    def ttl_for(self, name):
+        """任务的保留时间（秒），按第一个匹配的模式"""
+        if name:
+            for pattern, ttl in self.policies:
+                if fnmatch.fnmatchcase(name, pattern):
+                    return ttl
+        return self.default_ttl
+
+    # ------------------------------------------------------------------
+    # 扫描
+    # ------------------------------------------------------------------
+
+    def sweep(self, cursor=0, max_keys=None):
+        """
+        从 SCAN 游标处扫描并处理结果键
+
+        参数:
+            cursor: SCAN 游标，0 表示从头开始
+            max_keys: 本次最多处理的键数（近似），None 表示扫描完整个库
+
+        返回:
+            (下一个游标（0 表示已扫描完一轮）, SweepReport)
+        """
+        report = SweepReport()
+        started = time.perf_counter()
+        client = self.client
+        while True:
+            cursor, keys = client.scan(cursor, match=RESULT_PATTERN, count=self.batch_size)
+            if keys:
+                self._process(keys, report)
+            if cursor == 0 or (max_keys is not None and report.scanned >= max_keys):
+                break
+        report.elapsed = time.perf_counter() - started
+        if report.unnamed and self.policies:
+            logger.warning(
+                '结果清理: %d 个结果没有任务名，result_retention 对它们不生效，使用 result_expires；'
+                '原生结果后端需要开启 result_extended（Worker 设置 RESULT_SWEEPER=true 时自动开启）',
+                report.unnamed,
+            )
+        return cursor, report
+
+    def _process(self, keys, report):
+        client = self.client
+        with client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.get(key)
+                pipe.ttl(key)
+            replies = pipe.execute()
+
+        expires = []
+        rewrites = []
+        for i, key in enumerate(keys):
+            value, ttl = replies[2 * i], replies[2 * i + 1]
+            if value is None:
+                continue
+            report.scanned += 1
+            raw = _as_bytes(value)
+            compacted = raw.startswith(COMPRESSED_PREFIX) or raw.startswith(ARCHIVED_PREFIX)
+            meta = None if compacted else _loads_meta(raw)
+            if meta is None and not compacted:
+                continue
+            if meta is not None:
+                if not meta.get('name'):
+                    report.unnamed += 1
+                expire = self._expire_for(meta, ttl)
+                if expire is not None:
+                    expires.append((key, expire))
+                if self.can_compact and meta.get('status') in states.READY_STATES:
+                    replacement = self._compact(key, raw)
+                    if replacement is not None:
+                        rewrites.append((key, raw, replacement))
+
+        if self.dry_run:
+            report.expire_set += len(expires)
+            for _, _, (kind, _) in rewrites:
+                setattr(report, kind, getattr(report, kind) + 1)
+            return
+
+        before = self._memory_usage([key for key, _, _ in rewrites])
+        with client.pipeline(transaction=False) as pipe:
+            for key, (command, value) in expires:
+                if command == 'expireat':
+                    pipe.expireat(key, value)
+                else:
+                    pipe.expire(key, value)
+            if expires:
+                pipe.execute()
+        report.expire_set += len(expires)
+
+        if not rewrites:
+            return
+        script = self._replace_script()
+        with client.pipeline(transaction=False) as pipe:
+            for key, raw, (_, value) in rewrites:
+                script(keys=[key], args=[hashlib.sha1(raw).hexdigest(), value], client=pipe)
+            replaced = pipe.execute()
+        after = self._memory_usage([key for key, _, _ in rewrites])
+        for i, ((key, raw, (kind, value)), ok) in enumerate(zip(rewrites, replaced)):
+            if not ok:
+                continue
+            setattr(report, kind, getattr(report, kind) + 1)
+            if before is not None and after is not None and before[i] and after[i]:
+                report.reclaimed += before[i] - after[i]
+            else:
+                report.reclaimed += len(raw) - len(value)
+
+    def _expire_for(self, meta, ttl):
+        """
+        需要调整 TTL 时返回 ('expireat', 时间戳) 或 ('expire', 秒数)，否则返回 None
+
+        ttl 为键当前的剩余秒数，-1 表示没有过期时间
+        """
+        target = self.ttl_for(meta.get('name'))
+        if target is None:
+            return None
+        done = _parse_date(meta.get('date_done')) if meta.get('status') in states.READY_STATES else None
+        if done is None:
+            # 尚未完成（或没有完成时间）：只缩短，不延长
+            if ttl == -1 or ttl > target:
+                return 'expire', int(target)
+            return None
+        deadline = int(done + target)
+        remaining = deadline - time.time()
+        # 允许 1 秒的取整误差，已经对齐的键不重复写入
+        if ttl == -1 or abs(ttl - remaining) > 1:
+            return 'expireat', deadline
+        return None
+
+    def _compact(self, key, raw):
+        """选择压缩或归档，返回 (类型, 新值)；不需要改写时返回 None"""
+        size = len(raw)
+        if self.archive_threshold is not None and size >= self.archive_threshold:
+            if self.dry_run:
+                return 'archived', b''
+            path = self._archive(key, raw)
+            return 'archived', ARCHIVED_PREFIX + f'{socket.gethostname()}\x00{path}'.encode()
+        if self.compress_threshold is not None and size >= self.compress_threshold:
+            value = COMPRESSED_PREFIX + zlib.compress(raw, 6)
+            if len(value) < size:
+                return 'compressed', value
+        return None
+
+    def _archive(self, key, raw):
+        """写入归档文件，返回绝对路径"""
+        key = key.decode() if isinstance(key, bytes) else key
+        task_id = key[len(RESULT_PATTERN) - 1:]
+        # 按任务 ID 前两位分目录，避免单个目录下文件过多
+        directory = os.path.join(os.path.abspath(self.archive_dir), task_id[:2])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{task_id}.json.gz')
+        tmp = f'{path}.tmp'
+        with gzip.open(tmp, 'wb', compresslevel=6) as archive:
+            archive.write(raw)
+        os.replace(tmp, path)
+        return path
+
+    def _replace_script(self):
+        if self._replace is None:
+            self._replace = self.client.register_script(REPLACE_SCRIPT)
+        return self._replace
+
+    def _memory_usage(self, keys):
+        if not keys or not self._memory_command:
+            return None
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.memory_usage(key, samples=0)
+                return pipe.execute()
+        except Exception:  # pylint: disable=broad-except
+            self._memory_command = False
+            return None
+
+
+def _loads_meta(raw):
+    try:
+        meta = json.loads(raw)
+    except ValueError:
+        return None
+    return meta if isinstance(meta, dict) else None
+
+
+def _parse_date(value):
+    """结果元数据中的 date_done（ISO 8601，没有时区时按 UTC）转为时间戳"""
+    if not value:
+        return None
+    try:
+        done = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if done.tzinfo is None:
+        done = done.replace(tzinfo=timezone.utc)
+    return done.timestamp()
+
+
+def purge_archive(archive_dir, max_age):
+    """删除超过 max_age 秒的归档文件（对应的 Redis 键已过期）"""
+    removed = 0
+    deadline = time.time() - max_age
+    for root, _, files in os.walk(archive_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.getmtime(path) < deadline:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+class ResultSweeperStep(bootsteps.StartStopStep):
+    """在 Worker 中定期增量清理结果键"""
+
+    requires = {'celery.worker.components:Timer'}
+
+    #: 清理间隔（秒）
+    interval = 30.0
+    #: 每次最多处理的键数
+    keys_per_tick = 5000
+
+    def __init__(self, worker, **kwargs):
+        super().__init__(worker, **kwargs)
+        self.tref = None
+        self.sweeper = None
+
+    def start(self, worker):
+        self.sweeper = ResultSweeper(worker.app)
+        self.tref = worker.timer.call_repeatedly(
+            self.interval, self.tick, (), priority=10)
+
+    def stop(self, worker):
+        if self.tref is not None:
+            self.tref.cancel()
+            self.tref = None
+
+    def tick(self):
+        sweeper = self.sweeper
+        try:
+            client = sweeper.client
+            # 每个间隔只由一个 Worker 执行，游标保存在 Redis 中，各 Worker 接力扫描
+            if not client.set(LOCK_KEY, 1, nx=True, ex=max(int(self.interval) - 1, 1)):
+                return
+            cursor = int(client.get(CURSOR_KEY) or 0)
+            cursor, report = sweeper.sweep(cursor, max_keys=self.keys_per_tick)
+            client.set(CURSOR_KEY, cursor)
+            if cursor == 0 and sweeper.archive_threshold is not None:
+                longest = max([ttl for _, ttl in sweeper.policies] + [sweeper.default_ttl or 0])
+                purge_archive(sweeper.archive_dir, longest)
+            if report.scanned:
+                logger.info('结果清理: %s', report)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning('结果清理失败: %r', exc)
+
+
+def main():
+    """手动执行一次完整清理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='结果键清理')
+    parser.add_argument('--dry-run', action='store_true', help='只统计，不修改')
+    parser.add_argument('--compress-threshold', type=int, default=None,
+                        help='超过多少字节的结果压缩（默认取 result_compress_threshold）')
+    parser.add_argument('--archive-threshold', type=int, default=None,
+                        help='超过多少字节的结果归档（默认取 result_archive_threshold）')
+    parser.add_argument('--archive-dir', default=None, help='归档目录')
+    args = parser.parse_args()
+
+    from celery_app import app
+
+    sweeper = ResultSweeper(app, compress_threshold=args.compress_threshold,
+                            archive_threshold=args.archive_threshold,
+                            archive_dir=args.archive_dir, dry_run=args.dry_run)
+    _, report = sweeper.sweep()
+    print(f"{'（演练）' if args.dry_run else ''}{report}")
+
+
+if __name__ == '__main__':
+    main()
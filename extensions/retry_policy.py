@@ -0,0 +1,152 @@
+"""
+重试风暴控制（Retry Storm Control）
+
+task_with_custom_retry 使用 2 ** retries 的指数退避，task_with_retry、send_email 使用固定延迟。
+下游依赖故障时，成千上万个任务在同一时刻失败、以相同的延迟重试，
+于是又在同一时刻一起打到刚恢复的依赖上（惊群）。
+
+RetryPolicy 提供两层控制：
+
+1. 去相关抖动（Decorrelated Jitter）退避：
+       delay = min(cap, uniform(base, previous_delay * 3))
+   每次重试的延迟在上一次延迟附近随机展开，重试时间被打散；
+   上一次的延迟通过消息头 retry_delay 传递给下一次执行
+
+2. 重试预算（令牌桶）：每个任务名一个令牌桶，保存在 Redis 中，所有 Worker 共享
+   - 桶容量 budget，每秒补充 refill_rate 个令牌
+   - 每次重试消耗一个令牌；没有令牌时不再重试，任务直接以原异常失败
+   - 已经达到 max_retries 的任务不消耗令牌（反正不会再重试）
+   - 依赖长时间故障时，重试总量被限制在 refill_rate 每秒以内
+   令牌桶由一个 Lua 脚本原子地补充与扣减，允许 / 拒绝次数一并累加到 retry-budget-stats
+
+用法（与 raise self.retry(...) 的写法一致）:
+    policy = RetryPolicy(base=1, cap=60, budget=20, refill_rate=2)
+
+    @app.task(bind=True, max_retries=5)
+    def call_api(self, url):
+        try:
+            ...
+        except ConnectionError as exc:
+            raise policy.retry(self, exc=exc)
+
+    retry_stats()   # {'tasks.xxx.call_api': {'allowed': 12, 'suppressed': 3}}
+"""
+
+import logging
+import random
+import time
+
+from celery_app import app
+
+logger = logging.getLogger(__name__)
+
+BUCKET_PREFIX = 'retry-budget-'
+STATS_KEY = 'retry-budget-stats'
+
+# KEYS[1] 令牌桶哈希  KEYS[2] 统计哈希
+# ARGV[1] 桶容量  ARGV[2] 每秒补充令牌数  ARGV[3] 当前时间  ARGV[4] 任务名
+# 返回 1 表示允许重试，0 表示预算耗尽
+RETRY_BUDGET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+if allowed == 1 then
+    redis.call('HINCRBY', KEYS[2], ARGV[4] .. ':allowed', 1)
+else
+    redis.call('HINCRBY', KEYS[2], ARGV[4] .. ':suppressed', 1)
+end
+return allowed
+"""
+
+
+class RetryBudgetExceeded(Exception):
+    """重试预算耗尽，且调用方没有提供原始异常"""
+
+
+class RetryPolicy:
+    """带抖动退避与全局重试预算的重试策略"""
+
+    def __init__(self, base=1, cap=300, budget=10, refill_rate=1.0):
+        """
+        参数:
+            base: 最小延迟（秒），也是第一次重试的延迟基准
+            cap: 最大延迟（秒）
+            budget: 令牌桶容量，即允许的突发重试数量
+            refill_rate: 每秒补充的令牌数，即长期平均每秒允许的重试数，必须大于 0
+        """
+        if not refill_rate or refill_rate <= 0:
+            raise ValueError(f'refill_rate 必须大于 0: {refill_rate!r}')
+        self.base = base
+        self.cap = cap
+        self.budget = budget
+        self.refill_rate = refill_rate
+        self._scripts = {}
+
+    def next_delay(self, request):
+        """根据上一次的延迟计算本次重试的延迟（去相关抖动）"""
+        previous = float(getattr(request, 'retry_delay', None) or self.base)
+        return min(self.cap, random.uniform(self.base, previous * 3))
+
+    def acquire(self, task):
+        """从任务名对应的令牌桶中取一个令牌，返回是否允许重试"""
+        client = task.backend.client
+        script = self._scripts.get(id(client))
+        if script is None:
+            script = self._scripts[id(client)] = client.register_script(RETRY_BUDGET_SCRIPT)
+        return bool(script(
+            keys=[BUCKET_PREFIX + task.name, STATS_KEY],
+            args=[self.budget, self.refill_rate, time.time(), task.name],
+        ))
+
+    def retry(self, task, exc=None, **options):
+        """
+        按策略重试任务
+
+        参数:
+            task: 绑定的任务实例（self）
+            exc: 触发重试的异常
+            options: 传给 task.retry() 的其他参数
+
+        返回:
+            允许重试时返回 task.retry() 的 Retry 异常；预算耗尽时返回原异常。
+            调用方统一写成 raise policy.retry(self, exc=exc)
+        """
+        max_retries = options.get('max_retries')
+        if max_retries is None:
+            max_retries = task.max_retries
+        if max_retries is not None and task.request.retries >= max_retries:
+            # 不会再重试：由 task.retry() 抛出原异常 / MaxRetriesExceededError，不消耗令牌
+            return task.retry(exc=exc, **options)
+        if not self.acquire(task):
+            logger.warning('%s[%s] 重试预算耗尽，放弃重试', task.name, task.request.id)
+            return exc if exc is not None else RetryBudgetExceeded(task.name)
+        delay = self.next_delay(task.request)
+        # task.retry() 传入的 headers 会整个替换原消息的自定义头，先合并原有的再追加 retry_delay
+        headers = {**(task.request.headers or {}), **(options.pop('headers', None) or {}),
+                   'retry_delay': delay}
+        return task.retry(countdown=delay, exc=exc, headers=headers, **options)
+
+
+def retry_stats():
+    """
+    读取各任务的重试预算统计
+
+    返回:
+        {任务名: {'allowed': n, 'suppressed': n}}
+    """
+    stats = {}
+    for field, count in app.backend.client.hgetall(STATS_KEY).items():
+        name, _, counter = field.decode().rpartition(':')
+        stats.setdefault(name, {'allowed': 0, 'suppressed': 0})[counter] = int(count)
+    return stats
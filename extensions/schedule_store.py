@@ -0,0 +1,418 @@
+"""
+数据库调度表（Schedule Store）与热加载调度器
+
+beat_schedule 写死在 celery_app.py 中，每次修改都要重启 Beat。
+
+ScheduleStore 把调度条目保存在 SQLite 中，并维护一个全局变更版本号：
+- 每次写入（新增 / 修改 / 删除）在同一个事务中把版本号加一，并记在被修改的行上
+- 删除只写入墓碑（deleted=1），这样增量读取时也能看到删除
+- changes_since(v) 通过 version 索引只读出 v 之后变化的行
+- 每个 Beat 在 sync 时记录自己已应用的版本号（schedule_readers），
+  所有活跃的 Beat 都已读过的墓碑随即清理（beat_schedule 中的条目的墓碑保留，
+  否则重启时会被重新写入数据库）
+
+DatabaseScheduler（基于 HeapScheduler）：
+- 每 reload_interval 秒读取一次版本号（一条主键查询），没有变化时什么都不做
+- 有变化时只读取变化的条目，逐条 add_entry / remove_entry，每条 O(log n)
+- 每次 tick 应用变更的时间不超过 apply_budget 秒，其余留到下一次 tick，
+  批量导入 1 万个条目时到期条目仍能按时触发
+
+首次启动时，beat_schedule 中尚未出现在数据库里的条目会被写入数据库，
+之后以数据库为准。支持固定间隔、crontab 与 solar 调度；其他调度类型的条目
+不写入数据库（记录警告），只按配置文件运行。
+
+启用方式:
+    celery -A celery_app beat -S extensions.schedule_store:DatabaseScheduler
+
+管理调度条目（Beat 运行中即时生效）:
+    python -m extensions.schedule_store add report-hourly tasks.realworld_tasks.generate_report \\
+        --crontab "0 * * * *" --args '["hourly", {}]'
+    python -m extensions.schedule_store add ping tasks.basic_tasks.add --every 10 --args '[1, 2]'
+    python -m extensions.schedule_store remove ping
+    python -m extensions.schedule_store list
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from collections import deque
+from datetime import timedelta
+
+from celery.schedules import crontab, schedule as interval_schedule, solar
+
+from extensions.heap_scheduler import HeapScheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = 'celerybeat-schedule.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedule_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO schedule_meta (id, version) VALUES (1, 0);
+CREATE TABLE IF NOT EXISTS schedule_entries (
+    name TEXT PRIMARY KEY,
+    task TEXT NOT NULL,
+    schedule TEXT NOT NULL,
+    args TEXT NOT NULL DEFAULT '[]',
+    kwargs TEXT NOT NULL DEFAULT '{}',
+    options TEXT NOT NULL DEFAULT '{}',
+    deleted INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS schedule_entries_version ON schedule_entries (version);
+CREATE TABLE IF NOT EXISTS schedule_readers (
+    reader TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    seen_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedule_purge (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    before_version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO schedule_purge (id, before_version) VALUES (1, 0);
+"""
+
+CRONTAB_FIELDS = ('minute', 'hour', 'day_of_week', 'day_of_month', 'month_of_year')
+
+
+def schedule_to_dict(sched):
+    """把调度对象转换为可以保存的字典"""
+    if isinstance(sched, crontab):
+        return {'type': 'crontab',
+                **{field: getattr(sched, f'_orig_{field}') for field in CRONTAB_FIELDS}}
+    if isinstance(sched, solar):
+        return {'type': 'solar', 'event': sched.event, 'lat': sched.lat, 'lon': sched.lon}
+    if isinstance(sched, interval_schedule):
+        return {'type': 'interval', 'every': sched.run_every.total_seconds()}
+    if isinstance(sched, (int, float)):
+        return {'type': 'interval', 'every': float(sched)}
+    if isinstance(sched, timedelta):
+        return {'type': 'interval', 'every': sched.total_seconds()}
+    raise TypeError(f'不支持保存的调度类型: {sched!r}')
+
+
+def schedule_from_dict(data, app=None):
+    """把保存的字典还原为调度对象"""
+    if data['type'] == 'crontab':
+        return crontab(app=app, **{field: data[field] for field in CRONTAB_FIELDS})
+    if data['type'] == 'interval':
+        return interval_schedule(timedelta(seconds=data['every']), app=app)
+    if data['type'] == 'solar':
+        return solar(data['event'], data['lat'], data['lon'], app=app)
+    raise ValueError(f'未知的调度类型: {data["type"]!r}')
+
+
+def parse_crontab(expression):
+    """解析 "分 时 日 月 周" 形式的 crontab 表达式"""
+    minute, hour, day_of_month, month_of_year, day_of_week = expression.split()
+    return crontab(minute=minute, hour=hour, day_of_month=day_of_month,
+                   month_of_year=month_of_year, day_of_week=day_of_week)
+
+
+class ScheduleStore:
+    """带变更版本号的 SQLite 调度表"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+        # WAL 模式：管理命令写入时不阻塞 Beat 读取
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def version(self):
+        """当前全局变更版本号"""
+        return self.conn.execute('SELECT version FROM schedule_meta WHERE id = 1').fetchone()[0]
+
+    def _write(self, rows):
+        """在一个事务中写入一批行，所有行使用同一个新版本号"""
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('UPDATE schedule_meta SET version = version + 1 WHERE id = 1')
+            version = self.version()
+            conn.executemany(
+                'INSERT OR REPLACE INTO schedule_entries '
+                '(name, task, schedule, args, kwargs, options, deleted, version) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [row + (version,) for row in rows],
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return version
+
+    def put_many(self, entries):
+        """
+        新增或替换一批条目
+
+        参数:
+            entries: 字典的可迭代对象，键为 name / task / schedule / args / kwargs / options
+        """
+        return self._write([
+            (entry['name'], entry['task'],
+             json.dumps(schedule_to_dict(entry['schedule'])),
+             json.dumps(list(entry.get('args') or ())),
+             json.dumps(entry.get('kwargs') or {}),
+             json.dumps(entry.get('options') or {}),
+             0)
+            for entry in entries
+        ])
+
+    def put(self, name, task, schedule, args=(), kwargs=None, options=None):
+        """新增或替换一个条目"""
+        return self.put_many([{'name': name, 'task': task, 'schedule': schedule,
+                               'args': args, 'kwargs': kwargs, 'options': options}])
+
+    def remove_many(self, names):
+        """删除一批条目（写入墓碑）"""
+        return self._write([(name, '', '{}', '[]', '{}', '{}', 1) for name in names])
+
+    def remove(self, name):
+        return self.remove_many([name])
+
+    def names(self, include_deleted=False):
+        """所有条目名，默认不包括已删除的条目"""
+        sql = 'SELECT name FROM schedule_entries'
+        if not include_deleted:
+            sql += ' WHERE deleted = 0'
+        return {row[0] for row in self.conn.execute(sql)}
+
+    def changes_since(self, version):
+        """
+        读取某个版本之后变化的条目
+
+        返回:
+            (最新版本号, [行字典])，行字典中 deleted 为 True 表示已删除
+        """
+        current = self.version()
+        rows = self.conn.execute(
+            'SELECT name, task, schedule, args, kwargs, options, deleted '
+            'FROM schedule_entries WHERE version > ? AND version <= ? ORDER BY version',
+            (version, current),
+        ).fetchall()
+        return current, [
+            {'name': name, 'task': task, 'schedule': json.loads(sched),
+             'args': json.loads(args), 'kwargs': json.loads(kwargs),
+             'options': json.loads(options), 'deleted': bool(deleted)}
+            for name, task, sched, args, kwargs, options, deleted in rows
+        ]
+
+    def purge_tombstones(self, before_version, keep=()):
+        """
+        清理早于某个版本的墓碑（所有 Beat 都已读过这些变更后调用）
+
+        参数:
+            keep: 需要保留墓碑的条目名（beat_schedule 中的条目，保留墓碑才不会在重启时被重新写入）
+
+        返回:
+            清理的墓碑数
+        """
+        keep = list(keep)
+        sql = 'DELETE FROM schedule_entries WHERE deleted = 1 AND version < ?'
+        if keep:
+            sql += f' AND name NOT IN ({",".join("?" * len(keep))})'
+        purged = self.conn.execute(sql, (before_version, *keep)).rowcount
+        if purged:
+            self.conn.execute(
+                'UPDATE schedule_purge SET before_version = MAX(before_version, ?) WHERE id = 1',
+                (before_version,))
+        return purged
+
+    def purged_before(self):
+        """早于该版本的墓碑可能已被清理"""
+        return self.conn.execute(
+            'SELECT before_version FROM schedule_purge WHERE id = 1').fetchone()[0]
+
+    def acknowledge(self, reader, version, timeout):
+        """
+        记录某个 Beat 已应用到的版本号，返回所有活跃 Beat 都已应用的最小版本号
+
+        参数:
+            reader: Beat 的标识
+            timeout: 超过这么多秒没有确认的 Beat 视为已退出，不再等待它
+        """
+        now = time.time()
+        self.conn.execute(
+            'INSERT OR REPLACE INTO schedule_readers (reader, version, seen_at) VALUES (?, ?, ?)',
+            (reader, version, now))
+        self.conn.execute('DELETE FROM schedule_readers WHERE seen_at < ?', (now - timeout,))
+        return self.conn.execute('SELECT MIN(version) FROM schedule_readers').fetchone()[0]
+
+    def forget_reader(self, reader):
+        """Beat 退出时删除自己的确认记录"""
+        self.conn.execute('DELETE FROM schedule_readers WHERE reader = ?', (reader,))
+
+
+class DatabaseScheduler(HeapScheduler):
+    """从 ScheduleStore 增量热加载调度条目的 Beat 调度器"""
+
+    #: 检查版本号的间隔（秒）
+    reload_interval = 1.0
+    #: 每次 tick 用于应用变更的最长时间（秒）
+    apply_budget = 0.05
+    #: 超过这么多秒没有确认版本号的 Beat 视为已退出，清理墓碑时不再等待它
+    reader_timeout = 3600
+
+    def __init__(self, app, *args, **kwargs):
+        self.store = ScheduleStore(app.conf.get('beat_schedule_db') or DEFAULT_PATH)
+        self.reader = f'{socket.gethostname()}:{os.getpid()}'
+        self._store_version = 0
+        self._pending_changes = deque()
+        self._next_reload = 0
+        super().__init__(app, *args, **kwargs)
+
+    def setup_schedule(self):
+        super().setup_schedule()
+        # 首次启动：把配置文件中数据库里还没有的条目写入数据库（已删除的条目不再写入）
+        known = self.store.names(include_deleted=True)
+        missing = []
+        for name, entry in self.schedule.items():
+            if name in known:
+                continue
+            try:
+                schedule_to_dict(entry.schedule)
+            except TypeError:
+                logger.warning('调度条目 %s 的调度类型 %r 不能保存到数据库，只按配置文件运行',
+                               name, entry.schedule)
+                continue
+            missing.append(entry)
+        if missing:
+            self.store.put_many(
+                {'name': entry.name, 'task': entry.task, 'schedule': entry.schedule,
+                 'args': entry.args, 'kwargs': entry.kwargs, 'options': entry.options}
+                for entry in missing
+            )
+        self._reload()
+        self._apply_pending(budget=None)
+
+    def _reload(self):
+        """读取版本号，有变化时把变更加入待应用队列"""
+        if self.store.version() == self._store_version:
+            return
+        if self._store_version + 1 < self.store.purged_before():
+            # 长时间没有读取（例如作为备用节点），期间的墓碑可能已被清理，全量比对一次
+            self._resync()
+            return
+        self._store_version, changes = self.store.changes_since(self._store_version)
+        self._pending_changes.extend(changes)
+
+    def _resync(self):
+        """以数据库中的全部条目为准重新加载"""
+        stored = self.store.names(include_deleted=True)
+        # 不在数据库中的条目：墓碑已被清理的已删除条目，或不能保存的配置文件条目
+        for name in [name for name in self.schedule
+                     if name not in stored and name not in self.app.conf.beat_schedule]:
+            self.remove_entry(name)
+        self._pending_changes.clear()
+        self._store_version, changes = self.store.changes_since(0)
+        self._pending_changes.extend(changes)
+
+    def _apply_pending(self, budget):
+        """应用待处理的变更（每条 O(log n)），最多用时 budget 秒，None 表示全部应用"""
+        pending = self._pending_changes
+        deadline = None if budget is None else time.monotonic() + budget
+        while pending and (deadline is None or time.monotonic() < deadline):
+            change = pending.popleft()
+            if change['deleted']:
+                self.remove_entry(change['name'])
+                continue
+            existing = self.schedule.get(change['name'])
+            self.add_entry(
+                change['name'], change['task'],
+                schedule_from_dict(change['schedule'], app=self.app),
+                args=change['args'], kwargs=change['kwargs'], options=change['options'],
+                # 修改已有条目时保留上一次执行时间，固定间隔任务的相位不变
+                last_run_at=existing.last_run_at if existing is not None else None,
+            )
+
+    def tick(self, *args, **kwargs):
+        now = time.time()
+        if now >= self._next_reload:
+            self._next_reload = now + self.reload_interval
+            self._reload()
+        if self._pending_changes:
+            self._apply_pending(self.apply_budget)
+
+        interval = super().tick(*args, **kwargs)
+        if self.should_sync():
+            # 没有条目触发时也定期确认版本号、清理墓碑
+            self._do_sync()
+        if self._pending_changes:
+            return 0
+        return min(interval, max(self._next_reload - time.time(), 0))
+
+    def sync(self):
+        super().sync()
+        if self._pending_changes:
+            # 读到的变更还没有全部应用，等下一次 sync 再确认
+            return
+        try:
+            acknowledged = self.store.acknowledge(
+                self.reader, self._store_version, self.reader_timeout)
+            purged = self.store.purge_tombstones(acknowledged, keep=self.app.conf.beat_schedule)
+        except sqlite3.Error as exc:
+            logger.warning('确认调度表版本失败: %r', exc)
+            return
+        if purged:
+            logger.info('清理 %d 个所有 Beat 都已读过的墓碑（版本 < %d）', purged, acknowledged)
+
+    def close(self):
+        super().close()
+        self.store.forget_reader(self.reader)
+        self.store.close()
+
+
+def main():
+    """调度条目管理命令"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='数据库调度表管理')
+    parser.add_argument('--db', default=DEFAULT_PATH, help=f'SQLite 文件路径，默认 {DEFAULT_PATH}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add = subparsers.add_parser('add', help='新增或替换条目')
+    add.add_argument('name', help='条目名')
+    add.add_argument('task', help='任务名')
+    group = add.add_mutually_exclusive_group(required=True)
+    group.add_argument('--every', type=float, help='固定间隔（秒）')
+    group.add_argument('--crontab', help='crontab 表达式，如 "0 2 * * *"')
+    add.add_argument('--args', default='[]', help='位置参数（JSON 列表）')
+    add.add_argument('--kwargs', default='{}', help='关键字参数（JSON 对象）')
+
+    remove = subparsers.add_parser('remove', help='删除条目')
+    remove.add_argument('name', help='条目名')
+
+    subparsers.add_parser('list', help='列出所有条目')
+
+    args = parser.parse_args()
+    store = ScheduleStore(args.db)
+
+    if args.command == 'add':
+        sched = args.every if args.every is not None else parse_crontab(args.crontab)
+        version = store.put(args.name, args.task, sched,
+                            args=json.loads(args.args), kwargs=json.loads(args.kwargs))
+        print(f"✅ 已保存 {args.name}（版本 {version}）")
+    elif args.command == 'remove':
+        version = store.remove(args.name)
+        print(f"✅ 已删除 {args.name}（版本 {version}）")
+    else:
+        _, rows = store.changes_since(0)
+        print(f"版本: {store.version()}")
+        for row in rows:
+            if not row['deleted']:
+                print(f"  {row['name']:30s} {row['task']:45s} {row['schedule']}")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
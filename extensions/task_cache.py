@@ -0,0 +1,217 @@
+"""
+任务结果缓存（内容寻址）
+
+fetch_data('database')、process_item('item1')、generate_report(...) 这类任务
+对相同输入总是产生相同结果，但每次调用都会重新执行一遍。
+
+CachedTask 在任务执行前以 "任务名 + 规范化参数" 的 SHA-256 指纹查询缓存：
+- 命中：直接返回缓存的结果，不执行任务体
+- 未命中：执行任务体，把结果写入缓存（失败与重试不会被缓存）
+
+两种存储：
+1. redis（默认）：存放在结果后端的 Redis 中，所有 Worker 共享
+   - 条目带 TTL，到期自动失效
+   - 每个任务一个有序集合记录最近访问时间，条目数超过 cache_max_entries 时
+     淘汰最久未访问的条目（LRU）
+   - 读取 / 写入各由一个 Lua 脚本完成，每次只需一次往返，命中 / 未命中 / 淘汰计数
+     在脚本中一并累加到 task-cache-stats 哈希
+2. local：进程内 LRU（OrderedDict），零网络开销，但各 Worker 进程之间不共享，
+   计数也只保存在进程内
+
+缓存在任务执行侧生效，对 delay()、chain、group、chord、fuse() 都透明。
+缓存值使用结果后端的序列化器编码。
+
+用法:
+    from extensions.task_cache import cached_task
+
+    @cached_task(name='tasks.advanced_tasks.fetch_data', cache_ttl=600)
+    def fetch_data(source):
+        ...
+
+    # 等价写法
+    @app.task(name=..., base=CachedTask, cache_ttl=600, cache_max_entries=1000)
+
+    cache_stats()   # {'tasks.advanced_tasks.fetch_data': {'hits': 9, 'misses': 1, ...}}
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from kombu.utils.objects import cached_property
+
+from celery_app import app
+from extensions.async_client import AsyncTask
+from extensions.fingerprint import task_fingerprint
+
+KEY_PREFIX = 'task-cache-'
+STATS_KEY = 'task-cache-stats'
+
+# KEYS[1] 缓存条目  KEYS[2] LRU 有序集合  KEYS[3] 计数哈希
+# ARGV[1] 当前时间  ARGV[2] 任务名
+CACHE_GET_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if value then
+    redis.call('ZADD', KEYS[2], ARGV[1], KEYS[1])
+    redis.call('HINCRBY', KEYS[3], ARGV[2] .. ':hits', 1)
+else
+    redis.call('HINCRBY', KEYS[3], ARGV[2] .. ':misses', 1)
+end
+return value
+"""
+
+# KEYS[1] 缓存条目  KEYS[2] LRU 有序集合  KEYS[3] 计数哈希
+# ARGV[1] 编码后的结果  ARGV[2] TTL（秒，0 表示不过期）  ARGV[3] 当前时间
+# ARGV[4] 最大条目数  ARGV[5] 任务名
+CACHE_SET_SCRIPT = """
+local ttl = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+if ttl > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ttl)
+    -- 最近访问早于 now - ttl 的条目一定已经过期，只需清理索引
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - ttl)
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+redis.call('ZADD', KEYS[2], now, KEYS[1])
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if excess > 0 then
+    local victims = redis.call('ZRANGE', KEYS[2], 0, excess - 1)
+    redis.call('DEL', unpack(victims))
+    redis.call('ZREMRANGEBYRANK', KEYS[2], 0, excess - 1)
+    redis.call('HINCRBY', KEYS[3], ARGV[5] .. ':evictions', excess)
+end
+return excess
+"""
+
+
+class RedisCache:
+    """所有 Worker 共享的 Redis 缓存"""
+
+    def __init__(self, client, name, ttl, max_entries):
+        self.client = client
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.index_key = f'{KEY_PREFIX}lru-{name}'
+        self._get = client.register_script(CACHE_GET_SCRIPT)
+        self._set = client.register_script(CACHE_SET_SCRIPT)
+
+    def get(self, key):
+        return self._get(keys=[key, self.index_key, STATS_KEY],
+                         args=[time.time(), self.name])
+
+    def set(self, key, value):
+        self._set(keys=[key, self.index_key, STATS_KEY],
+                  args=[value, self.ttl or 0, time.time(), self.max_entries, self.name])
+
+    def delete(self, key):
+        with self.client.pipeline() as pipe:
+            pipe.delete(key)
+            pipe.zrem(self.index_key, key)
+            pipe.execute()
+
+    def stats(self):
+        return cache_stats().get(self.name, {})
+
+
+class LocalCache:
+    """进程内 LRU 缓存"""
+
+    def __init__(self, name, ttl, max_entries):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        return dict(self.counters)
+
+
+class CachedTask(AsyncTask):
+    """执行前查询结果缓存的任务基类"""
+
+    #: 缓存有效期（秒），0 表示不过期
+    cache_ttl = 3600
+    #: 每个任务最多缓存的条目数，超出后淘汰最久未访问的条目
+    cache_max_entries = 10000
+    #: 存储方式：'redis'（Worker 间共享）或 'local'（进程内）
+    cache_backend = 'redis'
+
+    @cached_property
+    def cache(self):
+        if self.cache_backend == 'local':
+            return LocalCache(self.name, self.cache_ttl, self.cache_max_entries)
+        if self.cache_backend == 'redis':
+            return RedisCache(self.backend.client, self.name,
+                              self.cache_ttl, self.cache_max_entries)
+        raise ValueError(f'未知的缓存存储: {self.cache_backend!r}')
+
+    def cache_key(self, args, kwargs):
+        """缓存键：任务名与规范化参数的指纹"""
+        return KEY_PREFIX + task_fingerprint(self.name, args, kwargs)
+
+    def cache_invalidate(self, *args, **kwargs):
+        """删除某组参数对应的缓存条目"""
+        self.cache.delete(self.cache_key(args, kwargs))
+
+    def __call__(self, *args, **kwargs):
+        key = self.cache_key(args, kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self.backend.decode(cached)
+        result = super().__call__(*args, **kwargs)
+        self.cache.set(key, self.backend.encode(result))
+        return result
+
+
+def cached_task(*args, **options):
+    """
+    以 CachedTask 为基类注册任务的装饰器，参数与 app.task() 相同
+
+    额外支持 cache_ttl / cache_max_entries / cache_backend 覆盖默认值
+    """
+    options.setdefault('base', CachedTask)
+    return app.task(*args, **options)
+
+
+def cache_stats():
+    """
+    读取 Redis 缓存的命中统计（local 存储的计数只在各 Worker 进程内）
+
+    返回:
+        {任务名: {'hits': n, 'misses': n, 'evictions': n}}
+    """
+    stats = {}
+    for field, count in app.backend.client.hgetall(STATS_KEY).items():
+        name, _, counter = field.decode().rpartition(':')
+        stats.setdefault(name, {'hits': 0, 'misses': 0, 'evictions': 0})[counter] = int(count)
+    return stats
@@ -0,0 +1,101 @@
+"""
+提交去重（In-flight Deduplication）
+
+多个客户端同时调用 generate_report.delay('daily', date_range) 或 fetch_data.delay(source) 时，
+队列里会出现 N 个相同的任务，Worker 把同样的工作做 N 遍。
+
+DeduplicatedTask 在提交时以 "任务名 + 规范化参数" 的指纹加一把短期锁：
+
+    SET task-dedup-<指纹> <task_id> NX EX dedup_ttl
+        成功 → 正常发布任务，锁的值就是这次的任务 ID
+        失败 → 不发布，直接返回锁中记录的任务 ID 对应的 AsyncResult
+
+所有并发调用者拿到的是同一个任务的结果句柄，只有一个任务真正进入队列。
+任务结束后（成功或最终失败）Worker 用 Lua 脚本比较并删除锁，
+只删除属于自己的锁；Worker 丢失时锁在 dedup_ttl 后自动过期。
+
+以下情况不做去重，按原样发布：
+- 作为 chain / group / chord 的一部分提交（需要各自独立的任务 ID 与回调）
+- 调用者显式指定了 task_id 或 link / link_error
+- 任务以 eager 模式执行
+
+与结果缓存配合（CachedDeduplicatedTask）：执行中的重复提交被合并，
+执行完成后的重复调用由缓存直接返回。
+
+用法:
+    @app.task(name=..., base=DeduplicatedTask, dedup_ttl=300)
+    def generate_report(report_type, date_range):
+        ...
+
+    r1 = generate_report.delay('daily', date_range)
+    r2 = generate_report.delay('daily', date_range)
+    assert r1.id == r2.id
+"""
+
+from celery import states
+from kombu.utils.objects import cached_property
+from kombu.utils.uuid import uuid
+
+from extensions.async_client import AsyncTask
+from extensions.fingerprint import task_fingerprint
+from extensions.task_cache import CachedTask
+
+KEY_PREFIX = 'task-dedup-'
+
+# 出现这些选项时不做去重
+BYPASS_OPTIONS = frozenset({
+    'task_id', 'link', 'link_error', 'chain', 'chord', 'group_id',
+})
+
+# KEYS[1] 去重锁  ARGV[1] 任务 ID
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class DeduplicatedTask(AsyncTask):
+    """提交时合并相同参数的并发调用的任务基类"""
+
+    #: 去重锁有效期（秒），应不短于任务的最长执行时间
+    dedup_ttl = 300
+
+    @cached_property
+    def _release_lock(self):
+        return self.backend.client.register_script(RELEASE_SCRIPT)
+
+    def dedup_key(self, args, kwargs):
+        """去重锁的键：任务名与规范化参数的指纹"""
+        return KEY_PREFIX + task_fingerprint(self.name, args, kwargs)
+
+    def apply_async(self, args=None, kwargs=None, task_id=None, **options):
+        if (task_id is not None or BYPASS_OPTIONS & options.keys()
+                or self.app.conf.task_always_eager):
+            return super().apply_async(args, kwargs, task_id=task_id, **options)
+
+        client = self.backend.client
+        key = self.dedup_key(args, kwargs)
+        task_id = uuid()
+        # 锁可能恰好在 SET 与 GET 之间过期，此时重新抢锁
+        while not client.set(key, task_id, nx=True, ex=self.dedup_ttl):
+            existing = client.get(key)
+            if existing is not None:
+                return self.AsyncResult(existing.decode())
+        try:
+            return super().apply_async(args, kwargs, task_id=task_id, **options)
+        except Exception:
+            # 发布失败时释放锁，避免后续调用拿到一个永远不会执行的任务 ID
+            self._release_lock(keys=[key], args=[task_id])
+            raise
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        # 重试期间任务仍在进行中，保留锁
+        if status != states.RETRY:
+            self._release_lock(keys=[self.dedup_key(args, kwargs)], args=[task_id])
+        super().after_return(status, retval, task_id, args, kwargs, einfo)
+
+
+class CachedDeduplicatedTask(DeduplicatedTask, CachedTask):
+    """同时启用提交去重与结果缓存的任务基类"""
@@ -0,0 +1,428 @@
+"""
+分层结果后端（Tiered Result Backend）
+
+export_data、generate_report、aggregate_results 的大结果在 Redis 内存中一直保留到 result_expires，
+而它们通常只在完成后的几十秒内被读取一次。
+
+TieredRedisBackend 把结果分为两层：
+
+    热层: Redis          完成后 hot_window 秒内的结果（写入方式与 Redis 后端完全相同）
+    冷层: 本地分段存储    只追加的分段文件 + SQLite 索引（任务键 → 分段、偏移、长度、过期时间）
+
+1. 写入：照常写入 Redis；集群中有 TierDemoter 在运行时，已完成且不小于 min_size 的结果
+   在同一个 pipeline 中以到期时间记入降级索引（ZSET tiered-demote），并清理超过 result_expires 的索引项
+2. 降级：Worker 中的 TierDemoter 每秒取出已过热窗口的结果，超过 min_size 字节的
+   批量追加到当前分段文件并写入索引，再用 Lua 脚本比较 SHA1 后把 Redis 中的值
+   替换为几十字节的标记（降级主机 + 冷层目录，TTL 不变）；
+   小结果留在 Redis 中按原来的 TTL 过期（降级省下的内存还不如索引的开销）
+3. 读取：get / mget 先读 Redis，读到标记时查 SQLite 索引，用一次 pread 读出分段中的数据；
+   AsyncResult.get()、iter_results() 透明地穿透到冷层。
+   当前主机访问不到标记所指的分段时抛出 ColdResultUnavailable，而不是把结果当作 PENDING
+4. 过期：冷层保留结果原来剩余的 TTL；过期的索引行被清理，所有结果都过期的分段文件整个删除
+
+分段文件是只追加的，写入只有顺序 I/O；读取是一次主键查询 + 一次 pread，在本地磁盘上约 1 毫秒以内。
+
+说明：降级锁是整个集群共享的，分段写入取得锁的 Worker 所在主机的 result_tier_path。
+读取结果的进程都需要能访问这个目录：result_tier_path 位于共享存储（NFS 等），
+或者只在一台主机上运行 TierDemoter，客户端与它在同一台机器上。
+
+启用方式（两者都需要设置）:
+    RESULT_BACKEND_CLASS=extensions.tiered_backend:TieredRedisBackend
+    TIER_DEMOTER=true    # 只在能写入 result_tier_path 的 Worker 上设置
+
+配置项:
+    result_hot_window = 60          # 结果在 Redis 中保留的秒数
+    result_tier_path = 'result-tier'
+    result_tier_min_size = 4096     # 小于该字节数的结果不降级
+"""
+
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from celery import bootsteps, states
+from celery.exceptions import BackendStoreError
+
+from extensions.chord_join import LuaChordRedisBackend
+
+logger = logging.getLogger(__name__)
+
+DEMOTE_KEY = 'tiered-demote'
+DEMOTE_LOCK_KEY = 'tiered-demote-lock'
+#: TierDemoter 的心跳键，存在时写入结果才记入降级索引
+DEMOTER_KEY = 'tiered-demoter'
+#: 写入端缓存心跳检查结果的秒数
+DEMOTER_CHECK_INTERVAL = 5.0
+
+#: 单个分段文件的最大字节数，超过后切换到新分段
+SEGMENT_SIZE = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at);
+CREATE INDEX IF NOT EXISTS results_segment ON results (segment);
+"""
+
+#: 已降级结果在 Redis 中的标记前缀；JSON 编码的结果总是以 '{' 开头，不会冲突
+TIER_PREFIX = b'\x00tier\x00'
+
+# KEYS[1] 结果键  ARGV[1] 降级时读到的值的 SHA1  ARGV[2] 标记
+# 值没有变化时替换为标记并保留 TTL，返回 1；否则返回 0（结果在降级期间被改写，留在 Redis 中）
+REPLACE_WITH_MARKER_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if not value or redis.sha1hex(value) ~= ARGV[1] then
+    return 0
+end
+local ttl = redis.call('PTTL', KEYS[1])
+redis.call('SET', KEYS[1], ARGV[2])
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+
+class ColdResultUnavailable(Exception):
+    """结果已降级到冷层，但分段在当前主机上不可访问"""
+
+
+def _as_str(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _is_marker(value):
+    return value is not None and (value if isinstance(value, bytes) else value.encode()).startswith(TIER_PREFIX)
+
+
+class SegmentStore:
+    """只追加的分段文件 + SQLite 索引"""
+
+    def __init__(self, path, segment_size=SEGMENT_SIZE):
+        self.path = path
+        self.segment_size = segment_size
+        os.makedirs(path, exist_ok=True)
+        self._local = threading.local()
+        self._fds = {}
+        self._fds_lock = threading.Lock()
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self):
+        """每个线程一个 SQLite 连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.path, 'index.sqlite3'),
+                                   isolation_level=None, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f'segment-{segment:06d}.log')
+
+    def _read_fd(self, segment):
+        fd = self._fds.get(segment)
+        if fd is None:
+            with self._fds_lock:
+                fd = self._fds.get(segment)
+                if fd is None:
+                    fd = self._fds[segment] = os.open(self._segment_path(segment), os.O_RDONLY)
+        return fd
+
+    def _current_segment(self):
+        """当前可追加的分段号与其已有长度"""
+        segments = sorted(
+            int(name[8:14]) for name in os.listdir(self.path)
+            if name.startswith('segment-') and name.endswith('.log'))
+        if not segments:
+            return 1, 0
+        segment = segments[-1]
+        size = os.path.getsize(self._segment_path(segment))
+        if size >= self.segment_size:
+            return segment + 1, 0
+        return segment, size
+
+    def append_many(self, items):
+        """
+        追加一批结果并写入索引
+
+        参数:
+            items: [(键, 编码后的值, 过期时间戳或 None)]
+        """
+        if not items:
+            return
+        segment, offset = self._current_segment()
+        rows = []
+        with open(self._segment_path(segment), 'ab') as segment_file:
+            for key, value, expires_at in items:
+                value = value.encode() if isinstance(value, str) else value
+                segment_file.write(value)
+                rows.append((_as_str(key), segment, offset, len(value), expires_at))
+                offset += len(value)
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+        # 数据落盘之后才写索引，索引中的每一行都指向完整的数据
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO results (key, segment, offset, length, expires_at) '
+                'VALUES (?, ?, ?, ?, ?)', rows)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get(self, key):
+        """读取一个结果，不存在或已过期时返回 None"""
+        row = self.conn.execute(
+            'SELECT segment, offset, length, expires_at FROM results WHERE key = ?',
+            (_as_str(key),)).fetchone()
+        if row is None:
+            return None
+        segment, offset, length, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        try:
+            return os.pread(self._read_fd(segment), length, offset)
+        except FileNotFoundError:
+            return None
+
+    def get_many(self, keys):
+        """读取多个结果，返回 {键: 值}，只包括存在的"""
+        keys = [_as_str(key) for key in keys]
+        found = {}
+        now = time.time()
+        # SQLite 默认最多 999 个参数
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(
+                'SELECT key, segment, offset, length, expires_at FROM results '
+                f'WHERE key IN ({",".join("?" * len(chunk))})', chunk).fetchall()
+            for key, segment, offset, length, expires_at in rows:
+                if expires_at is not None and expires_at <= now:
+                    continue
+                try:
+                    found[key] = os.pread(self._read_fd(segment), length, offset)
+                except FileNotFoundError:
+                    continue
+        return found
+
+    def delete(self, key):
+        self.conn.execute('DELETE FROM results WHERE key = ?', (_as_str(key),))
+
+    def purge_expired(self):
+        """
+        清理过期的索引行，并删除不再被索引引用的分段文件
+
+        返回:
+            删除的分段文件数
+        """
+        self.conn.execute('DELETE FROM results WHERE expires_at <= ?', (time.time(),))
+        live = {row[0] for row in self.conn.execute('SELECT DISTINCT segment FROM results')}
+        segments = [int(name[8:14]) for name in os.listdir(self.path)
+                    if name.startswith('segment-') and name.endswith('.log')]
+        removed = 0
+        for segment in segments:
+            # 始终保留编号最大的分段，分段编号不会被重复使用（读取进程可能缓存了旧文件的描述符）
+            if segment in live or segment >= max(segments):
+                continue
+            with self._fds_lock:
+                fd = self._fds.pop(segment, None)
+                if fd is not None:
+                    os.close(fd)
+            os.remove(self._segment_path(segment))
+            removed += 1
+        return removed
+
+
+class TieredRedisBackend(LuaChordRedisBackend):
+    """热结果在 Redis、冷结果在本地分段存储的结果后端"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        conf = self.app.conf
+        self.hot_window = float(conf.get('result_hot_window') or 60)
+        self.tier_min_size = int(conf.get('result_tier_min_size') or 4096)
+        self.tier_path = conf.get('result_tier_path') or 'result-tier'
+        self._tier = None
+        self._tier_pid = None
+        self._demoter_running = False
+        self._demoter_checked = None
+
+    @property
+    def tier(self):
+        # SQLite 连接与文件描述符不能跨 fork 使用：prefork 子进程中重新打开
+        if self._tier is None or self._tier_pid != os.getpid():
+            self._tier = SegmentStore(self.tier_path)
+            self._tier_pid = os.getpid()
+        return self._tier
+
+    def _set_with_state(self, key, value, state):
+        if (state not in states.READY_STATES or len(value) < self.tier_min_size
+                or not self.demoter_running()):
+            return super()._set_with_state(key, value, state)
+        if isinstance(value, str) and len(value) > self._MAX_STR_VALUE_SIZE:
+            raise BackendStoreError('value too large for Redis backend')
+        return self.ensure(self._set_and_index, (key, value))
+
+    def _set_and_index(self, key, value):
+        now = time.time()
+        with self.client.pipeline() as pipe:
+            if self.expires:
+                pipe.setex(key, self.expires, value)
+            else:
+                pipe.set(key, value)
+            pipe.publish(key, value)
+            pipe.zadd(DEMOTE_KEY, {key: now + self.hot_window})
+            if self.expires:
+                # 分数为 完成时间 + hot_window，早于 now + hot_window - result_expires 的结果键已经过期
+                pipe.zremrangebyscore(DEMOTE_KEY, '-inf', now + self.hot_window - self.expires)
+            pipe.execute()
+
+    def demoter_running(self):
+        """集群中是否有 TierDemoter 在运行（按心跳键判断，结果缓存 DEMOTER_CHECK_INTERVAL 秒）"""
+        now = time.monotonic()
+        if self._demoter_checked is None or now - self._demoter_checked >= DEMOTER_CHECK_INTERVAL:
+            self._demoter_running = bool(self.client.exists(DEMOTER_KEY))
+            self._demoter_checked = now
+        return self._demoter_running
+
+    @property
+    def marker(self):
+        """本机降级结果的标记：降级主机 + 冷层目录"""
+        return TIER_PREFIX + f'{socket.gethostname()}\x00{os.path.abspath(self.tier_path)}'.encode()
+
+    def get(self, key):
+        return self.merge_cold([key], [super().get(key)])[0]
+
+    def mget(self, keys):
+        return self.merge_cold(keys, super().mget(keys))
+
+    def merge_cold(self, keys, values):
+        """用冷层补齐 Redis 中未命中或已降级（标记）的值"""
+        missing = [key for key, value in zip(keys, values) if value is None or _is_marker(value)]
+        if not missing:
+            return values
+        cold = self.tier.get_many(missing)
+        merged = []
+        for key, value in zip(keys, values):
+            if value is None or _is_marker(value):
+                found = cold.get(_as_str(key))
+                if found is None and value is not None:
+                    self._unavailable(key, value)
+                value = found
+            merged.append(value)
+        return merged
+
+    def _unavailable(self, key, marker):
+        host, _, path = _as_str(marker)[len(TIER_PREFIX):].partition('\x00')
+        raise ColdResultUnavailable(
+            f'结果 {_as_str(key)} 已由 {host} 降级到 {path}，当前主机 {socket.gethostname()} '
+            f'的 {os.path.abspath(self.tier_path)} 中没有对应的分段；'
+            f'result_tier_path 需要是所有读取结果的主机共享的存储')
+
+    def delete(self, key):
+        super().delete(key)
+        self.tier.delete(key)
+
+    def demote(self, now=None, limit=1000):
+        """
+        把已过热窗口的结果从 Redis 降级到冷层
+
+        返回:
+            (降级的结果数, 留在 Redis 中的小结果数)
+        """
+        now = time.time() if now is None else now
+        client = self.client
+        keys = client.zrangebyscore(DEMOTE_KEY, '-inf', now, start=0, num=limit)
+        if not keys:
+            return 0, 0
+        with client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.get(key)
+                pipe.pttl(key)
+            replies = pipe.execute()
+
+        items = []
+        for i, key in enumerate(keys):
+            value, pttl = replies[2 * i], replies[2 * i + 1]
+            if value is None or len(value) < self.tier_min_size or _is_marker(value):
+                continue
+            expires_at = now + pttl / 1000 if pttl and pttl > 0 else None
+            items.append((key, value, expires_at))
+
+        self.tier.append_many(items)
+        script = client.register_script(REPLACE_WITH_MARKER_SCRIPT)
+        marker = self.marker
+        with client.pipeline(transaction=False) as pipe:
+            for key, value, _ in items:
+                script(keys=[key], args=[hashlib.sha1(value).hexdigest(), marker], client=pipe)
+            pipe.zrem(DEMOTE_KEY, *keys)
+            pipe.execute()
+        return len(items), len(keys) - len(items)
+
+
+class TierDemoter(bootsteps.StartStopStep):
+    """
+    在 Worker 中定期把结果降级到冷层
+
+    只在使用 TieredRedisBackend 的 Worker 上生效，并且需要显式添加（celery_app.py 中的 TIER_DEMOTER）：
+    分段写入运行该步骤的主机的 result_tier_path
+    """
+
+    requires = {'celery.worker.components:Timer'}
+
+    #: 降级间隔（秒）
+    interval = 1.0
+    #: 清理过期冷数据的间隔（秒）
+    purge_interval = 300.0
+
+    def __init__(self, worker, **kwargs):
+        super().__init__(worker, **kwargs)
+        self.tref = None
+        self._next_purge = 0
+
+    def include_if(self, worker):
+        return isinstance(worker.app.backend, TieredRedisBackend)
+
+    def start(self, worker):
+        self.tref = worker.timer.call_repeatedly(
+            self.interval, self.tick, (worker.app.backend,), priority=10)
+
+    def stop(self, worker):
+        if self.tref is not None:
+            self.tref.cancel()
+            self.tref = None
+
+    def tick(self, backend):
+        try:
+            # 心跳：写入端只在降级器运行时记录降级索引
+            backend.client.set(DEMOTER_KEY, socket.gethostname(), px=int(self.interval * 10000))
+            # 同一时刻只有一个 Worker 追加分段文件
+            if not backend.client.set(DEMOTE_LOCK_KEY, 1, nx=True, px=int(self.interval * 5000)):
+                return
+            try:
+                demoted, kept = backend.demote()
+                now = time.time()
+                if now >= self._next_purge:
+                    self._next_purge = now + self.purge_interval
+                    backend.tier.purge_expired()
+            finally:
+                backend.client.delete(DEMOTE_LOCK_KEY)
+            if demoted:
+                logger.debug('分层结果: 降级 %d 个结果到冷层（%d 个小结果留在 Redis）',
+                             demoted, kept)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning('分层结果降级失败: %r', exc)
@@ -0,0 +1,266 @@
+"""
+DAG 工作流引擎
+
+Celery 原生只提供线性的 chain 与 chord 扇入。菱形依赖：
+
+        fetch
+       /     \\
+   process   save
+       \\     /
+        report
+
+用 chain/chord 表达时往往要把 process 与 save 串行化，总耗时是各阶段之和。
+
+Workflow 允许声明任意有向无环图，每个节点在其全部输入就绪后立即派发，
+总耗时接近关键路径（最长依赖路径）的耗时。
+
+实现（协调状态保存在结果后端的 Redis 中）：
+1. 提交时把图结构写入 workflow-dag-<id>.spec，为每个节点记录待完成的依赖数，
+   然后派发所有没有依赖的根节点
+2. 每个节点通过 link 回调 dag_node_done：
+   Lua 脚本原子地写入节点结果（HSETNX，只写一次），并把每个子节点的依赖数减一，
+   返回依赖数降为 0 的子节点
+3. dag_node_done 一次 HMGET 读取这些子节点的输入并派发
+
+节点结果只在 workflow-dag-<id>.results 中保存一份，所有下游节点共享；
+节点任务本身以 ignore_result=True 执行，不再重复写入 celery-task-meta。
+
+传参规则（与 chain / chord 一致）：
+- 一个依赖：依赖的结果作为第一个位置参数
+- 多个依赖：按声明顺序组成列表作为第一个位置参数
+- 根节点与不可变签名（.si()）：不传入上游结果
+
+用法:
+    dag = Workflow()
+    dag.add_node('fetch', fetch_data.s('database'))
+    dag.add_node('process', process_item.s(), deps=['fetch'])
+    dag.add_node('save', save_result.s(), deps=['fetch'])
+    dag.add_node('report', aggregate_results.s(), deps=['process', 'save'])
+
+    result = dag.apply_async()
+    print(result.get(timeout=60))   # {'report': ...}
+"""
+
+import time
+
+from celery.canvas import Signature
+from celery.exceptions import TimeoutError
+from kombu.utils.json import dumps, loads
+from kombu.utils.uuid import uuid
+
+from celery_app import app
+
+KEY_PREFIX = 'workflow-dag-'
+
+# KEYS[1] 结果哈希  KEYS[2] 待完成依赖数哈希
+# ARGV[1] 节点名  ARGV[2] 编码后的结果  ARGV[3] 过期时间（秒）  ARGV[4..] 子节点
+NODE_DONE_SCRIPT = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+    return {}
+end
+local ready = {}
+for i = 4, #ARGV do
+    if redis.call('HINCRBY', KEYS[2], ARGV[i], -1) == 0 then
+        table.insert(ready, ARGV[i])
+    end
+end
+local expires = tonumber(ARGV[3])
+if expires > 0 then
+    redis.call('EXPIRE', KEYS[1], expires)
+    redis.call('EXPIRE', KEYS[2], expires)
+end
+return ready
+"""
+
+
+class WorkflowError(Exception):
+    """工作流中有节点执行失败"""
+
+
+def _key(dag_id, suffix):
+    return f'{KEY_PREFIX}{dag_id}.{suffix}'
+
+
+_scripts = {}
+
+
+def _node_done_script(client):
+    """按客户端缓存注册后的 Lua 脚本（EVALSHA）"""
+    script = _scripts.get(id(client))
+    if script is None:
+        script = _scripts[id(client)] = client.register_script(NODE_DONE_SCRIPT)
+    return script
+
+
+class Workflow:
+    """有向无环图工作流"""
+
+    def __init__(self):
+        self.nodes = {}
+
+    def add_node(self, name, signature, deps=()):
+        """
+        添加节点
+
+        参数:
+            name: 节点名，在工作流内唯一
+            signature: 节点要执行的任务签名
+            deps: 依赖的节点名列表，顺序决定多输入时列表中的位置
+        """
+        if name in self.nodes:
+            raise ValueError(f'节点 {name!r} 已存在')
+        self.nodes[name] = {'signature': signature, 'deps': list(deps)}
+        return self
+
+    def _children(self):
+        """计算每个节点的子节点，并检查依赖是否存在、图中是否有环"""
+        children = {name: [] for name in self.nodes}
+        for name, node in self.nodes.items():
+            for dep in node['deps']:
+                if dep not in self.nodes:
+                    raise ValueError(f'节点 {name!r} 依赖的 {dep!r} 不存在')
+                children[dep].append(name)
+
+        # Kahn 拓扑排序：能排完所有节点说明无环
+        remaining = {name: len(node['deps']) for name, node in self.nodes.items()}
+        queue = [name for name, count in remaining.items() if count == 0]
+        visited = 0
+        while queue:
+            name = queue.pop()
+            visited += 1
+            for child in children[name]:
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    queue.append(child)
+        if visited != len(self.nodes):
+            raise ValueError('工作流中存在循环依赖')
+        return children
+
+    def apply_async(self):
+        """提交工作流，返回 WorkflowResult"""
+        children = self._children()
+        dag_id = uuid()
+        spec = {
+            name: {
+                'signature': dict(node['signature']),
+                'deps': node['deps'],
+                'children': children[name],
+            }
+            for name, node in self.nodes.items()
+        }
+        client = app.backend.client
+        expires = app.backend.expires or 0
+        with client.pipeline() as pipe:
+            pipe.set(_key(dag_id, 'spec'), dumps(spec))
+            pipe.hset(_key(dag_id, 'pending'), mapping={
+                name: len(node['deps']) for name, node in spec.items()
+            })
+            if expires:
+                pipe.expire(_key(dag_id, 'spec'), expires)
+                pipe.expire(_key(dag_id, 'pending'), expires)
+            pipe.execute()
+
+        for name, node in spec.items():
+            if not node['deps']:
+                _dispatch(dag_id, name, node, inputs=None)
+
+        sinks = [name for name, node in spec.items() if not node['children']]
+        return WorkflowResult(dag_id, list(spec), sinks)
+
+
+class WorkflowResult:
+    """工作流结果句柄"""
+
+    def __init__(self, dag_id, nodes, sinks):
+        self.id = dag_id
+        self.nodes = nodes
+        self.sinks = sinks
+
+    def __repr__(self):
+        return f'<WorkflowResult: {self.id}>'
+
+    def _poll(self, names):
+        """一次往返读取指定节点的结果与失败信息"""
+        with app.backend.client.pipeline(transaction=False) as pipe:
+            pipe.hmget(_key(self.id, 'results'), names)
+            pipe.hgetall(_key(self.id, 'errors'))
+            values, errors = pipe.execute()
+        if errors:
+            raise WorkflowError(
+                '; '.join(f'{k.decode()}: {v.decode()}' for k, v in errors.items()))
+        return values
+
+    def ready(self):
+        """所有汇点（没有下游的节点）是否都已完成"""
+        return all(value is not None for value in self._poll(self.sinks))
+
+    def get(self, timeout=None, interval=0.1, nodes=None):
+        """
+        等待并返回结果
+
+        参数:
+            timeout: 超时时间（秒）
+            interval: 轮询间隔（秒）
+            nodes: 要返回的节点名，默认返回所有汇点
+
+        返回:
+            {节点名: 结果}
+        """
+        names = list(nodes or self.sinks)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            values = self._poll(names)
+            if all(value is not None for value in values):
+                return {name: app.backend.decode(value)
+                        for name, value in zip(names, values)}
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f'工作流 {self.id} 在 {timeout} 秒内未完成')
+            time.sleep(interval)
+
+
+def _dispatch(dag_id, name, node, inputs):
+    """派发一个节点，并挂上完成与失败回调"""
+    signature = Signature.from_dict(node['signature'], app=app)
+    args = tuple(signature.args)
+    if node['deps'] and not signature.immutable:
+        args = (inputs,) + args
+    options = dict(signature.options)
+    queue = app.amqp.router.route(options, signature.task, args, signature.kwargs)['queue'].name
+    # 回调与节点使用同一个队列，能执行该节点的 Worker 一定也能执行其回调
+    options.update(
+        ignore_result=True,
+        link=dag_node_done.s(dag_id, name).set(queue=queue),
+        link_error=dag_node_failed.s(dag_id, name).set(queue=queue),
+    )
+    Signature(signature.task, args, signature.kwargs, options,
+              app=app, immutable=True).apply_async()
+
+
+@app.task(name='extensions.workflow_dag.dag_node_done')
+def dag_node_done(result, dag_id, name):
+    """节点完成回调：保存结果并派发所有输入已就绪的子节点"""
+    backend = app.backend
+    client = backend.client
+    spec = loads(client.get(_key(dag_id, 'spec')))
+    node = spec[name]
+    ready = _node_done_script(client)(
+        keys=[_key(dag_id, 'results'), _key(dag_id, 'pending')],
+        args=[name, backend.encode(result), backend.expires or 0, *node['children']],
+    )
+    for child in ready:
+        child = child.decode() if isinstance(child, bytes) else child
+        child_node = spec[child]
+        deps = child_node['deps']
+        values = [backend.decode(value) for value in
+                  client.hmget(_key(dag_id, 'results'), deps)]
+        _dispatch(dag_id, child, child_node, values[0] if len(deps) == 1 else values)
+    return len(ready)
+
+
+@app.task(name='extensions.workflow_dag.dag_node_failed')
+def dag_node_failed(request, exc, traceback, dag_id, name):
+    """节点失败回调：记录失败信息，下游节点不会再被派发"""
+    client = app.backend.client
+    client.hset(_key(dag_id, 'errors'), name, repr(exc))
+    if app.backend.expires:
+        client.expire(_key(dag_id, 'errors'), app.backend.expires)
@@ -8,6 +8,9 @@ from celery_app import app
 from celery.result import AsyncResult
 import time
 
+from extensions.task_cache import cache_stats
+from extensions.retry_policy import retry_stats
+
 
 def get_task_info(task_id):
     """获取任务信息"""
@@ -108,6 +111,31 @@ def print_worker_stats():
             print(f"    已处理任务数: {worker_stats.get('total', {}).get('tasks.succeeded', 0)}")
 
 
+def print_cache_stats():
+    """打印任务结果缓存的命中统计"""
+    print("=" * 50)
+    print("任务结果缓存统计")
+    print("=" * 50)
+    
+    for name, counters in sorted(cache_stats().items()):
+        total = counters['hits'] + counters['misses']
+        hit_rate = counters['hits'] / total * 100 if total else 0
+        print(f"  {name}:")
+        print(f"    命中: {counters['hits']}  未命中: {counters['misses']}  "
+              f"命中率: {hit_rate:.1f}%  淘汰: {counters['evictions']}")
+
+
+def print_retry_stats():
+    """打印重试预算统计（被拒绝的重试说明依赖故障触发了重试风暴控制）"""
+    print("=" * 50)
+    print("重试预算统计")
+    print("=" * 50)
+    
+    for name, counters in sorted(retry_stats().items()):
+        print(f"  {name}: 允许重试 {counters['allowed']} 次，"
+              f"因预算耗尽放弃 {counters['suppressed']} 次")
+
+
 if __name__ == '__main__':
     # 示例：监控任务
     # task_id = 'your-task-id-here'
@@ -115,4 +143,6 @@ if __name__ == '__main__':
     
     # 打印 Worker 统计
     print_worker_stats()
+    print_cache_stats()
+    print_retry_stats()
 
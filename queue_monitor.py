@@ -22,6 +22,7 @@ try:
     import redis
     from celery_app import app
     from celery.result import AsyncResult
+    from extensions.delay_queue import delayed_counts
 except ImportError as e:
     print(f"❌ 导入错误: {e}")
     print("💡 请先安装依赖: pip install celery redis")
@@ -119,6 +120,13 @@ class QueueMonitor:
         except:
             return {}
     
+    def get_delayed_tasks(self):
+        """获取延迟队列中的任务数（尚未到期、仍在 Broker 端等待的任务）"""
+        try:
+            return delayed_counts(self.redis_client)
+        except:
+            return {}
+    
     def get_worker_stats(self):
         """获取 Worker 统计信息"""
         try:
@@ -247,6 +255,17 @@ class QueueMonitor:
                 else:
                     print("  无")
                 
+                # 5.1 延迟队列（Broker 端等待到期的任务）
+                print("\n⏳ 延迟队列（Broker 端等待到期）:")
+                print("-" * 80)
+                delayed = self.get_delayed_tasks()
+                if delayed:
+                    for target, (total, due) in delayed.items():
+                        queue_name = target.split('\x06\x16')[0]
+                        print(f"  {queue_name:20s}: {total:4d} 个任务（已到期待搬运: {due}）")
+                else:
+                    print("  无")
+                
                 # 6. 已注册的任务
                 if show_details:
                     print("\n📝 已注册的任务:")
@@ -3,6 +3,9 @@
 Redis 队列查看器
 
 直接查看 Redis 中的队列内容，不依赖 Celery
+
+消息按 kombu 信封解码（任务 ID、任务名在 headers 中，参数在 base64 编码的 body 中），
+并包括优先级子队列；--stats 分页扫描整个队列并输出统计（详见 extensions/queue_inspector.py）
 """
 
 import sys
@@ -19,8 +22,12 @@ except ImportError:
     print("❌ 请先安装 redis: pip install redis")
     sys.exit(1)
 
+from extensions.memory_profiler import profile_memory
+from extensions.queue_inspector import iter_messages, queue_lengths, scan_queue
+
 
-def view_redis_queues(host='localhost', port=6379, db=0, password=None):
+def view_redis_queues(host='localhost', port=6379, db=0, password=None, stats=False,
+                      memory=False):
     """查看 Redis 队列内容"""
     try:
         if password:
@@ -42,7 +49,8 @@ def view_redis_queues(host='localhost', port=6379, db=0, password=None):
     # 1. 查看所有键
     print("\n🔑 Redis 键列表（与 Celery 相关）:")
     print("-" * 80)
-    all_keys = r.keys('*')
+    # SCAN 分批遍历，不会像 KEYS * 一样在大库上阻塞 Redis
+    all_keys = list(r.scan_iter(count=1000))
     celery_keys = [key for key in all_keys if 'celery' in key.lower() or 'task' in key.lower()]
     
     if celery_keys:
@@ -62,35 +70,38 @@ def view_redis_queues(host='localhost', port=6379, db=0, password=None):
     queue_names = ['celery', 'basic', 'advanced', 'realworld']
     
     for queue_name in queue_names:
-        length = r.llen(queue_name)
+        # 设置了优先级的队列拆分为多个列表: queue、queue\x06\x163 ...
+        lengths = queue_lengths(r, queue_name)
+        length = sum(lengths.values())
         if length > 0:
             print(f"\n  📦 队列: {queue_name} (长度: {length})")
+            if len(lengths) > 1 or queue_name not in lengths:
+                for key, sub_length in lengths.items():
+                    print(f"      {key!r}: {sub_length}")
             print("  " + "-" * 76)
             
-            # 获取队列中的任务（不删除）
-            items = r.lrange(queue_name, 0, 9)  # 只显示前10个
+            # 获取队列中的任务（不删除），按优先级从高到低只显示前10个
+            messages = iter_messages(r, queue_name, limit=10, decode_body=True)
             
-            for i, item in enumerate(items, 1):
-                try:
-                    # 尝试解析 JSON
-                    task_data = json.loads(item)
-                    task_name = task_data.get('task', 'unknown')
-                    task_id = task_data.get('id', 'unknown')
-                    args = task_data.get('args', [])
-                    kwargs = task_data.get('kwargs', {})
-                    
-                    print(f"  [{i}] 任务: {task_name}")
-                    print(f"      ID: {task_id}")
-                    if args:
-                        print(f"      参数: {args}")
-                    if kwargs:
-                        print(f"      关键字参数: {kwargs}")
-                    print()
-                except json.JSONDecodeError:
-                    print(f"  [{i}] {item[:100]}...")
+            for i, message in enumerate(messages, 1):
+                print(f"  [{i}] 任务: {message.task}")
+                print(f"      ID: {message.id}")
+                if message.args:
+                    print(f"      参数: {message.args}")
+                if message.kwargs:
+                    print(f"      关键字参数: {message.kwargs}")
+                if message.retries:
+                    print(f"      重试次数: {message.retries}")
+                if message.eta:
+                    print(f"      执行时间: {message.eta}")
+                print()
             
             if length > 10:
                 print(f"  ... 还有 {length - 10} 个任务在队列中")
+            
+            if stats:
+                print()
+                print(scan_queue(r, queue_name).report())
     
     # 3. 查看任务结果（Hash 类型）
     print("\n📊 任务结果（最近的结果）:")
@@ -130,8 +141,14 @@ def view_redis_queues(host='localhost', port=6379, db=0, password=None):
     info = r.info('stats')
     print(f"  总键数: {len(all_keys)}")
     print(f"  Celery 相关键: {len(celery_keys)}")
-    print(f"  队列数: {sum(1 for q in queue_names if r.llen(q) > 0)}")
+    print(f"  队列数: {sum(1 for q in queue_names if queue_lengths(r, q))}")
     print(f"  任务结果数: {len(result_keys)}")
+    
+    # 5. 内存占用（按任务名 + 参数形状归因，详见 extensions/memory_profiler.py）
+    if memory:
+        print("\n💾 内存占用:")
+        print("-" * 80)
+        print(profile_memory(r, queue_names).report())
 
 
 def main():
@@ -143,6 +160,10 @@ def main():
     parser.add_argument('--port', type=int, default=6379, help='Redis 端口')
     parser.add_argument('--db', type=int, default=0, help='Redis 数据库编号')
     parser.add_argument('--password', default=None, help='Redis 密码')
+    parser.add_argument('--stats', action='store_true',
+                        help='扫描整个队列，输出任务名、重试次数、ETA、消息大小的分布')
+    parser.add_argument('--memory', action='store_true',
+                        help='用 MEMORY USAGE 分析队列与结果的内存占用')
     
     args = parser.parse_args()
     
@@ -150,7 +171,9 @@ def main():
         host=args.host,
         port=args.port,
         db=args.db,
-        password=args.password
+        password=args.password,
+        stats=args.stats,
+        memory=args.memory
     )
 
 
@@ -2,6 +2,15 @@
 
 # Celery Beat 启动脚本（定时任务调度器）
 
+# 高可用模式: BEAT_HA=true 时可以在多台机器上各启动一个 Beat，
+# 通过 Redis 租约选主，只有主节点发送任务
+if [ "${BEAT_HA:-false}" = "true" ]; then
+    echo "启动 Celery Beat（高可用模式）..."
+    exec celery -A celery_app beat \
+        -S extensions.beat_leader:LeaderScheduler \
+        --loglevel=info
+fi
+
 echo "启动 Celery Beat..."
 
 celery -A celery_app beat \
@@ -2,6 +2,45 @@
 
 # Celery Worker 启动脚本
 
+# asyncio 模式: POOL=asyncio 时启动监听 io 队列的 Worker，
+# async def 任务在事件循环中并发执行，CONCURRENCY 为同时执行的协程数上限
+if [ "${POOL:-prefork}" = "asyncio" ]; then
+    echo "启动 Celery Worker（asyncio 池）..."
+    export CELERY_CUSTOM_WORKER_POOL=extensions.asyncio_pool:AsyncIOPool
+    exec celery -A celery_app worker \
+        --loglevel=info \
+        --queues=io \
+        --concurrency=${CONCURRENCY:-1000} \
+        --hostname=io@%h \
+        --pool=custom
+fi
+
+# 多执行池模式: POOL=multi 时一个 Worker 消费所有队列，
+# 按任务 / 队列分配到 prefork、线程池与 asyncio 池（配置见 celery_app.py 中的 worker_pools）
+if [ "${POOL:-prefork}" = "multi" ]; then
+    echo "启动 Celery Worker（多执行池）..."
+    export CELERY_CUSTOM_WORKER_POOL=extensions.multi_pool:MultiPool
+    exec celery -A celery_app worker \
+        --loglevel=info \
+        --queues=basic,advanced,realworld,io \
+        --hostname=worker@%h \
+        --pool=custom \
+        --max-tasks-per-child=1000
+fi
+
+# 按内存回收模式: POOL=recycling 时子进程按 RSS 高水位 / 增长 / 趋势回收，
+# 代替固定的 --max-tasks-per-child（回收规则见 celery_app.py 中的 worker_recycle_*）
+if [ "${POOL:-prefork}" = "recycling" ]; then
+    echo "启动 Celery Worker（按内存回收子进程）..."
+    export CELERY_CUSTOM_WORKER_POOL=extensions.memory_recycler:RecyclingTaskPool
+    exec celery -A celery_app worker \
+        --loglevel=info \
+        --queues=basic,advanced,realworld \
+        --concurrency=4 \
+        --hostname=worker@%h \
+        --pool=custom
+fi
+
 echo "启动 Celery Worker..."
 
 # 启动基础队列的 worker
@@ -14,11 +14,28 @@ from celery import chain, group, chord
 import time
 import random
 
+from extensions.fused_chain import fuse
+from extensions.task_cache import cached_task
+from extensions.task_dedup import CachedDeduplicatedTask
+from extensions.retry_policy import RetryPolicy
+from extensions.circuit_breaker import CircuitBreaker, CircuitOpenError
 
-@app.task(name='tasks.advanced_tasks.fetch_data')
+# 重试策略：去相关抖动退避 + 每个任务名共享的重试预算
+# 突发最多 20 次重试，之后平均每秒最多 2 次
+retry_policy = RetryPolicy(base=1, cap=60, budget=20, refill_rate=2)
+
+# 示例 API 的熔断器：60 秒内至少 10 次调用且失败率达到 50% 时打开，30 秒后半开探测
+api_breaker = CircuitBreaker('example-api', failure_threshold=0.5, min_calls=10,
+                             window=60, open_timeout=30)
+
+
+@app.task(name='tasks.advanced_tasks.fetch_data', base=CachedDeduplicatedTask,
+          fusible=True, cache_ttl=600)
 def fetch_data(source):
     """
     模拟从数据源获取数据
+
+    相同数据源的并发提交只执行一次，结果缓存 10 分钟，重复调用直接返回缓存
     """
     print(f"从 {source} 获取数据...")
     time.sleep(1)
@@ -27,7 +44,7 @@ def fetch_data(source):
     return data
 
 
-@app.task(name='tasks.advanced_tasks.process_item')
+@cached_task(name='tasks.advanced_tasks.process_item', fusible=True, cache_ttl=600)
 def process_item(item):
     """
     处理单个数据项
@@ -37,7 +54,7 @@ def process_item(item):
     return f"processed_{item}"
 
 
-@app.task(name='tasks.advanced_tasks.save_result')
+@app.task(name='tasks.advanced_tasks.save_result', fusible=True)
 def save_result(result):
     """
     保存处理结果
@@ -77,8 +94,8 @@ def task_with_retry(self, value):
     # 模拟随机失败
     if random.random() < 0.5:
         print("任务失败，准备重试...")
-        # 重试任务，延迟2秒
-        raise self.retry(countdown=2, exc=Exception("模拟的失败"))
+        # 重试任务，延迟在 1~60 秒之间随机展开
+        raise retry_policy.retry(self, exc=Exception("模拟的失败"))
     
     print("任务成功完成")
     return f"处理成功: {value}"
@@ -89,25 +106,32 @@ def task_with_custom_retry(self, url):
     """
     自定义重试逻辑的任务
     
-    根据不同的错误类型采用不同的重试策略
+    根据不同的错误类型采用不同的重试策略；
+    依赖持续故障时熔断器打开，请求直接失败并推迟到熔断器半开之后重试
     """
     print(f"请求 URL: {url}")
     
-    # 模拟不同类型的错误
-    error_type = random.choice(['timeout', 'connection', 'success'])
+    try:
+        with api_breaker:
+            # 模拟不同类型的错误
+            error_type = random.choice(['timeout', 'connection', 'success'])
+            
+            if error_type == 'timeout':
+                print("超时错误")
+                raise TimeoutError("超时错误")
+            elif error_type == 'connection':
+                print("连接错误")
+                raise ConnectionError("连接错误")
+    except CircuitOpenError as exc:
+        # 熔断器打开：不再请求依赖，统一推迟到半开之后（加少量抖动避免同时醒来）
+        print(f"熔断器打开: {exc}")
+        raise self.retry(countdown=exc.retry_after + random.uniform(0, 5), exc=exc)
+    except (TimeoutError, ConnectionError) as exc:
+        # 超时 / 连接错误：带抖动的退避重试，受重试预算限制
+        raise retry_policy.retry(self, exc=exc)
     
-    if error_type == 'timeout':
-        print("超时错误")
-        # 超时错误：指数退避重试
-        retry_delay = 2 ** self.request.retries
-        raise self.retry(countdown=retry_delay, exc=Exception("超时错误"))
-    elif error_type == 'connection':
-        print("连接错误")
-        # 连接错误：固定延迟重试
-        raise self.retry(countdown=5, exc=Exception("连接错误"))
-    else:
-        print("请求成功")
-        return f"成功获取 {url} 的数据"
+    print("请求成功")
+    return f"成功获取 {url} 的数据"
 
 
 @app.task(name='tasks.advanced_tasks.on_chord_error', bind=True)
@@ -135,6 +159,17 @@ def create_task_chain_example():
     return workflow
 
 
+def create_fused_chain_example():
+    """
+    创建融合任务链示例
+    
+    三个步骤都标记为 fusible 且同属 advanced 队列，
+    fuse() 会把它们合并为一个任务，在同一个 Worker 进程中依次执行，
+    中间结果在内存中传递，只有最终结果写入结果后端
+    """
+    return fuse(create_task_chain_example())
+
+
 def create_task_group_example():
     """
     创建任务组示例
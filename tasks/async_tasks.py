@@ -0,0 +1,84 @@
+"""
+异步 I/O 任务示例
+
+这个模块展示了用 async def 定义的 I/O 密集型任务：
+1. HTTP 请求（fetch_url）
+2. 邮件发送（send_email_async）
+
+这些任务路由到 io 队列，由 AsyncIOPool 在事件循环中并发执行，
+不需要 eventlet / gevent 的 monkey patch（详见 extensions/asyncio_pool.py）:
+
+    POOL=asyncio ./start_worker.sh
+
+在 prefork 等其他池中同样可以执行，只是每个任务独占一个进程。
+"""
+
+from celery_app import app
+import asyncio
+import random
+import time
+
+from extensions.asyncio_pool import AsyncIOTask
+
+
+@app.task(name='tasks.async_tasks.fetch_url', base=AsyncIOTask, bind=True)
+async def fetch_url(self, url, latency=0.5):
+    """
+    请求 URL（模拟）
+
+    在实际工程中，这里使用 aiohttp / httpx.AsyncClient 等异步客户端
+
+    参数:
+        url: 请求地址
+        latency: 模拟的网络延迟（秒）
+
+    返回:
+        响应摘要
+    """
+    await asyncio.sleep(latency)
+    return {
+        'url': url,
+        'status': 200,
+        'task_id': self.request.id,
+    }
+
+
+@app.task(name='tasks.async_tasks.fetch_url_blocking', bind=True)
+def fetch_url_blocking(self, url, latency=0.5):
+    """
+    请求 URL（同步版本，模拟）
+
+    与 fetch_url 相同，但使用阻塞调用，用于和 gevent / threads 池对比吞吐量
+    """
+    time.sleep(latency)
+    return {
+        'url': url,
+        'status': 200,
+        'task_id': self.request.id,
+    }
+
+
+@app.task(name='tasks.async_tasks.send_email_async', base=AsyncIOTask, bind=True,
+          max_retries=3)
+async def send_email_async(self, to_email, subject, body):
+    """
+    发送邮件（异步版本，模拟）
+
+    参数:
+        to_email: 收件人邮箱
+        subject: 邮件主题
+        body: 邮件内容
+    """
+    try:
+        # 模拟调用异步 SMTP 客户端（例如 aiosmtplib）
+        await asyncio.sleep(0.2)
+        if random.random() < 0.05:
+            raise ConnectionError('SMTP 服务暂时不可用')
+    except ConnectionError as exc:
+        raise self.retry(exc=exc, countdown=5)
+    return {
+        'status': 'sent',
+        'to': to_email,
+        'subject': subject,
+        'task_id': self.request.id,
+    }
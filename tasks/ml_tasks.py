@@ -0,0 +1,79 @@
+"""
+机器学习任务示例
+
+这个模块展示了如何在 prefork 子进程中使用模型：
+1. 模型权重导出为 .npy 文件，子进程通过内存映射共享（详见 extensions/model_cache.py）
+2. 模型在 fork 之后加载，NumPy 的状态不会跨越 fork
+3. 子进程回收重建时只需重新映射权重文件
+
+需要 numpy（可选依赖）: uv sync --extra ml 或 pip install numpy
+"""
+
+from celery_app import app
+import zlib
+
+from extensions.model_cache import get_model, model
+
+LABELS = ['体育', '科技', '财经', '娱乐']
+VOCAB_SIZE = 50000
+EMBEDDING_DIM = 256
+
+
+class TextClassifier:
+    """
+    词袋文本分类器（模拟）
+
+    权重是内存映射的 numpy 数组，推理只读取权重，不会触发写时复制
+    """
+
+    def __init__(self, weights):
+        self.embedding = weights['embedding']
+        self.classifier = weights['classifier']
+
+    def predict(self, text):
+        import numpy as np
+
+        token_ids = [zlib.crc32(word.encode()) % VOCAB_SIZE for word in text.split()] or [0]
+        features = self.embedding[token_ids].mean(axis=0)
+        logits = features @ self.classifier
+        probabilities = np.exp(logits - logits.max())
+        probabilities /= probabilities.sum()
+        index = int(probabilities.argmax())
+        return LABELS[index], float(probabilities[index])
+
+
+@model('text-classifier', version='1', build=TextClassifier)
+def export_text_classifier():
+    """
+    导出文本分类模型的权重（模拟）
+
+    实际工程中这里从训练好的 checkpoint 转换（例如 torch.load() 后取 state_dict 转为 numpy），
+    每台机器只执行一次
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(42)
+    return {
+        'embedding': rng.standard_normal((VOCAB_SIZE, EMBEDDING_DIM), dtype=np.float32),
+        'classifier': rng.standard_normal((EMBEDDING_DIM, len(LABELS)), dtype=np.float32),
+    }
+
+
+@app.task(name='tasks.ml_tasks.classify_text', bind=True)
+def classify_text(self, text):
+    """
+    文本分类任务
+
+    参数:
+        text: 待分类的文本
+
+    返回:
+        分类结果
+    """
+    label, score = get_model('text-classifier').predict(text)
+    return {
+        'text': text[:100],
+        'label': label,
+        'score': round(score, 4),
+        'task_id': self.request.id,
+    }
@@ -14,8 +14,19 @@ import os
 from datetime import datetime
 import json
 
+from extensions.idempotency import IdempotentTask
+from extensions.task_dedup import CachedDeduplicatedTask
+from extensions.retry_policy import RetryPolicy
 
-@app.task(name='tasks.realworld_tasks.send_email', bind=True, max_retries=3)
+# 邮件服务故障时限制重试总量，避免在 SMTP 限流下继续堆积请求
+email_retry_policy = RetryPolicy(base=5, cap=300, budget=50, refill_rate=1)
+
+
+# acks_late: 执行完成后才确认，Worker 丢失时消息会被重新投递；
+# IdempotentTask 保证已经发送成功的邮件在重新投递时不会再次发送
+# execution_pool: 多执行池 Worker 中在线程池执行（I/O 密集型，详见 extensions/multi_pool.py）
+@app.task(name='tasks.realworld_tasks.send_email', bind=True, max_retries=3,
+          base=IdempotentTask, acks_late=True, execution_pool='threads')
 def send_email(self, to_email, subject, body):
     """
     发送邮件任务（模拟）
@@ -26,6 +37,9 @@ def send_email(self, to_email, subject, body):
         to_email: 收件人邮箱
         subject: 邮件主题
         body: 邮件内容
+    
+    幂等键：默认为任务 ID，同一条消息的重复投递与重试不会重复发送；
+    相同内容的邮件需要去重时通过 headers={'idempotency_key': ...} 指定（如 'welcome-<用户ID>'）
     """
     print(f"[邮件任务] 发送邮件到 {to_email}")
     print(f"主题: {subject}")
@@ -38,7 +52,7 @@ def send_email(self, to_email, subject, body):
     import random
     if random.random() < 0.1:
         print("邮件发送失败，准备重试...")
-        raise self.retry(countdown=5, exc=Exception("邮件服务暂时不可用"))
+        raise email_retry_policy.retry(self, exc=Exception("邮件服务暂时不可用"))
     
     print(f"[邮件任务] 邮件发送成功到 {to_email}")
     return {
@@ -196,7 +210,8 @@ def export_data(self, query, output_format='json'):
     return result
 
 
-@app.task(name='tasks.realworld_tasks.generate_report', bind=True)
+@app.task(name='tasks.realworld_tasks.generate_report', bind=True,
+          base=CachedDeduplicatedTask, dedup_ttl=600, cache_ttl=3600)
 def generate_report(self, report_type, date_range):
     """
     生成报告任务
@@ -204,6 +219,8 @@ def generate_report(self, report_type, date_range):
     参数:
         report_type: 报告类型（daily, weekly, monthly）
         date_range: 日期范围
+    
+    相同类型与日期范围的并发提交只生成一次，报告缓存 1 小时，命中时不再重新生成
     """
     print(f"[报告生成] 生成 {report_type} 报告")
     print(f"日期范围: {date_range}")
@@ -284,3 +301,28 @@ def cleanup_old_files(self, directory, days_old=30):
     print(f"[文件清理] 清理完成，删除了 {deleted} 个文件")
     return result
 
+
+
+def list_tenants():
+    """
+    租户列表（扇出调度的数据源）
+
+    实际工程中通常从数据库读取，这里用环境变量模拟：TENANT_COUNT=1000
+    """
+    return [f'tenant-{i:04d}' for i in range(int(os.getenv('TENANT_COUNT', '20')))]
+
+
+@app.task(name='tasks.realworld_tasks.sync_tenant', bind=True, ignore_result=True)
+def sync_tenant(self, tenant_id, full=False):
+    """
+    同步单个租户的数据
+
+    由 Beat 的扇出调度条目 tenant-sync 按租户批量发布（详见 extensions/fan_out.py）
+
+    参数:
+        tenant_id: 租户 ID
+        full: 是否全量同步
+    """
+    print(f"[租户同步] {tenant_id} {'全量' if full else '增量'}同步")
+    time.sleep(0.1)
+    return {'tenant_id': tenant_id, 'synced_at': datetime.now().isoformat()}